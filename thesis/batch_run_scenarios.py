@@ -1,30 +1,125 @@
 import os
 import csv
-from launch_scenario import run_simulation
+from concurrent.futures import ThreadPoolExecutor
+from launch_scenario import serve_from_cache, batch_info_from_csv
+from run_workflow_and_parse import run_scenarios_as_workflow
+from sim_orchestrator import DEFAULT_TIMEOUT, make_slot, make_slots, run_many_sync
+from work_queue import run_via_queue
+from paths import MAP_ROOT, map_path, ws_path
 
-DEFAULT_SCENARIO_DIR = "/autoware_map/generated_scenarios"
+DEFAULT_SCENARIO_DIR = map_path("generated_scenarios")
 SCENARIO_EXT = ".yaml"
-DEFAULT_RESULTS_CSV = "/ros2_ws/simulation_results/simulation_results.csv"
+DEFAULT_RESULTS_CSV = ws_path("simulation_results", "simulation_results.csv")
+DEFAULT_OUTPUT_DIR = MAP_ROOT
+WORKER_OUTPUT_BASE = map_path("workers")
 
 
-def batch_run(scenario_dir=DEFAULT_SCENARIO_DIR, results_csv=DEFAULT_RESULTS_CSV):
+def batch_run(scenario_dir=DEFAULT_SCENARIO_DIR, results_csv=DEFAULT_RESULTS_CSV,
+              workers=1, worker_base=WORKER_OUTPUT_BASE, launch_command=None, use_workflow=False,
+              cache=None, store=None, timeout=DEFAULT_TIMEOUT, early_stop=False, skip_recorded=False,
+              queue=None, template=None):
+    """
+    Run every scenario of scenario_dir and record the outcomes in results_csv (or the store).
+    Scenarios run locally on `workers` slots, as workflow shards, or, with a
+    work_queue.WorkQueue, on remote workers that build them from `template`.
+    """
+    scenarios = list_scenarios(scenario_dir)
+
+    total = len(scenarios)
+    print(f"🚗 Running {total} scenarios from {scenario_dir}\n")
+
+    if skip_recorded:
+        # resuming an interrupted batch: scenarios with a result row are done
+        done = recorded_scenarios(results_csv, store)
+        scenarios = [path for path in scenarios if path not in done]
+        print(f"⏭️ {total - len(scenarios)} scenarios already recorded")
+    pending = len(scenarios)
+
+    if cache is not None:
+        # Previously simulated parameter tuples are logged straight from the cache
+        scenarios = [path for path in scenarios if serve_from_cache(path, results_csv, cache, store) is None]
+
+    if queue is not None:
+        run_via_queue(scenarios, results_csv, queue, template, cache, store)
+    elif use_workflow:
+        run_workflow_shards(scenarios, results_csv, workers, worker_base, launch_command, cache, store, timeout)
+    else:
+        run_worker_pool(scenarios, results_csv, workers, worker_base, launch_command, cache, store, timeout,
+                        early_stop)
+
+    if store is not None:
+        # keep the per-batch CSV around for tools that still read it
+        batch_info = batch_info_from_csv(results_csv)
+        store.export_csv(results_csv, batch_info=batch_info)
+        failed = store.count_collisions(batch_info)
+    else:
+        failed = count_collisions(results_csv)
+
+    print(f"\n--- Summary ---")
+    print(f"Total Scenarios Run: {total}")
+    if cache is not None:
+        print(f"Served from cache: {pending - len(scenarios)}")
+    print(f"Collisions: {failed} ({(failed/total)*100:.1f}%)")
+
+
+def list_scenarios(scenario_dir):
     # Gather all scenario files, sorted numerically by index
-    scenarios = sorted(
+    return sorted(
         [os.path.join(scenario_dir, f) for f in os.listdir(scenario_dir) if f.endswith(SCENARIO_EXT)],
         key=lambda path: int(os.path.splitext(os.path.basename(path))[0].split('_')[1])
     )
 
-    print(f"🚗 Running {len(scenarios)} scenarios from {scenario_dir}\n")
 
-    for i, scenario_path in enumerate(scenarios):
-        print(f"[{i+1}/{len(scenarios)}] ▶ Running {os.path.basename(scenario_path)}")
-        run_simulation(scenario_path, csv_path=results_csv)
+def run_worker_pool(scenarios, results_csv, workers, worker_base=WORKER_OUTPUT_BASE, launch_command=None,
+                    cache=None, store=None, timeout=DEFAULT_TIMEOUT, early_stop=False):
+    """
+    Run scenarios on `workers` parallel simulator slots via the async orchestrator.
+    A single worker keeps the classic layout (DEFAULT_OUTPUT_DIR, ./simulation_log.txt).
+    """
+    if workers <= 1:
+        slots = [make_slot(DEFAULT_OUTPUT_DIR, log_path="simulation_log.txt")]
+    else:
+        slots = make_slots(workers, worker_base)
+    return run_many_sync(scenarios, len(slots), results_csv, slots=slots, launch_command=launch_command,
+                         timeout=timeout, cache=cache, store=store, early_stop=early_stop)
 
-    failed = count_collisions(results_csv)
 
-    print(f"\n--- Summary ---")
-    print(f"Total Scenarios Run: {len(scenarios)}")
-    print(f"Collisions: {failed} ({(failed/len(scenarios))*100:.1f}%)")
+def run_workflow_shards(scenarios, results_csv, workers=1, worker_base=WORKER_OUTPUT_BASE, launch_command=None,
+                        cache=None, store=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Split scenarios into one shard per worker and run each shard as a single
+    workflow launch, so Autoware boots once per shard instead of once per scenario.
+    A shard's launch is killed after timeout seconds per scenario. Workflow mode
+    has no early stop (the launch moves on after each outcome by itself).
+    """
+    shard_count = max(1, min(workers, len(scenarios)))
+    shards = [scenarios[k::shard_count] for k in range(shard_count)]
+    slots = make_slots(shard_count, worker_base)
+
+    def run_shard(k, shard):
+        slot = slots[k]
+        print(f"🧩 Shard {k}: {len(shard)} scenarios in one launch ({slot['output_dir']})")
+        env = dict(os.environ, ROS_DOMAIN_ID=str(slot["domain_id"]))
+        return run_scenarios_as_workflow(shard, slot["output_dir"], results_csv,
+                                         launch_command=launch_command, env=env, cache=cache,
+                                         store=store, timeout=timeout)
+
+    with ThreadPoolExecutor(max_workers=shard_count) as pool:
+        futures = [pool.submit(run_shard, k, shard) for k, shard in enumerate(shards) if shard]
+        return [r for f in futures for r in f.result()]
+
+
+def recorded_scenarios(results_csv, store=None):
+    """
+    Scenario paths that already have a result for this batch (store or CSV).
+    """
+    if store is not None:
+        return store.recorded_scenarios(batch_info_from_csv(results_csv))
+    try:
+        with open(results_csv, newline="") as file:
+            return {row["scenario_yaml"] for row in csv.DictReader(file)}
+    except FileNotFoundError:
+        return set()
 
 
 def count_collisions(csv_path):
@@ -41,4 +136,5 @@ def count_collisions(csv_path):
 
 
 if __name__ == "__main__":
-    batch_run()
+    from results_store import ResultsStore
+    batch_run(store=ResultsStore())
@@ -0,0 +1,95 @@
+import sys
+import time
+import random
+import numpy as np
+import population_engine as pe
+from scenario_utils import crossover_batches, mutate_batch, round_scenario_hash
+
+# usage: python3 benchmark_population_engine.py [scenarios]
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+BATCH = 20  # mutate_batch is run the way the GA runs it, one batch at a time
+SEED = 7
+
+
+def ks_statistic(a, b):
+    """
+    Two-sample Kolmogorov-Smirnov D and its 5% critical value.
+    """
+    a, b = np.sort(a), np.sort(b)
+    grid = np.concatenate([a, b])
+    d = np.max(np.abs(np.searchsorted(a, grid, side="right") / len(a)
+                      - np.searchsorted(b, grid, side="right") / len(b)))
+    return d, 1.36 * np.sqrt((len(a) + len(b)) / (len(a) * len(b)))
+
+
+def describe(parents, children):
+    """
+    Per-scenario statistics compared between the two implementations.
+    """
+    changed = np.array([p != c for p, c in zip(parents, children)])
+    stats = {"changed": changed.astype(float)}
+    moved = changed.nonzero()[0]
+    for idx, name in ((1, "ego_s"), (3, "npc_s"), (5, "ego_dest_s"), (7, "npc_dest_s")):
+        stats[name] = np.array([children[i][idx] for i in moved])
+        stats[f"|d {name}|"] = np.array([abs(children[i][idx] - parents[i][idx]) for i in moved])
+    for idx, name in ((0, "ego_lane"), (2, "npc_lane")):
+        stats[f"{name} swapped"] = np.array([children[i][idx] != parents[i][idx] for i in moved], dtype=float)
+    stats["overlap"] = pe.overlap_mask(pe.from_tuples(children)).astype(float)
+    return stats
+
+
+def main():
+    random.seed(SEED)
+    rng = np.random.default_rng(SEED)
+    parents = pe.to_tuples(pe.unique_rows(pe.random_population(N, rng)))
+    parents = [p for p, bad in zip(parents, pe.overlap_mask(pe.from_tuples(parents))) if not bad]
+    print(f"{len(parents)} parent scenarios")
+
+    # --- current operators ---
+    t0 = time.perf_counter()
+    seen = set()
+    reference = []
+    for i in range(0, len(parents), BATCH):
+        reference += mutate_batch(parents[i:i + BATCH], seen=seen)
+    t_ref = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for i in range(0, len(parents), BATCH):
+        crossover_batches(parents[i:i + BATCH], parents[i + BATCH:i + 2 * BATCH] or parents[:BATCH])
+    t_ref_x = time.perf_counter() - t0
+
+    # --- array engine ---
+    pop = pe.from_tuples(parents)
+    t0 = time.perf_counter()
+    mutated = pe.mutate(pop, seen=set(), rng=rng)
+    t_vec = time.perf_counter() - t0
+    vectorized = pe.to_tuples(mutated)
+
+    t0 = time.perf_counter()
+    pe.crossover(pop, np.roll(pop, -BATCH), rng=rng)
+    t_vec_x = time.perf_counter() - t0
+
+    print(f"mutate:    {len(parents) / t_ref:12.0f} scenarios/s (mutate_batch)  "
+          f"{len(parents) / t_vec:12.0f} scenarios/s (engine)  x{t_ref / t_vec:.0f}")
+    print(f"crossover: {len(parents) / t_ref_x:12.0f} scenarios/s (crossover_batches)  "
+          f"{len(parents) / t_vec_x:12.0f} scenarios/s (engine)  x{t_ref_x / t_vec_x:.0f}")
+
+    # children are compared with their parent by position (mutate_batch only
+    # re-orders a batch when it had to de-duplicate it)
+    ref_stats = describe(parents, reference)
+    vec_stats = describe(parents, vectorized)
+    print(f"\n{'statistic':<20}{'mutate_batch':>14}{'engine':>14}{'KS D':>10}{'crit':>8}")
+    equivalent = True
+    for name in ref_stats:
+        a, b = ref_stats[name], vec_stats[name]
+        d, crit = ks_statistic(a, b)
+        flag = "" if d <= crit else "  <-- differs"
+        equivalent &= d <= crit
+        print(f"{name:<20}{a.mean():>14.3f}{b.mean():>14.3f}{d:>10.3f}{crit:>8.3f}{flag}")
+    print(f"\nunique hashes: {len({round_scenario_hash(p) for p in reference})} (mutate_batch) "
+          f"{len(pe.unique_rows(mutated))} (engine)")
+    print("✅ statistically equivalent" if equivalent else "⚠️ distributions differ")
+
+
+if __name__ == "__main__":
+    main()
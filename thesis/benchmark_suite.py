@@ -0,0 +1,389 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import argparse
+import itertools
+import platform
+import tempfile
+import contextlib
+import subprocess
+
+# Throughput of the Python side of the mining pipeline on synthetic inputs.
+# usage: python3 benchmark_suite.py [--scales 20,1000,100000] [--output bench.json] [--baseline old.json]
+#
+# Everything runs in a scratch map/workspace; the roots are set before the
+# pipeline modules are imported because they read them at import time.
+SCRATCH = tempfile.mkdtemp(prefix="thesis_bench_")
+os.environ["AUTOWARE_MAP"] = os.path.join(SCRATCH, "map")
+os.environ["ROS2_WS"] = os.path.join(SCRATCH, "ws")
+os.environ["SIM_BACKEND"] = "ros"  # ROS_LAUNCH_COMMAND is replaced by the fake simulator below
+os.makedirs(os.environ["AUTOWARE_MAP"])
+os.makedirs(os.environ["ROS2_WS"])
+
+import launch_scenario
+from compiled_template import compile_template
+from launch_scenario import CSV_COLUMNS, extract_scenario_parameters, log_result_to_csv, parse_result_xml
+from novelty_index import NoveltyIndex
+from scenario_generator import sample_params
+from scenario_keys import scenario_key
+from scenario_manifest import PARAM_KEYS, lookup_scenario_parameters
+from scenario_store import ScenarioStore
+from space_filling_sampler import iter_space_filling
+from scenario_utils import (
+    crossover_batches,
+    generate_batch_from_params,
+    mutate_batch,
+    read_collision_rate,
+    read_scenario_scores,
+    round_scenario_hash
+)
+
+SCALES = (20, 1000, 100000)
+BATCH = 20            # scenarios per batch, as in the GA
+IO_LIMIT = 10000      # scenario files / junit files / CSV rows written per stage
+YAML_LIMIT = 500      # full YAML parses (extract_scenario_parameters, ~20/s)
+E2E_LIMIT = 1000      # scenarios simulated by the end-to-end GA stage
+MIN_SECONDS = 0.2     # in-memory stages repeat until they ran this long (small scales are noisy)
+REGRESSION = 0.8      # --baseline: flag stages below this share of the baseline's ops/s
+SEED = 7
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "template.yaml")
+
+# Fake scenario_test_runner: writes a junit result (about one collision in four,
+# decided by the scenario file's checksum) and exits.
+FAKE_SIMULATOR = """
+for arg in "$@"; do
+  case "$arg" in
+    scenario:=*) scenario="${arg#scenario:=}" ;;
+    output_directory:=*) output="${arg#output_directory:=}" ;;
+  esac
+done
+mkdir -p "$output/scenario_test_runner"
+sum=$(cksum < "$scenario" | cut -d' ' -f1)
+if [ $((sum % 4)) -eq 0 ]; then
+  message="exitFailure: ego is colliding with another given entity Npc1"
+  failure="<failure type=\\"exitFailure\\" message=\\"$message\\"/>"
+  failures=1
+else
+  failure=""
+  failures=0
+fi
+echo "<testsuites failures=\\"$failures\\"><testsuite failures=\\"$failures\\"><testcase name=\\"s\\">$failure</testcase></testsuite></testsuites>" \\
+  > "$output/scenario_test_runner/result.junit.xml"
+[ $failures -eq 1 ] && echo "[ERROR] $message"
+exit 0
+"""
+
+
+def synthetic_params(n, rng_seed=SEED):
+    random.seed(rng_seed)
+    return [sample_params() for _ in range(n)]
+
+
+def junit_xml(collision):
+    failure = ('<failure type="exitFailure" message="exitFailure: ego is colliding with another '
+               'given entity Npc1"/>') if collision else ""
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<testsuites failures="{int(collision)}">'
+            f'<testsuite failures="{int(collision)}"><testcase name="s">{failure}</testcase>'
+            f'</testsuite></testsuites>\n')
+
+
+def write_results_csv(path, params_list):
+    rows = []
+    for i, params in enumerate(params_list):
+        collision = i % 4 == 0
+        row = dict(zip(PARAM_KEYS, params))
+        row.update({
+            "scenario_yaml": f"scenario_{i}.yaml", "collision": collision,
+            "result_type": "collision" if collision else "success", "collided_with": "Npc1" if collision else "",
+            "failure_message": "", "min_distance": 3.2, "min_ttc": 1.5, "criticality": 0.4
+        })
+        rows.append(row)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# --- stages: each returns (operations, seconds); setup stays outside the timed part ---
+
+def stage_round_scenario_hash(params, work_dir):
+    t0 = time.perf_counter()
+    for p in params:
+        round_scenario_hash(p)
+    return len(params), time.perf_counter() - t0
+
+
+def stage_scenario_key(params, work_dir):
+    t0 = time.perf_counter()
+    for p in params:
+        scenario_key(p)
+    return len(params), time.perf_counter() - t0
+
+
+def stage_space_filling(params, work_dir):
+    # candidates streamed from the sampler (scales compare with sample_params draws)
+    t0 = time.perf_counter()
+    count = sum(1 for _ in itertools.islice(iter_space_filling(seed=SEED), len(params)))
+    return count, time.perf_counter() - t0
+
+
+def stage_novelty_index(params, work_dir):
+    # score each tuple against everything before it, then add it (as the GA does per batch)
+    index = NoveltyIndex()
+    t0 = time.perf_counter()
+    for p in params:
+        index.novelty(p)
+        index.add(p)
+    return len(params), time.perf_counter() - t0
+
+
+def stage_crossover_batches(params, work_dir):
+    t0 = time.perf_counter()
+    for i in range(0, len(params), BATCH):
+        crossover_batches(params[i:i + BATCH], params[i + BATCH:i + 2 * BATCH] or params[:BATCH])
+    return len(params), time.perf_counter() - t0
+
+
+def stage_mutate_batch(params, work_dir):
+    seen = set()
+    t0 = time.perf_counter()
+    for i in range(0, len(params), BATCH):
+        mutate_batch(params[i:i + BATCH], seen=seen, key_fn=scenario_key)
+    return len(params), time.perf_counter() - t0
+
+
+def stage_generate_batch_from_params(params, work_dir):
+    out = os.path.join(work_dir, "generated")
+    compile_template(TEMPLATE)  # parsed once per process in the pipeline too
+    t0 = time.perf_counter()
+    for i in range(0, len(params), 1000):
+        generate_batch_from_params(TEMPLATE, os.path.join(out, f"batch{i // 1000}"), params[i:i + 1000])
+    return len(params), time.perf_counter() - t0
+
+
+def stage_scenario_store(params, work_dir):
+    # stage each batch and link it into an evaluation workdir, as the GA does
+    store = ScenarioStore(os.path.join(work_dir, "store"))
+    out = os.path.join(work_dir, "staged")
+    compile_template(TEMPLATE)
+    t0 = time.perf_counter()
+    for i in range(0, len(params), 1000):
+        batch_dir = os.path.join(out, f"batch{i // 1000}")
+        store.stage(TEMPLATE, batch_dir, params[i:i + 1000])
+        store.link_view(batch_dir, os.path.join(out, f"work{i // 1000}"))
+    return len(params), time.perf_counter() - t0
+
+
+def _scenario_files(params, work_dir):
+    out = os.path.join(work_dir, "scenarios")
+    if not os.path.exists(out):
+        generate_batch_from_params(TEMPLATE, out, params)
+    return [os.path.join(out, f"scenario_{i}.yaml") for i in range(len(params))]
+
+
+def stage_extract_scenario_parameters(params, work_dir):
+    files = _scenario_files(params, work_dir)
+    t0 = time.perf_counter()
+    for path in files:
+        extract_scenario_parameters(path)
+    return len(files), time.perf_counter() - t0
+
+
+def stage_scenario_parameters_manifest(params, work_dir):
+    files = _scenario_files(params, work_dir)
+    t0 = time.perf_counter()
+    for path in files:
+        lookup_scenario_parameters(path)
+    return len(files), time.perf_counter() - t0
+
+
+def stage_parse_result_xml(params, work_dir):
+    out = os.path.join(work_dir, "junit")
+    os.makedirs(out, exist_ok=True)
+    paths = []
+    for i in range(len(params)):
+        path = os.path.join(out, f"result_{i}.junit.xml")
+        with open(path, "w") as f:
+            f.write(junit_xml(i % 4 == 0))
+        paths.append(path)
+    t0 = time.perf_counter()
+    for path in paths:
+        parse_result_xml(path)
+    return len(paths), time.perf_counter() - t0
+
+
+def stage_log_result_to_csv(params, work_dir):
+    path = os.path.join(work_dir, "logged.csv")
+    result = {"collision": True, "message": "", "collided_with": "Npc1", "result_type": "collision",
+              "min_distance": 0.0, "min_ttc": 0.0, "criticality": 1.0}
+    rows = [dict(zip(PARAM_KEYS, p)) for p in params]
+    t0 = time.perf_counter()
+    for i, row in enumerate(rows):
+        log_result_to_csv(path, f"scenario_{i}.yaml", result, row)
+    return len(rows), time.perf_counter() - t0
+
+
+def stage_read_collision_rate(params, work_dir):
+    path = os.path.join(work_dir, "fitness.csv")
+    write_results_csv(path, params)
+    t0 = time.perf_counter()
+    read_collision_rate(path)
+    return len(params), time.perf_counter() - t0
+
+
+def stage_read_scenario_scores(params, work_dir):
+    path = os.path.join(work_dir, "fitness.csv")
+    write_results_csv(path, params)
+    t0 = time.perf_counter()
+    read_scenario_scores(path)
+    return len(params), time.perf_counter() - t0
+
+
+def stage_ga_generation(params, work_dir):
+    """
+    Two generations of genetic_optimizer.evolve against the fake simulator:
+    seed CSV -> evaluate (orchestrator, store, cache) -> breed -> evaluate.
+    Operations are simulated scenarios.
+    """
+    import genetic_optimizer as ga
+    fake = os.path.join(work_dir, "fake_simulator.sh")
+    with open(fake, "w") as f:
+        f.write(FAKE_SIMULATOR)
+    launch_scenario.ROS_LAUNCH_COMMAND = ["/bin/sh", fake]
+
+    shutil.copy(TEMPLATE, ga.TEMPLATE)
+    batch = min(BATCH, max(1, len(params) // 2))
+    saved = {name: getattr(ga, name) for name in ("POP_SIZE", "SCENARIOS_PER_BATCH", "GENERATIONS",
+                                                    "ELITE_SCENARIOS", "USE_LANE_INDEX")}
+    ga.POP_SIZE = max(2, len(params) // batch)
+    ga.SCENARIOS_PER_BATCH = batch
+    ga.ELITE_SCENARIOS = 2 * batch
+    ga.GENERATIONS = 2
+    ga.USE_LANE_INDEX = False
+    write_results_csv(str(ga.INITIAL_CSV_PATH), params)
+    for path in (ga.RESULT_CACHE_PATH, ga.RESULTS_DB_PATH, ga.CHECKPOINT_PATH, ga.COVERAGE_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+    try:
+        simulated = ga.GENERATIONS * ga.POP_SIZE * ga.SCENARIOS_PER_BATCH
+        t0 = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            ga.evolve()
+        seconds = time.perf_counter() - t0
+    finally:
+        for name, value in saved.items():
+            setattr(ga, name, value)
+    return simulated, seconds
+
+
+# name: (stage function, cap on scenarios per run or None)
+STAGES = {
+    "round_scenario_hash": (stage_round_scenario_hash, None),
+    "scenario_key": (stage_scenario_key, None),
+    "space_filling": (stage_space_filling, None),
+    "novelty_index": (stage_novelty_index, None),
+    "crossover_batches": (stage_crossover_batches, None),
+    "mutate_batch": (stage_mutate_batch, None),
+    "generate_batch_from_params": (stage_generate_batch_from_params, IO_LIMIT),
+    "scenario_store": (stage_scenario_store, IO_LIMIT),
+    "extract_scenario_parameters": (stage_extract_scenario_parameters, YAML_LIMIT),
+    "scenario_parameters_manifest": (stage_scenario_parameters_manifest, IO_LIMIT),
+    "parse_result_xml": (stage_parse_result_xml, IO_LIMIT),
+    "log_result_to_csv": (stage_log_result_to_csv, IO_LIMIT),
+    "read_collision_rate": (stage_read_collision_rate, None),
+    "read_scenario_scores": (stage_read_scenario_scores, None),
+    "ga_generation": (stage_ga_generation, E2E_LIMIT),
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_suite(scales=SCALES, stages=None, full=False):
+    results = []
+    for scale in scales:
+        params = synthetic_params(scale)
+        for name in stages or STAGES:
+            fn, limit = STAGES[name]
+            n = scale if full or limit is None else min(scale, limit)
+            ops = seconds = 0
+            while True:
+                work_dir = tempfile.mkdtemp(dir=SCRATCH)
+                try:
+                    stage_ops, stage_seconds = fn(params[:n], work_dir)
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+                ops, seconds = ops + stage_ops, seconds + stage_seconds
+                if limit is not None or seconds >= MIN_SECONDS:
+                    break
+            entry = {"stage": name, "scale": scale, "n": ops, "seconds": round(seconds, 6),
+                     "ops_per_sec": round(ops / seconds, 1) if seconds > 0 else None}
+            results.append(entry)
+            capped = f" (capped at {n})" if n < scale else ""
+            print(f"{name:<30}{scale:>8}{entry['ops_per_sec'] or 0:>14.0f} ops/s{capped}")
+    return results
+
+
+def compare(results, baseline_path, threshold=REGRESSION):
+    """
+    Stages slower than threshold x the baseline's ops/s; prints and returns them.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["scale"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for entry in results:
+        old = baseline.get((entry["stage"], entry["scale"]))
+        if old and old["ops_per_sec"] and entry["ops_per_sec"] is not None \
+                and entry["ops_per_sec"] < threshold * old["ops_per_sec"]:
+            regressions.append(entry)
+            print(f"⚠️ {entry['stage']} @ {entry['scale']}: {entry['ops_per_sec']:.0f} ops/s, "
+                  f"baseline {old['ops_per_sec']:.0f}")
+    if not regressions:
+        print("✅ No regressions against the baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mining pipeline throughput benchmarks")
+    parser.add_argument("--scales", default=",".join(map(str, SCALES)),
+                        help="comma-separated scenario counts")
+    parser.add_argument("--stages", help=f"comma-separated subset of: {', '.join(STAGES)}")
+    parser.add_argument("--full", action="store_true", help="run file and end-to-end stages at every scale too")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier --output file; exit 1 when a stage regressed")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",")]
+    stages = args.stages.split(",") if args.stages else None
+    try:
+        results = run_suite(scales, stages, args.full)
+    finally:
+        shutil.rmtree(SCRATCH, ignore_errors=True)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Results written to {args.output}")
+
+    if args.baseline and compare(results, args.baseline):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import json
+import random
+
+CHECKPOINT_NAME = "ga_checkpoint.json"
+
+
+def _to_params(values):
+    return [tuple(p) for p in values]
+
+
+def save_checkpoint(path, generation, phase, population, population_params, seen_hashes,
+                    scored=(), elite=(), run_id=None):
+    """
+    Atomically write the GA state (written to a temp file, fsynced, then renamed),
+    so a crash mid-write leaves the previous checkpoint intact.
+    phase: "bred" (population ready, generation not yet evaluated) or
+    "evaluated" (scored holds the generation's (batch path, fitness) ranking).
+    """
+    version, internal, gauss_next = random.getstate()
+    state = {
+        "generation": generation,
+        "phase": phase,
+        "population": [str(p) for p in population],
+        "population_params": [[list(p) for p in batch] for batch in population_params],
+        "seen_hashes": list(seen_hashes),
+        "scored": [[str(batch_path), fitness] for batch_path, fitness in scored],
+        "elite": [[score, list(params)] for score, params in elite],
+        "run_id": run_id,
+        "rng_state": [version, list(internal), gauss_next]
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """
+    Checkpoint dict with tuples restored and the RNG reseeded to its saved state,
+    or None when there is no checkpoint.
+    """
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    version, internal, gauss_next = state["rng_state"]
+    random.setstate((version, tuple(internal), gauss_next))
+    state["population_params"] = [_to_params(batch) for batch in state["population_params"]]
+    state["seen_hashes"] = set(state["seen_hashes"])
+    state["elite"] = [(score, tuple(params)) for score, params in state["elite"]]
+    return state
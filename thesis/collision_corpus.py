@@ -0,0 +1,252 @@
+import sys
+import csv
+import math
+import argparse
+from pathlib import Path
+from launch_scenario import batch_info_from_csv
+from results_store import PARAM_COLUMNS, ResultsStore
+from scenario_keys import scenario_key
+from paths import ws_path
+
+# Every collision found so far, in one place: deduplicated by scenario_key,
+# with its result metadata, and clustered into failure regions. A region is a
+# start lane pair (ego, NPC) plus a neighbourhood of the start positions (where
+# the vehicles meet depends on those; the destinations hardly matter). Collisions
+# are assigned to the nearest cluster centre within CLUSTER_RADIUS as they arrive
+# (leader clustering), so refreshing never re-clusters the corpus. An entry's
+# file is its mined, content-addressed copy (mined_yaml); the batch workdir file
+# it ran from is rewritten by later runs. Collisions recorded before mined paths
+# were kept have none.
+CLUSTER_RADIUS = 3.0      # m over (ego s, NPC s)
+DEST_MISMATCH = 5.0       # near(): m added per differing destination lane
+NEAR_RADIUS = 5.0         # default radius of near(), over all four s positions
+SEEDS_PER_CLUSTER = 5     # seed_params: members taken from each cluster
+RESULTS_BASE = Path(ws_path("simulation_results"))
+
+
+def _positions(params):
+    return (float(params[1]), float(params[3]), float(params[5]), float(params[7]))
+
+
+def distance(params_a, params_b):
+    """
+    Distance of two tuples on the same start lane pair over all four s positions,
+    with DEST_MISMATCH per differing destination lane (inf on different start lanes).
+    """
+    if (str(params_a[0]), str(params_a[2])) != (str(params_b[0]), str(params_b[2])):
+        return math.inf
+    d = math.dist(_positions(params_a), _positions(params_b))
+    return d + DEST_MISMATCH * ((str(params_a[4]) != str(params_b[4])) + (str(params_a[6]) != str(params_b[6])))
+
+
+class Cluster:
+    """
+    One failure region: members (corpus entries) and the running mean of their start positions.
+    """
+
+    def __init__(self, cluster_id, entry):
+        self.id = cluster_id
+        self.lane_pair = (str(entry["params"][0]), str(entry["params"][2]))
+        self.members = []
+        self.centre = [0.0, 0.0]
+        self._extent = None
+        self.add(entry)
+
+    def add(self, entry):
+        self.members.append(entry)
+        n = len(self.members)
+        for i, s in enumerate(_positions(entry["params"])[:2]):
+            self.centre[i] += (s - self.centre[i]) / n
+        entry["cluster"] = self.id
+        self._extent = None
+
+    def extent(self):
+        """
+        Largest distance of a member's start positions from the centre (cached until the next add).
+        """
+        if self._extent is None:
+            self._extent = max(self.centre_distance(entry["params"]) for entry in self.members)
+        return self._extent
+
+    def centre_distance(self, params):
+        return math.dist(self.centre, (float(params[1]), float(params[3])))
+
+    def representative(self):
+        """
+        The member closest to the cluster centre.
+        """
+        return min(self.members, key=lambda entry: self.centre_distance(entry["params"]))
+
+
+class CollisionCorpus:
+    """
+    Collisions from the results store (or, without one, from every results CSV),
+    loaded incrementally: refresh() only reads what was recorded since the last call.
+    """
+
+    def __init__(self, store=None, results_base=RESULTS_BASE, radius=CLUSTER_RADIUS):
+        self.store = store
+        self.results_base = Path(results_base)
+        self.radius = radius
+        self.entries = {}       # scenario_key -> entry
+        self.clusters = []
+        self._by_pair = {}      # start lane pair -> [cluster]
+        self._last_id = 0       # store: highest results.id read
+        self._csv_rows = {}     # CSV mode: rows read per file
+
+    def add(self, params, **metadata):
+        """
+        Index one collision; a scenario seen again only counts as another observation.
+        Returns the entry.
+        """
+        params = (str(params[0]), float(params[1]), str(params[2]), float(params[3]),
+                  str(params[4]), float(params[5]), str(params[6]), float(params[7]))
+        key = scenario_key(params)
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry["observations"] += 1
+            if not entry.get("mined_yaml"):
+                entry["mined_yaml"] = metadata.get("mined_yaml")
+            return entry
+        entry = dict(metadata, params=params, observations=1)
+        self.entries[key] = entry
+
+        pair = (params[0], params[2])
+        candidates = self._by_pair.setdefault(pair, [])
+        nearest = min(candidates, key=lambda c: c.centre_distance(params), default=None)
+        if nearest is not None and nearest.centre_distance(params) <= self.radius:
+            nearest.add(entry)
+        else:
+            cluster = Cluster(len(self.clusters), entry)
+            self.clusters.append(cluster)
+            candidates.append(cluster)
+        return entry
+
+    def refresh(self):
+        """
+        Index collisions recorded since the last refresh. Returns how many rows were read.
+        """
+        if self.store is not None:
+            return self._refresh_store()
+        return self._refresh_csvs()
+
+    def _refresh_store(self):
+        rows = self.store.collisions_since(self._last_id)
+        for (row_id, run_id, batch_info, mined_yaml, collided_with, message, min_ttc, recorded_at,
+             *params) in rows:
+            self.add(params, run_id=run_id, batch_info=batch_info, mined_yaml=mined_yaml,
+                     collided_with=collided_with, message=message, min_ttc=min_ttc, recorded_at=recorded_at)
+            self._last_id = row_id
+        return len(rows)
+
+    def _refresh_csvs(self):
+        read = 0
+        for csv_path in sorted(self.results_base.glob("*.csv")):
+            done = self._csv_rows.get(csv_path, 0)
+            try:
+                with open(csv_path, newline="") as file:
+                    rows = list(csv.DictReader(file))
+            except OSError:
+                continue
+            if len(rows) < done:  # the batch was re-run from scratch
+                done = 0
+            for row in rows[done:]:
+                if row.get("result_type", "").strip().lower() != "collision":
+                    continue
+                params = tuple(row.get(column) for column in PARAM_COLUMNS)
+                if not all(params):
+                    continue  # a result without its parameters cannot seed anything
+                self.add(params, run_id=None, batch_info=batch_info_from_csv(csv_path),
+                         mined_yaml=row.get("mined_yaml") or None, collided_with=row.get("collided_with"),
+                         message=row.get("failure_message"), min_ttc=row.get("min_ttc") or None, recorded_at=None)
+            read += len(rows) - done
+            self._csv_rows[csv_path] = len(rows)
+        return read
+
+    def __len__(self):
+        return len(self.entries)
+
+    def representatives(self):
+        """
+        (cluster, representative entry) of every cluster, largest clusters first.
+        """
+        ranked = sorted(self.clusters, key=lambda c: len(c.members), reverse=True)
+        return [(cluster, cluster.representative()) for cluster in ranked]
+
+    def near(self, params, radius=NEAR_RADIUS):
+        """
+        [(distance, entry)] of collisions within radius of a tuple, nearest first.
+        """
+        found = []
+        for cluster in self._by_pair.get((str(params[0]), str(params[2])), ()):
+            # distance() is at least the start-position distance, so whole clusters can be ruled out
+            if cluster.centre_distance(params) - cluster.extent() > radius:
+                continue
+            for entry in cluster.members:
+                d = distance(params, entry["params"])
+                if d <= radius:
+                    found.append((d, entry))
+        return sorted(found, key=lambda item: item[0])
+
+    def seed_params(self, per_cluster=SEEDS_PER_CLUSTER):
+        """
+        GA seed tuples balanced over failure regions: each cluster's representative
+        first, then up to per_cluster members, so large clusters do not crowd out rare ones.
+        """
+        seeds = []
+        for cluster, representative in self.representatives():
+            seeds.append(representative["params"])
+            seeds += [entry["params"] for entry in cluster.members[:per_cluster]
+                      if entry is not representative][:per_cluster - 1]
+        return seeds
+
+    def summary(self, top=5):
+        observations = sum(entry["observations"] for entry in self.entries.values())
+        lines = [f"📚 Collision corpus: {len(self.entries)} distinct collisions ({observations} observed) "
+                 f"in {len(self.clusters)} failure regions over {len(self._by_pair)} lane pairs"]
+        for cluster, representative in self.representatives()[:top]:
+            partners = {entry["collided_with"] for entry in cluster.members if entry.get("collided_with")}
+            lines.append(f"   #{cluster.id} {cluster.lane_pair[0]}-{cluster.lane_pair[1]}: "
+                         f"{len(cluster.members)} collisions, e.g. {_describe(representative)}"
+                         + (f" (with {', '.join(sorted(partners))})" if partners else ""))
+        return "\n".join(lines)
+
+
+def _describe(entry):
+    return entry["mined_yaml"] or str(entry["params"])
+
+
+def load_corpus(store=None, results_base=RESULTS_BASE):
+    corpus = CollisionCorpus(store, results_base)
+    corpus.refresh()
+    if store is not None and not len(corpus):
+        # a workspace from before the results store: its collisions are only in the CSVs
+        corpus = CollisionCorpus(None, results_base)
+        corpus.refresh()
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clustered corpus of mined collision scenarios")
+    parser.add_argument("--db", help="results store (default: the standard results.sqlite; --csv to read CSVs)")
+    parser.add_argument("--csv", action="store_true", help="read the results CSVs instead of the store")
+    parser.add_argument("--near", help="ego_lane,ego_s,npc_lane,npc_s,ego_dest,ego_dest_s,npc_dest,npc_dest_s")
+    parser.add_argument("--radius", type=float, default=NEAR_RADIUS)
+    parser.add_argument("--top", type=int, default=10, help="clusters listed in the summary")
+    args = parser.parse_args()
+
+    store = None if args.csv else (ResultsStore(args.db) if args.db else ResultsStore())
+    corpus = load_corpus(store)
+    print(corpus.summary(top=args.top))
+    if args.near:
+        params = args.near.split(",")
+        if len(params) != 8:
+            print("❌ --near needs 8 comma-separated values")
+            return 1
+        for d, entry in corpus.near(params, args.radius):
+            print(f"   {d:5.2f} m  {entry['mined_yaml'] or '(not mined)'}  {entry['params']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
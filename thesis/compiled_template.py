@@ -0,0 +1,156 @@
+import os
+import re
+import io
+from datetime import datetime
+from functools import lru_cache
+from ruamel.yaml import YAML
+from ruamel.yaml.scalarstring import ScalarString, SingleQuotedScalarString
+
+yaml = YAML()
+yaml.preserve_quotes = True
+yaml.indent(mapping=2, sequence=4, offset=2)
+
+# Placeholder written into each patched slot; dumps bare or, in slots that
+# keep the template's quoting, wrapped in single quotes
+_SLOT = "zzslot{}zz"
+_SLOT_RE = re.compile(r"'?zzslot(\d+)zz'?")
+
+# Slot order for parameter tuples (same as scenario_utils.generate_batch_from_params)
+PARAM_SLOTS = [
+    ("ego", 0, "laneId"), ("ego", 0, "s"),
+    ("Npc1", 0, "laneId"), ("Npc1", 0, "s"),
+    ("ego", 1, "laneId"), ("ego", 1, "s"),
+    ("Npc1", 1, "laneId"), ("Npc1", 1, "s"),
+]
+HEADER_SLOTS = ["date", "description", "author"]
+
+
+def _lane_position(private_action, action_index):
+    actions = private_action["PrivateAction"]
+    if action_index == 0:
+        return actions[0]["TeleportAction"]["Position"]["LanePosition"]
+    return actions[1]["RoutingAction"]["AcquirePositionAction"]["Position"]["LanePosition"]
+
+
+@lru_cache(maxsize=65536, typed=True)
+def _dump_scalar(value):
+    buf = io.StringIO()
+    yaml.dump({"k": value}, buf)
+    return buf.getvalue()[len("k:"):].rstrip("\n").lstrip(" ")
+
+
+def render_scalar(value):
+    """
+    Text ruamel would emit for `value` in a mapping slot of the template.
+    Floats and numeric lane IDs take a fast path; anything else is dumped once and cached.
+    """
+    if type(value) is float and value == value and value not in (float("inf"), float("-inf")):
+        return repr(value)
+    if type(value) is str and value.isascii() and value.isdigit():
+        return f"'{value}'"  # would resolve as int, so ruamel single-quotes it
+    if type(value) is SingleQuotedScalarString and "\n" not in value:
+        return "'" + value.replace("'", "''") + "'"
+    if type(value) is int:
+        return str(value)
+    return _dump_scalar(value)
+
+
+class CompiledTemplate:
+    """
+    template.yaml parsed and dumped once, with the ego/Npc1 teleport and routing
+    LanePosition slots (and optionally the FileHeader) left as holes.
+    Rendering fills the holes with text, producing the same bytes as patching
+    the loaded document and round-trip-dumping it.
+    """
+
+    def __init__(self, template_path, with_header=False):
+        self.template_path = template_path
+        self.with_header = with_header
+
+        with open(template_path, "r") as f:
+            data = yaml.load(f)
+
+        # ruamel keeps the quoting style of a replaced ScalarString when a plain str
+        # is assigned, so remember each slot's style to reproduce that on render
+        self._styles = []
+
+        def patch(mapping, key):
+            old = mapping[key]
+            self._styles.append(type(old) if isinstance(old, ScalarString) else None)
+            mapping[key] = _SLOT.format(len(self._styles) - 1)
+
+        for entity, action_index, key in PARAM_SLOTS:
+            for private_action in data["OpenSCENARIO"]["Storyboard"]["Init"]["Actions"]["Private"]:
+                if private_action.get("entityRef", "") == entity:
+                    patch(_lane_position(private_action, action_index), key)
+        if with_header:
+            header = data["OpenSCENARIO"]["FileHeader"]
+            for key in HEADER_SLOTS:
+                patch(header, key)
+
+        buf = io.StringIO()
+        yaml.dump(data, buf)
+        pieces = _SLOT_RE.split(buf.getvalue())
+        # pieces alternate: literal text, slot number, literal text, ...
+        self._literals = pieces[0::2]
+        self._order = [int(n) for n in pieces[1::2]]
+
+    def render(self, params, header=None):
+        """
+        params: (ego_lane, ego_s, npc_lane, npc_s, ego_dest_lane, ego_dest_s, npc_dest_lane, npc_dest_s)
+        header: (date, description, author), required when compiled with_header.
+        """
+        values = list(params)
+        if self.with_header:
+            values += list(header)
+        values = [
+            render_scalar(style(v) if style and type(v) is str else v)
+            for v, style in zip(values, self._styles)
+        ]
+        out = [self._literals[0]]
+        for slot, literal in zip(self._order, self._literals[1:]):
+            if not values[slot] and out[-1].endswith(" "):
+                out[-1] = out[-1][:-1]  # empty scalars (None) are emitted as "key:"
+            out.append(values[slot])
+            out.append(literal)
+        return "".join(out)
+
+    def write(self, output_path, params, header=None):
+        with open(output_path, "w") as f:
+            f.write(self.render(params, header))
+
+    def write_batch(self, output_dir, batch_params):
+        """
+        Bulk emission: scenario_{i}.yaml for every tuple, no YAML work per file,
+        plus the parameter manifest for the directory. Compiled with_header, each
+        file gets its own scenario_header(i), as generate_scenario writes it.
+        Accepts any iterable, so large candidate pools can be streamed.
+        Returns the number of files written.
+        """
+        from scenario_manifest import ManifestWriter
+        count = 0
+        with ManifestWriter(output_dir) as manifest:
+            for i, params in enumerate(batch_params):
+                file_name = f"scenario_{i}.yaml"
+                header = scenario_header(i) if self.with_header else None
+                self.write(os.path.join(output_dir, file_name), params, header)
+                manifest.add(file_name, params)
+                count += 1
+        return count
+
+
+@lru_cache(maxsize=8)
+def _compile_cached(template_path, mtime, with_header):
+    return CompiledTemplate(template_path, with_header)
+
+
+def compile_template(template_path, with_header=False):
+    """
+    Compiled template for template_path, recompiled only when the file changes.
+    """
+    return _compile_cached(template_path, os.path.getmtime(template_path), with_header)
+
+
+def scenario_header(scenario_index, author="Markus Puudersell"):
+    now_iso = datetime.utcnow().isoformat(timespec="milliseconds") + 'Z'
+    return (now_iso, f"Mined scenario for AV safety validation - scenario {scenario_index}", author)
@@ -0,0 +1,77 @@
+import re
+
+# Ego-NPC telemetry lines of entity_monitor.py (the real stack: scenario_test_runner
+# itself prints no distance or time-to-collision) and of the kinematic stub, which
+# prints the same format. Running minima, one line per report:
+#   [entity_monitor] t=12.50 min_distance=3.21 min_ttc=1.80
+# Only whole lines with exactly this prefix count; other nodes' output is ignored.
+TELEMETRY_PREFIX = "[entity_monitor]"
+TELEMETRY_RE = re.compile(
+    r"^" + re.escape(TELEMETRY_PREFIX) + r" t=\d+(?:\.\d+)? min_distance=(\d+(?:\.\d+)?)(?: min_ttc=(\d+(?:\.\d+)?))?$"
+)
+
+# columns added to result records
+METRIC_KEYS = ("min_distance", "min_ttc", "criticality")
+
+
+def telemetry_line(t, min_distance, min_ttc=None):
+    line = f"{TELEMETRY_PREFIX} t={t:.2f} min_distance={min_distance:.2f}"
+    return line + (f" min_ttc={min_ttc:.2f}" if min_ttc is not None else "")
+
+
+class TelemetryTracker:
+    """
+    Line handler that keeps the minimum ego-NPC distance and time-to-collision
+    reported by telemetry lines while the run is in progress.
+    Never asks to stop the run.
+    """
+
+    def __init__(self):
+        self.min_distance = None
+        self.min_ttc = None
+
+    def __call__(self, line):
+        match = TELEMETRY_RE.match(line.rstrip())
+        if match is not None:
+            distance, ttc = match.groups()
+            self.min_distance = float(distance) if self.min_distance is None else min(self.min_distance, float(distance))
+            if ttc is not None:
+                self.min_ttc = float(ttc) if self.min_ttc is None else min(self.min_ttc, float(ttc))
+        return False
+
+    def metrics(self, result):
+        return {
+            "min_distance": self.min_distance,
+            "min_ttc": self.min_ttc,
+            "criticality": criticality_score(result, self.min_distance, self.min_ttc)
+        }
+
+
+def criticality_score(result, min_distance=None, min_ttc=None):
+    """
+    Continuous per-scenario fitness in [0, 1]: 1.0 for a collision, otherwise
+    higher the closer (in metres, or seconds to collision) the vehicles came.
+    Near-misses always stay below a collision; runs without telemetry fall back to 0/1.
+    """
+    if result.get("result_type") == "collision":
+        return 1.0
+    scores = []
+    if min_distance is not None:
+        scores.append(0.9 / (1.0 + max(min_distance, 0.0)))
+    if min_ttc is not None:
+        scores.append(0.9 / (1.0 + min_ttc))
+    return round(max(scores), 4) if scores else 0.0
+
+
+def scan_log(log_path, result):
+    """
+    Metrics from a finished run's log (for callers that did not stream it).
+    """
+    tracker = TelemetryTracker()
+    try:
+        with open(log_path, errors="replace") as f:
+            for line in f:
+                tracker(line)
+    except OSError:
+        pass
+    return tracker.metrics(result)
@@ -0,0 +1,109 @@
+import sys
+import math
+from criticality import telemetry_line
+
+# Ego-NPC distance and time-to-collision of a running scenario_simulator_v2
+# scenario. scenario_test_runner prints neither, but the simulator publishes
+# every entity's pose and twist on ENTITY_STATUS_TOPIC; the orchestrator starts
+# this node next to each ROS launch (same ROS_DOMAIN_ID) and reads its
+# criticality.telemetry_line output. Needs the sourced scenario_simulator_v2
+# workspace (rclpy, traffic_simulator_msgs).
+# usage: python3 entity_monitor.py [ego_name npc_name]
+ENTITY_STATUS_TOPIC = "/simulation/entity/status"
+EGO_NAME = "ego"
+NPC_NAME = "Npc1"
+REPORT_EVERY = 0.2   # seconds of simulation time between lines (only when a minimum improved)
+
+
+def _yaw(orientation):
+    q = orientation
+    return math.atan2(2.0 * (q.w * q.z + q.x * q.y), 1.0 - 2.0 * (q.y * q.y + q.z * q.z))
+
+
+def _velocity(status):
+    # twist is in the entity's frame: rotate into the map frame
+    yaw = _yaw(status.pose.orientation)
+    vx, vy = status.action_status.twist.linear.x, status.action_status.twist.linear.y
+    return vx * math.cos(yaw) - vy * math.sin(yaw), vx * math.sin(yaw) + vy * math.cos(yaw)
+
+
+def distance_and_ttc(ego, npc):
+    """
+    Centre distance of two EntityStatus messages and their time to collision at
+    the current closing speed (None when they are not closing in).
+    """
+    dx = npc.pose.position.x - ego.pose.position.x
+    dy = npc.pose.position.y - ego.pose.position.y
+    distance = math.hypot(dx, dy)
+    (evx, evy), (nvx, nvy) = _velocity(ego), _velocity(npc)
+    closing = -(dx * (nvx - evx) + dy * (nvy - evy)) / distance if distance > 0 else 0.0
+    return distance, (distance / closing if closing > 0 else None)
+
+
+class MinimumReporter:
+    """
+    Running minima of distance and TTC, printed as a telemetry line at most every
+    REPORT_EVERY seconds of simulation time, and only when one of them improved.
+    """
+
+    def __init__(self, every=REPORT_EVERY, out=sys.stdout):
+        self.every = every
+        self.out = out
+        self.min_distance = None
+        self.min_ttc = None
+        self.changed = False
+        self.last_report = None
+
+    def update(self, t, distance, ttc):
+        if self.min_distance is None or distance < self.min_distance:
+            self.min_distance, self.changed = distance, True
+        if ttc is not None and (self.min_ttc is None or ttc < self.min_ttc):
+            self.min_ttc, self.changed = ttc, True
+        if self.changed and (self.last_report is None or t - self.last_report >= self.every):
+            self.report(t)
+
+    def report(self, t):
+        if self.min_distance is not None:
+            print(telemetry_line(t, self.min_distance, self.min_ttc), file=self.out, flush=True)
+        self.changed = False
+        self.last_report = t
+
+
+def main(argv):
+    ego_name, npc_name = argv[:2] if len(argv) >= 2 else (EGO_NAME, NPC_NAME)
+    try:
+        import rclpy
+        from rclpy.executors import ExternalShutdownException
+        from traffic_simulator_msgs.msg import EntityStatusWithTrajectoryArray
+    except ImportError as e:
+        print(f"⚠️ entity_monitor needs the sourced scenario_simulator_v2 workspace ({e}); no telemetry",
+              file=sys.stderr)
+        return 1
+
+    reporter = MinimumReporter()
+    sim_time = [0.0]
+
+    def on_status(msg):
+        statuses = {entry.status.name: entry.status for entry in msg.data}
+        if ego_name in statuses and npc_name in statuses:
+            sim_time[0] = statuses[ego_name].time
+            reporter.update(sim_time[0], *distance_and_ttc(statuses[ego_name], statuses[npc_name]))
+
+    rclpy.init()
+    node = rclpy.create_node("entity_monitor")
+    node.create_subscription(EntityStatusWithTrajectoryArray, ENTITY_STATUS_TOPIC, on_status, 10)
+    try:
+        rclpy.spin(node)
+    except (KeyboardInterrupt, ExternalShutdownException):
+        pass
+    finally:
+        if reporter.changed:
+            reporter.report(sim_time[0])
+        node.destroy_node()
+        if rclpy.ok():
+            rclpy.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
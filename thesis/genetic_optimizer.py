@@ -1,37 +1,90 @@
 import os
 import shutil
+import argparse
+import filecmp
 import random
 import csv
 from batch_run_scenarios import batch_run
+from launch_scenario import batch_info_from_csv
+from result_cache import ResultCache, config_fingerprint
+from results_store import ResultsStore
+from scenario_manifest import MANIFEST_NAME
+from work_queue import WorkQueue
+from simulator_backends import get_backend
+from checkpoint import CHECKPOINT_NAME, load_checkpoint, save_checkpoint
+from surrogate import KNNSurrogate, ScreeningReport, screen_candidates
+from lanelet_index import load_index
+from novelty_index import NoveltyIndex
+from collision_corpus import load_corpus
+from run_trace import end_generation, start_generation, start_tracing, trace_phase
+from scenario_store import GENERATED_STORE, get_store
+import population_engine
 from scenario_utils import (
     generate_batch_from_params,
     crossover_batches,
     mutate_batch,
     read_collision_rate,
-    round_scenario_hash
+    read_scenario_scores
 )
+from scenario_keys import CoverageMap, scenario_key
 from pathlib import Path
+from paths import map_path, ws_path
 
 # === Configurations ===
 POP_SIZE = 10
 SCENARIOS_PER_BATCH = 20
 GENERATIONS = 5
-TEMPLATE = "/autoware_map/template.yaml"
+WORKERS = 1          # parallel simulator slots per batch (see batch_run)
+USE_WORKFLOW = False # pack each batch (or per-worker shard) into a single workflow launch
+USE_RESULT_CACHE = True  # reuse outcomes of parameter tuples simulated in earlier runs
+USE_RESULTS_STORE = True # record outcomes in the indexed SQLite store (CSVs are exported from it)
+EARLY_STOP = True        # stop a simulation as soon as the interpreter reports a collision
+SELECTION_MODE = "batch" # "batch": breed from the two best batches by collision rate
+                         # "scenario": breed from the most critical scenarios seen so far
+ELITE_SCENARIOS = 2 * SCENARIOS_PER_BATCH  # elite pool size in "scenario" mode
+USE_SURROGATE = False    # pre-screen offspring with a kNN model of past outcomes
+SURROGATE_POOL = 10      # candidates bred per simulated scenario when screening
+SURROGATE_EXPLORE = 0.2  # share of each screened batch picked at random from the pool
+ARRAY_MIN_ROWS = 100     # with NumPy, breed this many rows or more as one array (population_engine)
+SIMULATOR_BACKEND = None # "ros" or "kinematic"; None follows the SIM_BACKEND environment variable
+USE_LANE_INDEX = True    # skip offspring whose routes cannot meet (needs the lanelet2 map, see lanelet_index)
+TRACE = True             # per-scenario phase timings and per-generation summaries (run_trace.jsonl)
+PROMETHEUS_METRICS = False  # also keep a Prometheus text file (metrics.prom) for a local scraper
+NOVELTY_MODE = None      # "reject": re-mutate offspring within NOVELTY_RADIUS of an evaluated scenario
+                         # "penalize": breed a pool and prefer novel offspring (see novelty_index)
+NOVELTY_WEIGHT = 0.5     # "penalize": weight of the 0..1 novelty score next to the predicted criticality
+SEED_FROM_CORPUS = True  # seed from every collision found so far (collision_corpus), not just the initial CSV
+USE_SCENARIO_STORE = True  # batches and workdirs hard-link into one content-addressed store instead of copies
+QUEUE_DIR = None         # shared directory: evaluate on remote workers (python3 work_queue.py worker)
+TEMPLATE = map_path("template.yaml")
 
 # Directories for scenario batches and results
-GENERATED_BASE   = Path("/autoware_map/generated_scenarios")
-RESULTS_BASE     = Path("/ros2_ws/simulation_results")
+GENERATED_BASE   = Path(map_path("generated_scenarios"))
+RESULTS_BASE     = Path(ws_path("simulation_results"))
 INITIAL_CSV_PATH = RESULTS_BASE / "simulation_results.csv"
+RESULT_CACHE_PATH = RESULTS_BASE / "result_cache.jsonl"
+RESULTS_DB_PATH = RESULTS_BASE / "results.sqlite"
+COVERAGE_PATH = RESULTS_BASE / "coverage.bin"
+CHECKPOINT_PATH = RESULTS_BASE / CHECKPOINT_NAME
+TRACE_PATH = RESULTS_BASE / "run_trace.jsonl"
+METRICS_PATH = RESULTS_BASE / "metrics.prom"
 
 # ensure directories exist
 GENERATED_BASE.mkdir(parents=True, exist_ok=True)
 RESULTS_BASE.mkdir(parents=True, exist_ok=True)
 
-def load_collision_scenarios(csv_path):
+def load_collision_scenarios(csv_path, store=None):
     """
     Read initial collision scenarios from CSV to seed the GA.
+    With a results store, this is an indexed query on the CSV's batch instead
+    (batch "simulation" for INITIAL_CSV_PATH: run.bash records the initial sweep in the store).
     Returns a list of parameter tuples.
     """
+    if store is not None:
+        collisions = store.collision_params(batch_info=batch_info_from_csv(csv_path))
+        if collisions:
+            return collisions
+
     collisions = []
     try:
         with open(csv_path, newline="") as file:
@@ -49,126 +102,389 @@ def load_collision_scenarios(csv_path):
         print("⚠️ Collision CSV file not found.")
     return collisions
 
-def evaluate_population(population, generation):
+def load_seed_params(store=None):
+    """
+    Seed tuples for the first batches: the whole collision corpus, balanced over
+    its failure regions, or the collisions of the initial CSV.
+    """
+    if SEED_FROM_CORPUS:
+        corpus = load_corpus(store, RESULTS_BASE)
+        if len(corpus):
+            print(corpus.summary())
+            return corpus.seed_params()
+    return load_collision_scenarios(str(INITIAL_CSV_PATH), store=store)
+
+def write_batch(batch_dir, batch_params):
+    """
+    (Re)create a batch folder of scenario files for the given parameter tuples.
+    """
+    batch_dir = Path(batch_dir)
+    if batch_dir.exists():
+        shutil.rmtree(batch_dir)
+    if USE_SCENARIO_STORE:
+        get_store(GENERATED_STORE).stage(TEMPLATE, str(batch_dir), batch_params)
+    else:
+        generate_batch_from_params(TEMPLATE, str(batch_dir), batch_params)
+
+def copy_batch(batch_path, workdir):
+    if USE_SCENARIO_STORE:
+        get_store(GENERATED_STORE).link_view(batch_path, workdir)
+        return
+    if workdir.exists():
+        shutil.rmtree(workdir)
+    shutil.copytree(batch_path, workdir)
+
+def run_batch(workdir, result_csv, cache=None, store=None, skip_recorded=False, queue=None):
+    """
+    Simulate every scenario of a batch folder with the configured evaluator
+    (local slots, workflow launches or the work queue) and result cache.
+    """
+    batch_run(
+        scenario_dir=str(workdir),
+        results_csv=str(result_csv),
+        workers=WORKERS,
+        use_workflow=USE_WORKFLOW,
+        cache=cache,
+        store=store,
+        early_stop=EARLY_STOP,
+        skip_recorded=skip_recorded,
+        launch_command=get_backend(SIMULATOR_BACKEND).launch_command(),
+        queue=queue,
+        template=TEMPLATE
+    )
+
+def evaluate_population(population, generation, cache=None, store=None, resume=False):
     """
     Evaluate each batch by copying into a unique workdir and running simulations.
+    With resume, existing workdirs are kept and their recorded scenarios skipped.
     Returns a sorted list of (batch_path, fitness_score).
     """
     fitness_scores = []
+    queue = WorkQueue(QUEUE_DIR) if QUEUE_DIR else None
     for idx, batch_path in enumerate(population):
         batch_path = Path(batch_path)
         batch_info = f"gen{generation}_batch{idx}"
 
-        # prepare a fresh workdir for this batch
+        # prepare a fresh workdir for this batch; on resume keep the one of the
+        # interrupted run (same manifest) so its recorded scenarios keep their paths
         workdir = GENERATED_BASE / batch_info
-        if workdir.exists():
-            shutil.rmtree(workdir)
-        shutil.copytree(batch_path, workdir)
+        result_csv = RESULTS_BASE / f"{batch_info}_results.csv"
+        resume_batch = resume and same_batch(workdir, batch_path)
+        if not resume_batch:
+            with trace_phase("copy", batch=batch_info):
+                copy_batch(batch_path, workdir)
+            # rows of an earlier run would be counted (and skipped on resume) otherwise
+            result_csv.unlink(missing_ok=True)
+            if store is not None:
+                store.delete_batch(batch_info)
 
         # prepare results CSV
-        result_csv = RESULTS_BASE / f"{batch_info}_results.csv"
         result_csv.parent.mkdir(parents=True, exist_ok=True)
 
         print(f"\n=== Evaluating {batch_path} as {workdir} ===")
 
         # run and score
-        batch_run(
-            scenario_dir=str(workdir),
-            results_csv=str(result_csv)
-        )
-        fitness = read_collision_rate(str(result_csv))
+        with trace_phase("evaluate", batch=batch_info):
+            run_batch(workdir, result_csv, cache=cache, store=store, skip_recorded=resume_batch, queue=queue)
+        if store is not None:
+            fitness = store.collision_rate(batch_info)
+        else:
+            fitness = read_collision_rate(str(result_csv))
         fitness_scores.append((batch_path, fitness))
 
     # sort descending by fitness
     return sorted(fitness_scores, key=lambda x: x[1], reverse=True)
 
-def evolve():
+def same_batch(workdir, batch_path):
+    """
+    True if workdir holds a copy of batch_path (identical parameter manifests).
+    """
+    manifest = Path(workdir) / MANIFEST_NAME
+    source = Path(batch_path) / MANIFEST_NAME
+    return manifest.exists() and source.exists() and filecmp.cmp(manifest, source, shallow=False)
+
+def load_scenario_scores(generation, store=None):
+    """
+    (criticality, params) of every scenario evaluated in a generation.
+    """
+    scores = []
+    for idx in range(POP_SIZE):
+        batch_info = f"gen{generation}_batch{idx}"
+        if store is not None:
+            scores += store.scenario_scores(batch_info)
+        else:
+            scores += read_scenario_scores(str(RESULTS_BASE / f"{batch_info}_results.csv"))
+    return scores
+
+def select_elite_scenarios(scored, k=ELITE_SCENARIOS):
+    """
+    The k most critical distinct scenarios (by rounded hash) of `scored`.
+    """
+    best = {}
+    for score, params in scored:
+        key = scenario_key(params)
+        if key not in best or score > best[key][0]:
+            best[key] = (score, params)
+    return sorted(best.values(), key=lambda x: x[0], reverse=True)[:k]
+
+def load_history_scores(store=None):
+    """
+    (criticality, params) of everything simulated so far, to train the surrogate.
+    """
+    if store is not None:
+        scores = store.scenario_scores()
+        if scores:
+            return scores
+    scores = read_scenario_scores(str(INITIAL_CSV_PATH))
+    for csv_path in sorted(RESULTS_BASE.glob("gen*_batch*_results.csv")):
+        scores += read_scenario_scores(str(csv_path))
+    return scores
+
+def sample_seed_batch(seed_params):
+    # sample unique parameters if possible
+    if len(seed_params) >= SCENARIOS_PER_BATCH:
+        return random.sample(seed_params, k=SCENARIOS_PER_BATCH)
+    return random.choices(seed_params, k=SCENARIOS_PER_BATCH)
+
+def all_of(*filters):
+    """
+    Filter accepting a tuple only if every given filter does (None entries are skipped).
+    """
+    filters = [f for f in filters if f is not None]
+    if len(filters) <= 1:
+        return filters[0] if filters else None
+    return lambda params: all(f(params) for f in filters)
+
+def breed_child(parent_a, parent_b, seen_hashes, accept=None):
+    """
+    One child batch from two parent batches: crossover, then mutation.
+    seen_hashes holds scenario_key values; tuples rejected by accept are mutated again.
+    With NumPy, batches of ARRAY_MIN_ROWS or more are bred as an array
+    (population_engine); smaller ones are faster tuple by tuple.
+    """
+    if population_engine.np is not None and len(parent_a) >= ARRAY_MIN_ROWS:
+        try:
+            parents = population_engine.from_tuples(parent_a), population_engine.from_tuples(parent_b)
+        except ValueError:
+            parents = None  # a lane ID outside the lane tables: only the tuple path handles it
+        if parents is not None:
+            return breed_child_arrays(*parents, seen_hashes, accept)
+
+    # Crossover step: combine top parents
+    child_params = crossover_batches(parent_a, parent_b)
+
+    # If every offspring tuple has been seen before, force a 100% mutation for full novelty
+    if all(scenario_key(t) in seen_hashes for t in child_params):
+        child_params = mutate_batch(
+            child_params,
+            seen=seen_hashes,
+            mutation_rate=1.0,  # mutate every scenario to guarantee change
+            key_fn=scenario_key,
+            accept=accept
+        )
+
+    # Standard mutation pass
+    return mutate_batch(child_params, seen=seen_hashes, key_fn=scenario_key, accept=accept)
+
+def breed_pool(parent_a, parent_b, seen_hashes, accept=None, copies=1):
+    """
+    `copies` child batches of the same parents as one candidate list. With NumPy a
+    pool of ARRAY_MIN_ROWS or more is bred in a single array pass over the repeated
+    parents, else breed_child runs once per copy.
+    """
+    if population_engine.np is not None and copies * len(parent_a) >= ARRAY_MIN_ROWS:
+        return breed_child(list(parent_a) * copies, list(parent_b) * copies, seen_hashes, accept)
+    pool = []
+    for _ in range(copies):
+        pool += breed_child(parent_a, parent_b, seen_hashes, accept)
+    return pool
+
+def breed_child_arrays(pop_a, pop_b, seen_hashes, accept=None):
+    """
+    breed_child over population arrays. The generator is seeded from `random`,
+    so a seeded run stays reproducible.
+    """
+    rng = population_engine.np.random.default_rng(random.getrandbits(64))
+    child = population_engine.crossover(pop_a, pop_b, rng=rng)
+    if all(key in seen_hashes for key in population_engine.row_keys(child).tolist()):
+        child = population_engine.mutate(child, seen_hashes, mutation_rate=1.0, accept=accept, rng=rng)
+    return population_engine.to_tuples(population_engine.mutate(child, seen_hashes, accept=accept, rng=rng))
+
+def evolve(resume=False):
     """
     Main genetic optimization loop.
+    With resume, continues from the last checkpoint: finished generations are not
+    rerun, scenarios already recorded in an interrupted generation are skipped.
     """
+    state = load_checkpoint(CHECKPOINT_PATH) if resume else None
+    if resume and state is None:
+        print("⚠️ No checkpoint found, starting a new run.")
+
     seen_hashes = set()
+    coverage = CoverageMap()
     population = []
     population_params = []
+    launch_command = get_backend(SIMULATOR_BACKEND).launch_command()
+    cache = ResultCache(RESULT_CACHE_PATH, config_fingerprint(TEMPLATE, launch_command)) if USE_RESULT_CACHE else None
+    store = ResultsStore(RESULTS_DB_PATH, run_id=state and state["run_id"]) if USE_RESULTS_STORE else None
+    if TRACE:
+        start_tracing(str(TRACE_PATH), str(METRICS_PATH) if PROMETHEUS_METRICS else None, workers=WORKERS)
 
     # seed from initial collisions
-    seed_params = load_collision_scenarios(str(INITIAL_CSV_PATH))
+    seed_params = load_seed_params(store)
     if not seed_params:
         print("❌ No collision scenarios found. Please run initial simulation first.")
         return
 
-    # --- generation 0: sample initial population ---
-    for i in range(POP_SIZE):
-        batch_dir = GENERATED_BASE / f"gen0_batch{i}"
-        # clear old dir
-        if batch_dir.exists():
-            shutil.rmtree(batch_dir)
+    surrogate = report = None
+    if USE_SURROGATE:
+        surrogate = KNNSurrogate().fit(load_history_scores(store))
+        report = ScreeningReport()
+        print(f"🔮 Surrogate trained on {len(surrogate)} past results")
 
-        # sample unique parameters if possible
-        if len(seed_params) >= SCENARIOS_PER_BATCH:
-            batch_params = random.sample(seed_params, k=SCENARIOS_PER_BATCH)
-        else:
-            batch_params = random.choices(seed_params, k=SCENARIOS_PER_BATCH)
+    accept = None
+    if USE_LANE_INDEX:
+        lane_index = load_index()
+        if lane_index is not None:
+            print(lane_index.summary())
+            accept = lane_index.accept
 
-        # generate scenario files
-        generate_batch_from_params(TEMPLATE, str(batch_dir), batch_params)
+    novelty = None
+    if NOVELTY_MODE:
+        novelty = NoveltyIndex().update(params for _, params in load_history_scores(store))
+        if NOVELTY_MODE == "reject":
+            # lane filter first: it is the cheaper one
+            accept = all_of(accept, novelty.accept)
 
-        # record population and params
-        population.append(batch_dir)
-        population_params.append(batch_params)
+    def checkpoint(generation, phase, scored=()):
+        save_checkpoint(CHECKPOINT_PATH, generation, phase, population, population_params, seen_hashes,
+                        scored=scored, elite=elite, run_id=store.run_id if store is not None else None)
 
-        # track seen hashes to avoid re-generating identical
-        for params in batch_params:
-            seen_hashes.add(round_scenario_hash(params))
+    elite = []
+    scored = None
+    if state is not None:
+        start_gen = state["generation"]
+        population = [Path(p) for p in state["population"]]
+        population_params = state["population_params"]
+        seen_hashes = state["seen_hashes"]
+        elite = state["elite"]
+        if state["phase"] == "evaluated":
+            scored = [(Path(batch_path), fitness) for batch_path, fitness in state["scored"]]
+        if COVERAGE_PATH.exists():
+            coverage.load(COVERAGE_PATH)
+        if novelty is not None:
+            novelty.add_keys(seen_hashes)
+        print(f"🔁 Resuming generation {start_gen} ({state['phase']})")
+    else:
+        start_gen = 1
+        # --- generation 0: sample initial population ---
+        for i in range(POP_SIZE):
+            batch_dir = GENERATED_BASE / f"gen0_batch{i}"
+            batch_params = sample_seed_batch(seed_params)
+
+            # generate scenario files
+            with trace_phase("generate", batch=f"gen0_batch{i}"):
+                write_batch(batch_dir, batch_params)
+
+            # record population and params
+            population.append(batch_dir)
+            population_params.append(batch_params)
+
+            # track seen hashes to avoid re-generating identical
+            for params in batch_params:
+                seen_hashes.add(scenario_key(params))
+                coverage.add(params)
+            if novelty is not None:
+                novelty.update(batch_params)
+        checkpoint(1, "bred")
 
     # --- subsequent generations ---
-    for gen in range(1, GENERATIONS + 1):
+    for gen in range(start_gen, GENERATIONS + 1):
         print(f"\n\n==== Generation {gen} ====")
-        scored = evaluate_population(population, gen)
+        start_generation(gen)
+        if scored is None:
+            scored = evaluate_population(population, gen, cache=cache, store=store, resume=gen == start_gen and state is not None)
 
-        # select top 2 batches
-        top_batches = [scored[0][0], scored[1][0]]
-        top_params = [
-            population_params[population.index(top_batches[0])],
-            population_params[population.index(top_batches[1])]
-        ]
+            gen_scores = []
+            if surrogate is not None or SELECTION_MODE == "scenario":
+                gen_scores = load_scenario_scores(gen, store=store)
+            if surrogate is not None:
+                report.compare(gen_scores)
+                surrogate.fit(gen_scores)
+            if SELECTION_MODE == "scenario":
+                # elite carries over, so a near-miss found early can still be a parent later
+                elite = select_elite_scenarios(elite + gen_scores)
+            checkpoint(gen, "evaluated", scored)
+
+        if SELECTION_MODE == "scenario":
+            elite_params = [params for _, params in elite] or seed_params
+            if elite:
+                print(f"🎯 Elite: {len(elite)} scenarios, criticality {elite[0][0]:.2f}..{elite[-1][0]:.2f}")
+        else:
+            # select top 2 batches
+            top_batches = [scored[0][0], scored[1][0]]
+            top_params = [
+                population_params[population.index(top_batches[0])],
+                population_params[population.index(top_batches[1])]
+            ]
 
         new_population = []
         new_population_params = []
+        child_novelty = []
 
         # create next-gen population
         for i in range(POP_SIZE):
-            # Crossover step: combine top parents
-            child_params = crossover_batches(top_params[0], top_params[1])
-
-            # If every offspring tuple has been seen before, force a 100% mutation for full novelty
-            if all(round_scenario_hash(t) in seen_hashes for t in child_params):
-                child_params = mutate_batch(
-                    child_params,
-                    seen=seen_hashes,
-                    mutation_rate=1.0  # mutate every scenario to guarantee change
+            if SELECTION_MODE == "scenario":
+                # each parent batch is a fresh draw from the elite scenarios
+                top_params = [sample_seed_batch(elite_params), sample_seed_batch(elite_params)]
+            if surrogate is not None or NOVELTY_MODE == "penalize":
+                parent_a, parent_b = top_params
+                child_params = screen_candidates(
+                    lambda pool_seen: breed_pool(parent_a, parent_b, pool_seen, accept, copies=SURROGATE_POOL),
+                    surrogate, SCENARIOS_PER_BATCH, seen_hashes,
+                    pool_factor=SURROGATE_POOL, explore=SURROGATE_EXPLORE, report=report,
+                    novelty=novelty if NOVELTY_MODE == "penalize" else None, novelty_weight=NOVELTY_WEIGHT
                 )
-
-            # Standard mutation pass
-            child_params = mutate_batch(child_params, seen=seen_hashes)
+            else:
+                child_params = breed_child(top_params[0], top_params[1], seen_hashes, accept)
 
             # write out scenarios
             child_dir = GENERATED_BASE / f"gen{gen}_batch{i}"
-            if child_dir.exists():
-                shutil.rmtree(child_dir)
-            generate_batch_from_params(TEMPLATE, str(child_dir), child_params)
+            with trace_phase("generate", batch=f"gen{gen}_batch{i}"):
+                write_batch(child_dir, child_params)
 
             new_population.append(child_dir)
             new_population_params.append(child_params)
 
             # update seen hashes
             for params in child_params:
-                seen_hash_s = round_scenario_hash(params)
-                seen_hashes.add(seen_hash_s)
+                seen_hashes.add(scenario_key(params))
+                coverage.add(params)
+            if novelty is not None:
+                child_novelty.append(sum(map(novelty.novelty, child_params)) / len(child_params))
+                novelty.update(child_params)
 
         population = new_population
         population_params = new_population_params
+        scored = None
+        print(coverage.summary())
+        if novelty is not None:
+            print(novelty.summary())
+            print(f"🧭 Mean offspring novelty: {sum(child_novelty) / len(child_novelty):.2f}")
+        coverage.save(COVERAGE_PATH)
+        end_generation(gen)
+        checkpoint(gen + 1, "bred")
 
+    if cache is not None:
+        print(f"♻️ Result cache: {cache.hits} hits, {cache.misses} misses")
+    if USE_SCENARIO_STORE:
+        # scenarios of batch folders removed during the run are no longer linked anywhere
+        removed, freed = get_store(GENERATED_STORE).gc()
+        print(f"🧹 Scenario store: removed {removed} unreferenced scenarios ({freed / 1e6:.1f} MB)")
     print("\n✅ Genetic optimization complete.")
 
 if __name__ == "__main__":
-    evolve()
+    parser = argparse.ArgumentParser(description="Genetic scenario mining")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the interrupted run from its last checkpoint")
+    evolve(resume=parser.parse_args().resume)
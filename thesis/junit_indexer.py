@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import argparse
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from launch_scenario import make_result, parse_error_result, scenario_parameters
+from results_store import ResultsStore
+from paths import map_path
+
+# Incremental junit ingestion: only result files that are new or changed since
+# the last pass (by path, mtime and size; the ledger lives in the results store)
+# are parsed, with a streaming parser, in a process pool for large backlogs.
+RESULT_FILE = "result.junit.xml"
+PARALLEL_MIN = 64      # fewer new files than this are parsed in-process (pool start-up costs more)
+SETTLE = 1.0           # seconds a file must be unchanged before it is ingested (still being written)
+POLL = 2.0             # watch mode: seconds between scans
+# Default store of ingested results: its own database, not the GA's results.sqlite
+INDEX_DB = map_path("workflow_results.sqlite")
+
+
+def find_result_files(log_dir):
+    """
+    {path: (mtime_ns, size)} of every junit file under log_dir (stat only, no parsing).
+    """
+    found = {}
+    stack = [log_dir]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name == RESULT_FILE:
+                    st = entry.stat()
+                    found[entry.path] = (st.st_mtime_ns, st.st_size)
+    return found
+
+
+def parse_junit(path):
+    """
+    [(testcase name, failed, message)] of one junit file, streamed with iterparse
+    so large workflow results are never held as a full tree. None if unreadable.
+    Runs in pool workers: returns plain tuples.
+    """
+    testcases = []
+    try:
+        for _, elem in ET.iterparse(path):
+            if elem.tag == "testcase":
+                failure = elem.find("failure")
+                if failure is None:
+                    failure = elem.find("error")
+                testcases.append((elem.get("name", ""), failure is not None,
+                                  failure.get("message", "") if failure is not None else ""))
+                elem.clear()
+    except (ET.ParseError, OSError):
+        return None
+    return testcases
+
+
+class JunitIndexer:
+    """
+    Ingests scenario_test_runner results under log_dir into a ResultsStore.
+    Each testcase is matched to its scenario file by name (workflow runs) or by
+    the name of its output folder, as collect_workflow_results does.
+    """
+
+    def __init__(self, log_dir, store, scenario_dir=map_path("generated_scenarios"), batch_info=None,
+                 workers=None):
+        self.log_dir = os.path.abspath(log_dir)
+        self.store = store
+        self.scenario_dir = scenario_dir
+        self.batch_info = batch_info
+        self.workers = workers or os.cpu_count() or 1
+        self.skipped = 0   # testcases without a scenario file (not recorded)
+
+    def pending(self, settle=SETTLE):
+        """
+        Result files not yet ingested in their current version, oldest first.
+        Files modified within the last `settle` seconds are left for the next pass.
+        """
+        known = self.store.ingested_files(prefix=self.log_dir)
+        cutoff = time.time_ns() - int(settle * 1e9)
+        return sorted(
+            ((path, stamp) for path, stamp in find_result_files(self.log_dir).items()
+             if known.get(path) != stamp and stamp[0] <= cutoff),
+            key=lambda item: item[1][0]
+        )
+
+    def scenario_path(self, testcase, result_path):
+        stem = os.path.splitext(os.path.basename(testcase))[0]
+        candidate = os.path.join(self.scenario_dir, f"{stem}.yaml")
+        if stem and os.path.exists(candidate):
+            return candidate
+        folder = os.path.basename(os.path.dirname(result_path))
+        if folder == "scenario_test_runner":  # single-scenario layout: <output>/scenario_test_runner/
+            folder = os.path.basename(os.path.dirname(os.path.dirname(result_path)))
+        return os.path.join(self.scenario_dir, f"{folder}.yaml")
+
+    def _entries(self, result_path, testcases):
+        """
+        (scenario_yaml, result, params, batch_info, source_file) of a junit file's testcases.
+        Testcases whose scenario file is gone are skipped: an outcome without its
+        parameters is useless to the GA and would poison parameter queries.
+        """
+        if testcases is None:
+            testcases = [("", True, None)]
+        entries = []
+        for name, failed, message in testcases:
+            scenario_path = self.scenario_path(name, result_path)
+            result = make_result(failed, message) if message is not None else \
+                parse_error_result(f"Unreadable junit file {result_path}")
+            try:
+                params = scenario_parameters(scenario_path)
+            except (OSError, KeyError, TypeError):
+                self.skipped += 1
+                continue
+            entries.append((scenario_path, result, params, self.batch_info, result_path))
+        return entries
+
+    def index(self, settle=SETTLE):
+        """
+        One incremental pass. Returns the number of results added to the store.
+        A file read again (rewritten since) replaces the rows it gave before.
+        """
+        pending = self.pending(settle)
+        if not pending:
+            return 0
+        paths = [path for path, _ in pending]
+        if len(paths) >= PARALLEL_MIN and self.workers > 1:
+            with ProcessPoolExecutor(self.workers) as pool:
+                parsed = list(pool.map(parse_junit, paths, chunksize=max(1, len(paths) // (4 * self.workers))))
+        else:
+            parsed = [parse_junit(path) for path in paths]
+
+        entries = []
+        skipped = self.skipped
+        for path, testcases in zip(paths, parsed):
+            entries += self._entries(path, testcases)
+        if self.skipped > skipped:
+            print(f"⚠️ Skipped {self.skipped - skipped} testcases whose scenario file is missing")
+        self.store.record_ingested(entries, [(path, mtime_ns, size) for path, (mtime_ns, size) in pending])
+        return len(entries)
+
+    def watch(self, poll=POLL, idle_exit=None, until=None):
+        """
+        Ingest results as they appear (e.g. while a workflow is still running).
+        Stops once until() is true (a final pass picks up the last files) or after
+        idle_exit seconds without new results. Returns the total ingested.
+        """
+        total = 0
+        idle_since = time.monotonic()
+        while True:
+            finished = until is not None and until()
+            added = self.index(settle=0.0 if finished else SETTLE)
+            total += added
+            if added:
+                idle_since = time.monotonic()
+                print(f"📥 Ingested {added} results ({total} this session)")
+            if finished or (idle_exit is not None and time.monotonic() - idle_since > idle_exit):
+                return total
+            time.sleep(poll)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental junit result indexing into the results store")
+    parser.add_argument("--log-dir", default=map_path("workflow_logs"))
+    parser.add_argument("--db", default=INDEX_DB, help=f"results store (default: {INDEX_DB})")
+    parser.add_argument("--scenarios", default=map_path("generated_scenarios"))
+    parser.add_argument("--batch-info", help="batch label for ingested rows, e.g. gen3_batch1")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--watch", action="store_true", help="keep ingesting as results appear")
+    parser.add_argument("--pid", type=int, help="watch: stop after this process (the workflow launch) exits")
+    parser.add_argument("--idle-exit", type=float, help="watch: stop after this many seconds without results")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    indexer = JunitIndexer(args.log_dir, store, args.scenarios, args.batch_info, args.workers)
+    if args.watch:
+        until = (lambda: not _process_alive(args.pid)) if args.pid else None
+        total = indexer.watch(idle_exit=args.idle_exit, until=until)
+    else:
+        total = indexer.index(settle=0.0)
+    print(f"[✓] {total} new results from {args.log_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
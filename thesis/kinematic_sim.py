@@ -0,0 +1,168 @@
+import os
+import sys
+import math
+import time
+from scenario_manifest import load_manifest
+from criticality import telemetry_line
+from scenario_utils import START_LANE_IDS, DEST_LANE_IDS
+
+# Kinematic stand-in for scenario_test_runner: same key:=value arguments, same
+# junit file and console phrases, no ROS. The intersection is abstracted as one
+# arm per lane around a shared centre: each vehicle drives from its start s to
+# the end of its start lane, through the centre, and out along its destination
+# lane until it reaches the destination s, keeping LANE_OFFSET to the right of
+# the arm's axis (right-hand traffic). Constant speeds, no reaction.
+# Telemetry goes out in entity_monitor.py's line format, as on the real stack.
+
+SIM_TIME = 20.0           # the template's exitSuccess SimulationTimeCondition
+DT = 0.05
+EGO_SPEED = 8.0           # m/s
+NPC_SPEED = 7.0
+APPROACH = 6.0            # metres from a start lane's end to the centre
+LANE_OFFSET = 1.75        # metres from an arm's axis to the driving line
+COLLISION_DISTANCE = 2.0  # centre distance treated as contact
+TELEMETRY_EVERY = 0.5     # seconds of simulation time between telemetry lines
+INTERPRETER_PREFIX = "[openscenario_interpreter_node-1]"  # as ros2 launch prefixes the interpreter's output
+
+_START_ANGLES = {lane: 2 * math.pi * i / len(START_LANE_IDS) for i, lane in enumerate(START_LANE_IDS)}
+_DEST_ANGLES = {lane: 2 * math.pi * (i + 0.5) / len(DEST_LANE_IDS) for i, lane in enumerate(DEST_LANE_IDS)}
+
+
+def _position(start_lane, start_s, dest_lane, dest_s, travelled):
+    """
+    (x, y) after driving `travelled` metres, stopping at the destination.
+    """
+    to_centre = START_LANE_IDS[start_lane][1] - start_s + APPROACH
+    if travelled <= to_centre:
+        r, angle, side = to_centre - travelled, _START_ANGLES[start_lane], 1.0
+    else:
+        r, angle, side = min(travelled - to_centre, APPROACH + dest_s), _DEST_ANGLES[dest_lane], -1.0
+    # inbound the right-hand side is +90 degrees from the arm's axis, outbound -90
+    cos, sin = math.cos(angle), math.sin(angle)
+    return r * cos - side * LANE_OFFSET * sin, r * sin + side * LANE_OFFSET * cos
+
+
+def simulate(params, ego_speed=EGO_SPEED, npc_speed=NPC_SPEED, sim_time=SIM_TIME, on_step=None):
+    """
+    Run one parameter tuple. Returns (collided, time, min_distance, min_ttc);
+    on_step(t, distance, ttc) is called every step.
+    """
+    ego_lane, ego_s, npc_lane, npc_s, ego_dest, ego_dest_s, npc_dest, npc_dest_s = params
+    ego = (str(ego_lane), float(ego_s), str(ego_dest), float(ego_dest_s))
+    npc = (str(npc_lane), float(npc_s), str(npc_dest), float(npc_dest_s))
+
+    min_distance, min_ttc = math.inf, math.inf
+    previous = None
+    t = 0.0
+    while t <= sim_time:
+        ex, ey = _position(*ego, ego_speed * t)
+        nx, ny = _position(*npc, npc_speed * t)
+        distance = math.hypot(ex - nx, ey - ny)
+        ttc = None
+        if previous is not None and distance < previous:
+            ttc = distance / ((previous - distance) / DT)
+            min_ttc = min(min_ttc, ttc)
+        min_distance = min(min_distance, distance)
+        if on_step is not None:
+            on_step(t, distance, ttc)
+        if distance < COLLISION_DISTANCE:
+            return True, t, min_distance, min_ttc
+        previous = distance
+        t += DT
+    return False, sim_time, min_distance, min_ttc
+
+
+def _escape(text):
+    # attribute escaping without importing xml/html (start-up time matters here)
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def load_params(scenario_path):
+    """
+    GA tuple of a scenario: from the manifest, else by parsing the YAML.
+    """
+    entry = load_manifest(os.path.dirname(os.path.abspath(scenario_path))).get(os.path.basename(scenario_path))
+    if entry is not None:
+        return entry[0]
+    from launch_scenario import params_to_tuple, scenario_parameters
+    return params_to_tuple(scenario_parameters(scenario_path))
+
+
+def write_junit(path, testcase, failure_message=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    failed = failure_message is not None
+    failure = f'<failure type="exitFailure" message="{_escape(failure_message)}"/>' if failed else ""
+    with open(path, "w") as f:
+        f.write(
+            f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<testsuites failures="{int(failed)}" errors="0" tests="1">'
+            f'<testsuite name="scenario_test_runner" failures="{int(failed)}" errors="0" tests="1">'
+            f'<testcase name="{_escape(testcase)}" assertions="0">{failure}</testcase>'
+            f'</testsuite></testsuites>\n'
+        )
+
+
+def run_scenario_file(scenario_path, junit_path, ego_speed=EGO_SPEED, npc_speed=NPC_SPEED, realtime=0.0):
+    """
+    Simulate one scenario file, printing scenario_test_runner-like output, and write its junit.
+    realtime > 0 stretches the run to sim_time / realtime wall-clock seconds (load tests).
+    """
+    print(f"[scenario_test_runner]: derived : {scenario_path}", flush=True)
+    params = load_params(scenario_path)
+    print(f"[kinematic_sim] simulating {os.path.basename(scenario_path)}", flush=True)
+    next_report = [0.0]
+    minima = [math.inf, math.inf]
+
+    def report(t, distance, ttc):
+        minima[0] = min(minima[0], distance)
+        if ttc is not None:
+            minima[1] = min(minima[1], ttc)
+        if t >= next_report[0]:
+            print(telemetry_line(t, minima[0], minima[1] if minima[1] != math.inf else None))
+            next_report[0] += TELEMETRY_EVERY
+
+    collided, t, min_distance, min_ttc = simulate(params, ego_speed, npc_speed, on_step=report)
+    if realtime > 0:
+        time.sleep(t / realtime)
+    print(telemetry_line(t, min_distance, min_ttc if min_ttc != math.inf else None))
+
+    testcase = os.path.splitext(os.path.basename(scenario_path))[0]
+    if collided:
+        message = f"exitFailure at simulation time {t:.2f}: ego is colliding with another given entity Npc1"
+        # junit first: an early-stopping orchestrator kills the run on the next line
+        write_junit(junit_path, testcase, message)
+        print(f"{INTERPRETER_PREFIX} [ERROR] [{time.time():.9f}] [simulation.openscenario_interpreter]: {message}",
+              flush=True)
+    else:
+        write_junit(junit_path, testcase)
+        print(f"{INTERPRETER_PREFIX} [INFO] [{time.time():.9f}] [simulation.openscenario_interpreter]: exitSuccess",
+              flush=True)
+    return collided
+
+
+def workflow_scenarios(workflow_path):
+    with open(workflow_path) as f:
+        return [line.split("path:", 1)[1].strip() for line in f if "path:" in line]
+
+
+def main(argv):
+    args = dict(a.split(":=", 1) for a in argv if ":=" in a)
+    ego_speed = float(args.get("ego_speed", EGO_SPEED))
+    npc_speed = float(args.get("npc_speed", NPC_SPEED))
+    realtime = float(args.get("realtime", 0.0))
+    output_dir = args.get("output_directory", ".")
+
+    if "workflow" in args:
+        # one result folder per scenario, as a workflow run produces
+        for scenario_path in workflow_scenarios(args["workflow"]):
+            stem = os.path.splitext(os.path.basename(scenario_path))[0]
+            run_scenario_file(scenario_path, os.path.join(output_dir, stem, "result.junit.xml"),
+                              ego_speed, npc_speed, realtime)
+    else:
+        run_scenario_file(args["scenario"], os.path.join(output_dir, "scenario_test_runner", "result.junit.xml"),
+                          ego_speed, npc_speed, realtime)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,350 @@
+import os
+import sys
+import json
+import math
+import heapq
+import random
+import hashlib
+import xml.etree.ElementTree as ET
+from paths import map_path
+from scenario_utils import START_LANE_IDS, DEST_LANE_IDS
+
+# Route-conflict index over the lanelet2 map: which ego/NPC (start, dest) lane
+# combinations have routes that meet at all, where, and roughly when. Built once
+# per map and cached as JSON; the generator and mutator use it to skip tuples
+# whose vehicles cannot meet within the simulated time.
+LANELET_MAP = os.environ.get("LANELET_MAP", map_path("lanelet2_map.osm"))
+INDEX_CACHE = map_path("lanelet_index.json")
+INDEX_VERSION = 1
+
+STEP = 1.0              # metres between route samples
+CONFLICT_RADIUS = 3.0   # route points closer than this belong to a conflict zone
+JOIN_TOLERANCE = 0.5    # a lanelet starting this close to another's end is its successor
+MAX_ROUTE_LENGTH = 500.0
+V_MIN, V_MAX = 2.0, 15.0  # speed bounds (m/s) for arrival-time windows
+TIME_MARGIN = 1.0       # seconds either side of a window
+SIM_TIME = 20.0         # the template's exitSuccess SimulationTimeCondition
+KEEP_UNLIKELY = 0.05    # share of non-conflicting tuples still let through (exploration)
+
+
+def _polyline_length(points):
+    return sum(math.dist(a, b) for a, b in zip(points, points[1:]))
+
+
+def _resample(points, n):
+    """
+    n points evenly spaced by arc length along a polyline.
+    """
+    if len(points) == 1:
+        return points * n
+    cumulative = [0.0]
+    for a, b in zip(points, points[1:]):
+        cumulative.append(cumulative[-1] + math.dist(a, b))
+    total = cumulative[-1] or 1.0
+    resampled, seg = [], 0
+    for i in range(n):
+        target = total * i / (n - 1)
+        while seg < len(points) - 2 and cumulative[seg + 1] < target:
+            seg += 1
+        span = cumulative[seg + 1] - cumulative[seg] or 1.0
+        t = (target - cumulative[seg]) / span
+        (x0, y0), (x1, y1) = points[seg], points[seg + 1]
+        resampled.append((x0 + t * (x1 - x0), y0 + t * (y1 - y0)))
+    return resampled
+
+
+def parse_osm(osm_path):
+    """
+    {lanelet id: centreline [(x, y), ...]} from a lanelet2 OSM file. Uses the
+    local_x/local_y node tags Autoware maps carry, else projects lat/lon locally.
+    The centreline is the lanelet's centerline way if it has one, otherwise the
+    average of its left and right bounds.
+    """
+    nodes, ways, lanelets = {}, {}, {}
+    origin = None
+    for _, elem in ET.iterparse(osm_path):
+        if elem.tag == "node":
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if "local_x" in tags:
+                xy = (float(tags["local_x"]), float(tags["local_y"]))
+            else:
+                lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+                origin = origin or (lat, lon)
+                xy = (math.radians(lon - origin[1]) * 6378137.0 * math.cos(math.radians(origin[0])),
+                      math.radians(lat - origin[0]) * 6378137.0)
+            nodes[elem.get("id")] = xy
+            elem.clear()
+        elif elem.tag == "way":
+            ways[elem.get("id")] = [nd.get("ref") for nd in elem.iter("nd")]
+            elem.clear()
+        elif elem.tag == "relation":
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if tags.get("type") == "lanelet":
+                lanelets[elem.get("id")] = {m.get("role"): m.get("ref") for m in elem.iter("member")}
+            elem.clear()
+
+    centrelines = {}
+    for lanelet_id, members in lanelets.items():
+        bounds = {role: [nodes[n] for n in ways.get(ref, []) if n in nodes] for role, ref in members.items()}
+        if len(bounds.get("centerline", [])) >= 2:
+            centrelines[lanelet_id] = bounds["centerline"]
+        elif len(bounds.get("left", [])) >= 2 and len(bounds.get("right", [])) >= 2:
+            n = max(len(bounds["left"]), len(bounds["right"]), 2)
+            left, right = _resample(bounds["left"], n), _resample(bounds["right"], n)
+            centrelines[lanelet_id] = [((lx + rx) / 2, (ly + ry) / 2) for (lx, ly), (rx, ry) in zip(left, right)]
+    return centrelines
+
+
+def find_successors(centrelines, tolerance=JOIN_TOLERANCE):
+    """
+    {lanelet id: [successor ids]}: lanelets whose centreline starts where this one ends.
+    Lane changes are not followed (scenario routes through the intersection do not need them).
+    """
+    cell = max(tolerance, 1e-6)
+    starts = {}
+    for lanelet_id, points in centrelines.items():
+        x, y = points[0]
+        starts.setdefault((math.floor(x / cell), math.floor(y / cell)), []).append(lanelet_id)
+
+    successors = {}
+    for lanelet_id, points in centrelines.items():
+        x, y = points[-1]
+        cx, cy = math.floor(x / cell), math.floor(y / cell)
+        successors[lanelet_id] = sorted(
+            other
+            for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+            for other in starts.get((cx + dx, cy + dy), ())
+            if other != lanelet_id and math.dist(centrelines[other][0], (x, y)) <= tolerance
+        )
+    return successors
+
+
+def shortest_route(start, dest, lengths, successors, max_length=MAX_ROUTE_LENGTH):
+    """
+    Lanelet ids from start to dest (both included) along successors, shortest first; None if unreachable.
+    """
+    if start == dest:
+        return [start]
+    queue = [(lengths[start], start, [start])]
+    best = {start: lengths[start]}
+    while queue:
+        cost, lanelet_id, route = heapq.heappop(queue)
+        if lanelet_id == dest:
+            return route
+        if cost > best.get(lanelet_id, math.inf) or cost > max_length:
+            continue
+        for nxt in successors.get(lanelet_id, ()):
+            nxt_cost = cost + lengths[nxt]
+            if nxt_cost < best.get(nxt, math.inf):
+                best[nxt] = nxt_cost
+                heapq.heappush(queue, (nxt_cost, nxt, route + [nxt]))
+    return None
+
+
+def _route_samples(route, centrelines, step=STEP):
+    """
+    [(distance along the route, x, y)], distance 0 at the start of the first lanelet.
+    """
+    samples, offset = [], 0.0
+    for lanelet_id in route:
+        points = centrelines[lanelet_id]
+        length = _polyline_length(points)
+        n = max(2, int(length / step) + 1)
+        for i, (x, y) in enumerate(_resample(points, n)):
+            samples.append((offset + length * i / (n - 1), x, y))
+        offset += length
+    return samples
+
+
+def conflict_zones(ego_samples, npc_samples, radius=CONFLICT_RADIUS):
+    """
+    Stretches where two routes come within radius of each other, as
+    [ego_in, ego_out, npc_in, npc_out] in metres along each route.
+    """
+    grid = {}
+    for j, (_, x, y) in enumerate(npc_samples):
+        grid.setdefault((math.floor(x / radius), math.floor(y / radius)), []).append(j)
+
+    matches = []  # (ego sample index, [npc sample indices])
+    for i, (_, x, y) in enumerate(ego_samples):
+        cx, cy = math.floor(x / radius), math.floor(y / radius)
+        near = [j for dx in (-1, 0, 1) for dy in (-1, 0, 1) for j in grid.get((cx + dx, cy + dy), ())
+                if math.hypot(npc_samples[j][1] - x, npc_samples[j][2] - y) < radius]
+        if near:
+            matches.append((i, near))
+
+    zones, run = [], []
+    for i, near in matches:
+        if run and i > run[-1][0] + 1:
+            zones.append(run)
+            run = []
+        run.append((i, near))
+    if run:
+        zones.append(run)
+
+    result = []
+    for run in zones:
+        npc_indices = [j for _, near in run for j in near]
+        result.append([
+            round(ego_samples[run[0][0]][0], 2), round(ego_samples[run[-1][0]][0], 2),
+            round(npc_samples[min(npc_indices)][0], 2), round(npc_samples[max(npc_indices)][0], 2)
+        ])
+    return result
+
+
+def _window(zone_in, zone_out, start, end):
+    """
+    (earliest, latest) time a vehicle driving from start to end (route metres)
+    is inside [zone_in, zone_out]; None when it never gets there.
+    """
+    if zone_out < start or zone_in > end:
+        return None
+    earliest = max(0.0, zone_in - start) / V_MAX
+    # a vehicle whose goal lies in the zone stays there
+    latest = math.inf if end <= zone_out else (zone_out - start) / V_MIN
+    return earliest - TIME_MARGIN, latest + TIME_MARGIN
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+class LaneletIndex:
+    """
+    Lane lengths, routes between the scenario start/dest lanes and the conflict
+    zones of every ego/NPC route pair. can_conflict(params) tells whether the
+    two vehicles' arrival-time windows at any shared zone overlap within the
+    simulated time; accept(params) turns that into a sampling filter.
+    """
+
+    def __init__(self, lengths, routes, zones, map_digest=None):
+        self.lengths = lengths    # {lanelet id: metres}
+        self.routes = routes      # {"start>dest": {"lanelets": [...], "dest_offset": m}}
+        self.zones = zones        # {"ego route|npc route": [[ego_in, ego_out, npc_in, npc_out], ...]}
+        self.map_digest = map_digest
+
+    @classmethod
+    def build(cls, osm_path, start_lanes=START_LANE_IDS, dest_lanes=DEST_LANE_IDS):
+        centrelines = parse_osm(osm_path)
+        successors = find_successors(centrelines)
+        lengths = {lanelet_id: _polyline_length(points) for lanelet_id, points in centrelines.items()}
+
+        routes, samples = {}, {}
+        for start in start_lanes:
+            for dest in dest_lanes:
+                if start not in lengths or dest not in lengths:
+                    continue
+                route = shortest_route(start, dest, lengths, successors)
+                if route is None:
+                    continue
+                key = f"{start}>{dest}"
+                routes[key] = {"lanelets": route, "dest_offset": round(sum(lengths[l] for l in route[:-1]), 2)}
+                samples[key] = _route_samples(route, centrelines)
+
+        zones = {}
+        for ego_key in routes:
+            for npc_key in routes:
+                found = conflict_zones(samples[ego_key], samples[npc_key])
+                if found:
+                    zones[f"{ego_key}|{npc_key}"] = found
+
+        used = {l for route in routes.values() for l in route["lanelets"]}
+        return cls({l: round(lengths[l], 2) for l in sorted(used | set(start_lanes) | set(dest_lanes))
+                    if l in lengths}, routes, zones, _file_digest(osm_path))
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "map_digest": self.map_digest, "lengths": self.lengths,
+                       "routes": self.routes, "zones": self.zones}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            return None
+        return cls(data["lengths"], data["routes"], data["zones"], data["map_digest"])
+
+    def route(self, start, dest):
+        return self.routes.get(f"{start}>{dest}")
+
+    def reachable(self, start, dest):
+        return f"{start}>{dest}" in self.routes
+
+    def can_conflict(self, params):
+        """
+        True when the ego and NPC of a tuple can be in a shared zone at the same
+        time before the simulation ends (constant speeds between V_MIN and V_MAX).
+        False also when either route does not exist in the map.
+        """
+        ego_lane, ego_s, npc_lane, npc_s, ego_dest, ego_dest_s, npc_dest, npc_dest_s = params
+        ego_route, npc_route = self.route(ego_lane, ego_dest), self.route(npc_lane, npc_dest)
+        if ego_route is None or npc_route is None:
+            return False
+        ego_end = ego_route["dest_offset"] + float(ego_dest_s)
+        npc_end = npc_route["dest_offset"] + float(npc_dest_s)
+        for ego_in, ego_out, npc_in, npc_out in self.zones.get(f"{ego_lane}>{ego_dest}|{npc_lane}>{npc_dest}", ()):
+            ego_window = _window(ego_in, ego_out, float(ego_s), ego_end)
+            npc_window = _window(npc_in, npc_out, float(npc_s), npc_end)
+            if ego_window is None or npc_window is None:
+                continue
+            if max(ego_window[0], npc_window[0]) <= min(ego_window[1], npc_window[1], SIM_TIME):
+                return True
+        return False
+
+    def accept(self, params, keep=KEEP_UNLIKELY):
+        """
+        Sampling filter: tuples that can conflict always pass, the rest with probability keep.
+        """
+        return self.can_conflict(params) or random.random() < keep
+
+    def lane_mismatches(self, start_lanes=START_LANE_IDS, dest_lanes=DEST_LANE_IDS, tolerance=0.5):
+        """
+        [(lane, configured max s, map length)] where the lane tables disagree with the map.
+        """
+        mismatches = []
+        for table in (start_lanes, dest_lanes):
+            for lane, (_, max_s) in table.items():
+                length = self.lengths.get(lane)
+                if length is None or abs(length - max_s) > tolerance:
+                    mismatches.append((lane, max_s, length))
+        return mismatches
+
+    def summary(self, start_lanes=START_LANE_IDS, dest_lanes=DEST_LANE_IDS):
+        pairs = len(start_lanes) * len(dest_lanes)
+        combinations = pairs * pairs
+        return (f"🛣️ Lanelet index: {len(self.routes)}/{pairs} start-dest routes, "
+                f"{len(self.zones)}/{combinations} ego/NPC route pairs share a conflict zone")
+
+
+def load_index(osm_path=LANELET_MAP, cache_path=INDEX_CACHE):
+    """
+    Index for a map, rebuilt only when the map file changed; None when there is no map.
+    """
+    if not os.path.exists(osm_path):
+        print(f"⚠️ No lanelet map at {osm_path}, lane combinations are not filtered.")
+        return None
+    digest = _file_digest(osm_path)
+    if os.path.exists(cache_path):
+        index = LaneletIndex.load(cache_path)
+        if index is not None and index.map_digest == digest:
+            return index
+    print(f"🛣️ Building lanelet index from {osm_path} ...")
+    index = LaneletIndex.build(osm_path)
+    index.save(cache_path)
+    return index
+
+
+if __name__ == "__main__":
+    # usage: python3 lanelet_index.py [map.osm]
+    index = load_index(sys.argv[1] if len(sys.argv) > 1 else LANELET_MAP)
+    if index is not None:
+        print(index.summary())
+        for lane, max_s, length in index.lane_mismatches():
+            print(f"⚠️ Lane {lane}: configured s up to {max_s}, map length {length}")
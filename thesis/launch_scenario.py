@@ -1,18 +1,54 @@
 import subprocess
 import os
+import sys
 import xml.etree.ElementTree as ET
 import csv
 from pathlib import Path
 import re
-import shutil
-from datetime import datetime
+import time
+import threading
+from scenario_manifest import lookup_scenario_parameters
+from criticality import METRIC_KEYS, criticality_score, scan_log
+from run_trace import trace_scenario
+from scenario_store import MINED_STORE, get_store
+from paths import MAP_ROOT, ws_path
 
 # launch_scenario.py (near top, after imports)
-MINED_BASE = Path("/ros2_ws/mined_scenarios")
+MINED_BASE = Path(ws_path("mined_scenarios"))
 
-def run_simulation(scenario_path, output_dir="/autoware_map", log_output=True, csv_path="simulation_results.csv"):
-    command = [
-        "ros2", "launch", "scenario_test_runner", "scenario_test_runner.launch.py",
+# Default launcher; override with a stub command (e.g. ["python3", "fake_runner.py"])
+# to exercise the pipeline without ROS. It receives the same key:=value arguments.
+ROS_LAUNCH_COMMAND = ["ros2", "launch", "scenario_test_runner", "scenario_test_runner.launch.py"]
+
+# scenario_test_runner prints no ego-NPC distance: ROS launches get entity_monitor.py
+# alongside, which reads the simulator's entity status topic (see criticality).
+USE_ENTITY_MONITOR = True
+ENTITY_MONITOR_COMMAND = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "entity_monitor.py")]
+
+# Serializes CSV appends and mined-scenario copies when several workers run at once
+_results_lock = threading.Lock()
+
+def default_launch_command():
+    """
+    Launcher used when callers pass none: ROS_LAUNCH_COMMAND, unless the
+    SIM_BACKEND environment variable selects another simulator backend.
+    """
+    backend = os.environ.get("SIM_BACKEND", "ros")
+    if backend == "ros":
+        return ROS_LAUNCH_COMMAND
+    from simulator_backends import get_backend
+    return get_backend(backend).launch_command()
+
+def telemetry_command(launch_command=None):
+    """
+    Command of the telemetry sidecar for a launch, or None (stub simulators print their own).
+    """
+    if USE_ENTITY_MONITOR and list(launch_command or default_launch_command()) == ROS_LAUNCH_COMMAND:
+        return ENTITY_MONITOR_COMMAND
+    return None
+
+def build_launch_command(scenario_path, output_dir, launch_command=None):
+    return list(launch_command or default_launch_command()) + [
         f"record:=false",
         f"scenario:={scenario_path}",
         f"sensor_model:=sample_sensor_kit",
@@ -21,39 +57,89 @@ def run_simulation(scenario_path, output_dir="/autoware_map", log_output=True, c
         f"launch_rviz:=false"
     ]
 
+def run_simulation(scenario_path, output_dir=MAP_ROOT, log_output=True, csv_path="simulation_results.csv",
+                   log_path="simulation_log.txt", domain_id=None, launch_command=None, cache=None,
+                   store=None):
+    """
+    Run one scenario and append its outcome to csv_path.
+    Concurrent callers must pass their own output_dir, log_path and domain_id.
+    Returns the parsed result dict.
+    """
+    command = build_launch_command(scenario_path, output_dir, launch_command)
+
+    env = None
+    if domain_id is not None:
+        # Isolate DDS traffic so parallel Autoware stacks don't see each other
+        env = dict(os.environ, ROS_DOMAIN_ID=str(domain_id))
+
+    # Drop the previous run's junit so a crashed launch can't report stale results
+    result_xml_path = os.path.join(output_dir, "scenario_test_runner", "result.junit.xml")
+    if os.path.exists(result_xml_path):
+        os.remove(result_xml_path)
+
     print(f"Running simulation with scenario: {scenario_path}")
+    monitor_command = telemetry_command(launch_command)
     try:
-        with open("simulation_log.txt", "w") as logfile:
-            subprocess.run(command, check=True, stdout=logfile, stderr=subprocess.STDOUT)
+        with open(log_path, "w") as logfile:
+            # the monitor's lines go to the same log, where scan_log picks them up
+            monitor = subprocess.Popen(monitor_command, stdout=logfile, stderr=subprocess.DEVNULL,
+                                       env=env) if monitor_command else None
+            try:
+                subprocess.run(command, check=True, stdout=logfile, stderr=subprocess.STDOUT, env=env)
+            finally:
+                if monitor is not None:
+                    monitor.terminate()
+                    monitor.wait()
         print("Simulation finished.")
     except subprocess.CalledProcessError as e:
         print("Simulation failed to run.")
         print(e)
 
-    xosc_path = parse_simulation_log("simulation_log.txt")
-    result_xml_path = os.path.join(output_dir, "scenario_test_runner", "result.junit.xml")
+    xosc_path = parse_simulation_log(log_path)
     result = parse_result_xml(result_xml_path)
+    result.update(scan_log(log_path, result))
 
-    # --- collision handling, per-batch mined folder ---
-    if result["collision"]:
-        # derive the batch_info string from your results CSV name
-        batch_info = Path(csv_path).stem
-        if batch_info.endswith("_results"):
-            batch_info = batch_info[:-len("_results")]
-
-        # make sure the per-batch mined dir exists
-        mined_dir = MINED_BASE / batch_info
-        mined_dir.mkdir(parents=True, exist_ok=True)
+    record_result(scenario_path, result, csv_path, cache=cache, store=store)
+    return result
 
-        # copy the .yaml into it with a timestamp
-        ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        dest = mined_dir / f"collision_{ts}.yaml"
-        shutil.copy(scenario_path, dest)
-        print(f"[💥] Collision detected! Saved to {dest}")
+def batch_info_from_csv(csv_path):
+    # derive the batch_info string from your results CSV name
+    batch_info = Path(csv_path).stem
+    if batch_info.endswith("_results"):
+        batch_info = batch_info[:-len("_results")]
+    return batch_info
 
+def record_result(scenario_path, result, csv_path, params=None, cache=None, mine=True, store=None):
+    """
+    Mine a colliding scenario and append its outcome to csv_path
+    (or to the results store, when one is given).
+    Shared by single launches, workflow runs and cache hits.
+    """
     # Extract lane and distance info
-    params = extract_scenario_parameters(scenario_path)
-    log_result_to_csv(csv_path, scenario_path, result, params)
+    if params is None:
+        params = scenario_parameters(scenario_path)
+
+    # runs without telemetry (workflow shards, old cache entries) score 0/1
+    if "criticality" not in result:
+        result = dict(result, min_distance=None, min_ttc=None, criticality=criticality_score(result))
+
+    if cache is not None:
+        cache.put(params_to_tuple(params), result)
+
+    with _results_lock:
+        # --- collision handling, per-batch mined folder ---
+        dest = None
+        if mine and result["collision"]:
+            batch_info = batch_info_from_csv(csv_path)
+
+            # named by content: collisions within the same second no longer overwrite each other
+            dest = get_store(MINED_STORE).mine(scenario_path, MINED_BASE / batch_info)
+            print(f"[💥] Collision detected! Saved to {dest}")
+
+        if store is not None:
+            store.record(scenario_path, result, params, batch_info=batch_info_from_csv(csv_path), mined_yaml=dest)
+        else:
+            log_result_to_csv(csv_path, scenario_path, result, params, mined_yaml=dest)
 
 def parse_simulation_log(log_path):
     xosc_path = None
@@ -69,6 +155,35 @@ def parse_simulation_log(log_path):
         print(f"Error reading simulation log: {e}")
     return xosc_path
 
+def classify_failure(failed, failure_msg):
+    if not failed:
+        return "success"
+    if "colliding with another given entity" in failure_msg:
+        return "collision"
+    elif "simulation time greater than" in failure_msg:
+        return "timeout"
+    elif "standstill" in failure_msg:
+        return "standstill"
+    return "unknown_failure"
+
+def make_result(failed, failure_msg):
+    match = re.search(r"colliding with another given entity (\w+)", failure_msg)
+    result_type = classify_failure(failed, failure_msg)
+    return {
+        "collision": result_type == "collision",
+        "message": failure_msg,
+        "collided_with": match.group(1) if match else None,
+        "result_type": result_type
+    }
+
+def parse_error_result(message="Error reading result file"):
+    return {
+        "collision": None,
+        "message": message,
+        "collided_with": None,
+        "result_type": "parse_error"
+    }
+
 def parse_result_xml(xml_path):
     try:
         tree = ET.parse(xml_path)
@@ -76,42 +191,47 @@ def parse_result_xml(xml_path):
 
         failures = int(root.attrib.get("failures", 0))
         failure_msg = ""
-        collision_entity = None
 
         for testcase in root.iter("testcase"):
             failure = testcase.find("failure")
             if failure is not None:
                 failure_msg = failure.attrib.get("message", "")
-                match = re.search(r"colliding with another given entity (\w+)", failure_msg)
-                if match:
-                    collision_entity = match.group(1)
-
-        result_type = "success"
-        if failures > 0:
-            if "colliding with another given entity" in failure_msg:
-                result_type = "collision"
-            elif "simulation time greater than" in failure_msg:
-                result_type = "timeout"
-            elif "standstill" in failure_msg:
-                result_type = "standstill"
-            else:
-                result_type = "unknown_failure"
-
-        return {
-            "collision": result_type == "collision",
-            "message": failure_msg,
-            "collided_with": collision_entity,
-            "result_type": result_type
-        }
+
+        return make_result(failures > 0, failure_msg)
 
     except Exception as e:
         print(f"Error parsing XML result file: {e}")
-        return {
-            "collision": None,
-            "message": "Error reading result file",
-            "collided_with": None,
-            "result_type": "parse_error"
-        }
+        return parse_error_result()
+
+def parse_result_xml_by_testcase(xml_path):
+    """
+    Parse a junit file written by a workflow run into {testcase name: result}.
+    Each scenario of the workflow is reported as its own testcase.
+    """
+    results = {}
+    try:
+        root = ET.parse(xml_path).getroot()
+    except Exception as e:
+        print(f"Error parsing XML result file: {e}")
+        return results
+
+    for testcase in root.iter("testcase"):
+        failure = testcase.find("failure")
+        if failure is None:
+            failure = testcase.find("error")
+        failure_msg = failure.attrib.get("message", "") if failure is not None else ""
+        results[testcase.attrib.get("name", "")] = make_result(failure is not None, failure_msg)
+    return results
+
+def scenario_parameters(scenario_path):
+    """
+    Parameters of a scenario file: from the generator's manifest when there is one,
+    otherwise by parsing the YAML (hand-written scenarios).
+    """
+    params = lookup_scenario_parameters(scenario_path)
+    if params is None:
+        params = extract_scenario_parameters(scenario_path)
+    return params
 
 def extract_scenario_parameters(scenario_path):
     from ruamel.yaml import YAML
@@ -146,34 +266,67 @@ def extract_scenario_parameters(scenario_path):
         "npc_dest_s": npc_dest[1]
     }
 
-def log_result_to_csv(csv_path, scenario_yaml, result, params):
+def params_to_tuple(params):
+    """
+    Parameter dict (as in the CSV) -> GA tuple order used by scenario_utils.
+    """
+    return (
+        params["ego_start_lane"], params["ego_start_s"],
+        params["npc_start_lane"], params["npc_start_s"],
+        params["ego_dest_lane"], params["ego_dest_s"],
+        params["npc_dest_lane"], params["npc_dest_s"]
+    )
+
+def serve_from_cache(scenario_path, csv_path, cache, store=None):
+    """
+    Record a cached outcome instead of launching the simulator.
+    Returns the result on a hit, None on a miss.
+    """
+    params = scenario_parameters(scenario_path)
+    result = cache.get(params_to_tuple(params))
+    if result is None:
+        return None
+    print(f"♻️ Cache hit for {os.path.basename(scenario_path)}: {result['result_type']}")
+    started = time.monotonic()
+    record_result(scenario_path, result, csv_path, params=params, mine=False, store=store)
+    trace_scenario(scenario_path, result, {"record": round(time.monotonic() - started, 4)},
+                   batch=batch_info_from_csv(csv_path), source="cache")
+    return result
+
+CSV_COLUMNS = [
+    "scenario_yaml", "collision", "result_type", "collided_with", "failure_message",
+    "ego_start_lane", "ego_start_s", "ego_dest_lane", "ego_dest_s",
+    "npc_start_lane", "npc_start_s", "npc_dest_lane", "npc_dest_s"
+] + list(METRIC_KEYS) + ["mined_yaml"]
+
+def log_result_to_csv(csv_path, scenario_yaml, result, params, mined_yaml=None):
     p = Path(csv_path)
     # Ensure the parent directory exists (even if it's just ".")
     p.parent.mkdir(parents=True, exist_ok=True)
 
-    # Check existence before opening
-    first_time = not p.exists()
+    # Check existence before opening; keep the header of an existing file
+    # (older CSVs have no telemetry columns)
+    first_time = not p.exists() or p.stat().st_size == 0
+    columns = CSV_COLUMNS
+    if not first_time:
+        with p.open(newline="") as f:
+            columns = next(csv.reader(f), CSV_COLUMNS)
+
+    row = dict(params)
+    row.update({
+        "scenario_yaml": scenario_yaml,
+        "collision": result["collision"],
+        "result_type": result["result_type"],
+        "collided_with": result["collided_with"],
+        "failure_message": result["message"]
+    })
+    for key in METRIC_KEYS:
+        row[key] = result.get(key)
+    row["mined_yaml"] = None if mined_yaml is None else str(mined_yaml)
+
     # Open in append mode (creates file if missing)
     with p.open(mode="a", newline="") as f:
-        writer = csv.writer(f)
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
         if first_time:
-            writer.writerow([
-                "scenario_yaml", "collision", "result_type", "collided_with", "failure_message",
-                "ego_start_lane", "ego_start_s", "ego_dest_lane", "ego_dest_s",
-                "npc_start_lane", "npc_start_s", "npc_dest_lane", "npc_dest_s"
-            ])
-        writer.writerow([
-            scenario_yaml,
-            result["collision"],
-            result["result_type"],
-            result["collided_with"],
-            result["message"],
-            params["ego_start_lane"],
-            params["ego_start_s"],
-            params["ego_dest_lane"],
-            params["ego_dest_s"],
-            params["npc_start_lane"],
-            params["npc_start_s"],
-            params["npc_dest_lane"],
-            params["npc_dest_s"]
-        ])
\ No newline at end of file
+            writer.writeheader()
+        writer.writerow(row)
@@ -0,0 +1,120 @@
+import math
+import itertools
+from scenario_keys import key_to_params, scenario_key
+
+# Novelty over the continuous parameters: evaluated tuples are bucketed per
+# lane combination (ego/NPC start and destination lanes) in a grid over their
+# four s values, so neighbours of a candidate are found by looking at the
+# 3^4 cells around it instead of scanning everything simulated so far.
+NOVELTY_RADIUS = 2.0   # m: a candidate closer than this to an evaluated tuple is not novel
+NOVELTY_CAP = 10.0     # m: grid cell size; neighbours further away than this count as this far
+NOVELTY_K = 5          # neighbours averaged by the novelty score
+
+_OFFSETS = list(itertools.product((-1, 0, 1), repeat=4))
+
+
+def _split(params):
+    ego_lane, ego_s, npc_lane, npc_s, ego_dest, ego_dest_s, npc_dest, npc_dest_s = params
+    lanes = (str(ego_lane), str(npc_lane), str(ego_dest), str(npc_dest))
+    return lanes, (float(ego_s), float(npc_s), float(ego_dest_s), float(npc_dest_s))
+
+
+class NoveltyIndex:
+    """
+    Grid buckets of evaluated parameter tuples, one grid per lane combination.
+    Distances are Euclidean over (ego s, NPC s, ego dest s, NPC dest s) in metres;
+    tuples on different lanes are treated as NOVELTY_CAP apart.
+    """
+
+    def __init__(self, radius=NOVELTY_RADIUS, cap=NOVELTY_CAP, k=NOVELTY_K):
+        if radius > cap:
+            raise ValueError(f"radius {radius} exceeds the grid cell size {cap}")
+        self.radius = radius
+        self.cap = cap
+        self.k = k
+        self._grids = {}   # lanes -> {cell: [s tuples]}
+        self._keys = set()
+        self.rejected = 0
+
+    def _cell(self, positions):
+        return tuple(int(math.floor(s / self.cap)) for s in positions)
+
+    def add(self, params):
+        # a tuple evaluated twice is one point (kNN would otherwise count it twice)
+        key = scenario_key(params)
+        if key in self._keys:
+            return
+        self._keys.add(key)
+        lanes, positions = _split(params)
+        grid = self._grids.setdefault(lanes, {})
+        grid.setdefault(self._cell(positions), []).append(positions)
+
+    def update(self, params_list):
+        for params in params_list:
+            self.add(params)
+        return self
+
+    def add_keys(self, keys):
+        """
+        Add the integer scenario_key values of a set such as seen_hashes
+        (SHA-256 fallbacks carry no coordinates and are skipped).
+        """
+        for key in keys:
+            if isinstance(key, int):
+                self.add(key_to_params(key))
+        return self
+
+    def __len__(self):
+        return len(self._keys)
+
+    def distances(self, params):
+        """
+        Distances to the evaluated tuples within NOVELTY_CAP, unsorted.
+        """
+        lanes, positions = _split(params)
+        grid = self._grids.get(lanes)
+        if not grid:
+            return []
+        cell = self._cell(positions)
+        cap_sq = self.cap * self.cap
+        found = []
+        for offset in _OFFSETS:
+            for other in grid.get(tuple(c + o for c, o in zip(cell, offset)), ()):
+                d_sq = sum((a - b) ** 2 for a, b in zip(positions, other))
+                if d_sq <= cap_sq:
+                    found.append(math.sqrt(d_sq))
+        return found
+
+    def is_novel(self, params):
+        lanes, positions = _split(params)
+        grid = self._grids.get(lanes)
+        if not grid:
+            return True
+        cell = self._cell(positions)
+        radius_sq = self.radius * self.radius
+        for offset in _OFFSETS:
+            for other in grid.get(tuple(c + o for c, o in zip(cell, offset)), ()):
+                if sum((a - b) ** 2 for a, b in zip(positions, other)) < radius_sq:
+                    return False
+        return True
+
+    def accept(self, params):
+        """
+        Filter for mutate_batch: rejects tuples within NOVELTY_RADIUS of an evaluated one.
+        """
+        if self.is_novel(params):
+            return True
+        self.rejected += 1
+        return False
+
+    def novelty(self, params):
+        """
+        Mean distance to the k nearest evaluated tuples, normalized to 0..1
+        (1: nothing evaluated within NOVELTY_CAP on these lanes).
+        """
+        nearest = sorted(self.distances(params))[:self.k]
+        return (sum(nearest) + self.cap * (self.k - len(nearest))) / (self.cap * self.k)
+
+    def summary(self):
+        return (f"🧭 Novelty index: {len(self._keys)} evaluated scenarios in {len(self._grids)} lane combinations, "
+                f"{self.rejected} candidates rejected within {self.radius:g} m")
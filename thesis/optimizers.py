@@ -0,0 +1,413 @@
+import abc
+import sys
+import math
+import time
+import random
+import argparse
+from scenario_generator import sample_params
+from scenario_keys import scenario_key
+from criticality import criticality_score
+from scenario_utils import (
+    START_LANE_IDS,
+    DEST_LANE_IDS,
+    EGO_LENGTH,
+    NPC_LENGTH,
+    positions_overlap,
+    read_scenario_scores
+)
+from lanelet_index import load_index
+from result_cache import ResultCache, config_fingerprint
+from results_store import ResultsStore
+from run_trace import end_generation, start_generation, start_tracing, trace_phase
+from simulator_backends import get_backend
+from sobol import SobolSequence
+from space_filling_sampler import iter_space_filling
+from work_queue import WorkQueue
+import genetic_optimizer as ga
+
+# Search strategies behind one batched ask/tell interface: ask(n) proposes n
+# parameter tuples, tell(results) takes their (criticality, params) outcomes.
+# run_strategy drives any of them over the GA's evaluator (batch folders,
+# simulator slots / workflow / work queue, result cache, results store), so
+# strategies can be compared on how fast they find collisions.
+# usage: python3 optimizers.py --strategy cmaes --budget 400
+#        python3 optimizers.py --compare ga,random,sobol,space_filling,cmaes --budget 400
+BUDGET = ga.POP_SIZE * ga.GENERATIONS * ga.SCENARIOS_PER_BATCH  # simulated scenarios per strategy
+MAX_TRIES = 50           # draws per proposal before falling back to a random tuple
+CMA_SIGMA = 0.3          # initial CMA-ES step size in the unit cube
+MAX_CACHED_ROUNDS = 10   # consecutive rounds served entirely from the cache before a strategy is stopped
+
+# Unit-cube encoding of a parameter tuple, in tuple order: a lane coordinate
+# picks one of its lanes by interval, an s coordinate is the fraction of the lane's range.
+LANE_TABLES = (START_LANE_IDS, None, START_LANE_IDS, None, DEST_LANE_IDS, None, DEST_LANE_IDS, None)
+DIMENSIONS = len(LANE_TABLES)
+
+
+def decode(u):
+    """
+    Parameter tuple of a point of [0, 1]^8.
+    """
+    params = []
+    for i in range(0, DIMENSIONS, 2):
+        lanes = list(LANE_TABLES[i])
+        lane = lanes[min(len(lanes) - 1, int(min(max(u[i], 0.0), 1.0) * len(lanes)))]
+        low, high = LANE_TABLES[i][lane]
+        params += [lane, round(low + min(max(u[i + 1], 0.0), 1.0) * (high - low), 2)]
+    return tuple(params)
+
+
+def encode(params):
+    """
+    Unit-cube point of a parameter tuple (lanes at the centre of their interval).
+    """
+    u = []
+    for i in range(0, DIMENSIONS, 2):
+        lanes = list(LANE_TABLES[i])
+        lane = str(params[i])
+        low, high = LANE_TABLES[i][lane]
+        u += [(lanes.index(lane) + 0.5) / len(lanes), (float(params[i + 1]) - low) / ((high - low) or 1.0)]
+    return u
+
+
+class Strategy(abc.ABC):
+    """
+    Base class: ask(n) proposes n tuples not proposed before, tell(results) learns
+    from (criticality, params) outcomes (any order, possibly fewer than asked).
+    """
+    name = None
+
+    def __init__(self, accept=None):
+        self.accept = accept     # optional filter, e.g. LaneletIndex.accept
+        self.seen = set()        # scenario_key values of every proposed tuple
+
+    def admissible(self, params):
+        if params[0] == params[2] and positions_overlap(params[1], EGO_LENGTH, params[3], NPC_LENGTH):
+            return False
+        return scenario_key(params) not in self.seen and (self.accept is None or self.accept(params))
+
+    def propose(self, draw):
+        """
+        First admissible result of draw() (MAX_TRIES attempts), else a random tuple.
+        """
+        for _ in range(MAX_TRIES):
+            params = draw()
+            if self.admissible(params):
+                break
+        else:
+            params = sample_params()
+        self.seen.add(scenario_key(params))
+        return params
+
+    @abc.abstractmethod
+    def ask(self, n):
+        """
+        n new parameter tuples to evaluate.
+        """
+
+    def tell(self, results):
+        pass
+
+
+class RandomStrategy(Strategy):
+    """
+    Independent draws as in scenario_generator: the baseline of the initial campaigns.
+    """
+    name = "random"
+
+    def ask(self, n):
+        return [self.propose(sample_params) for _ in range(n)]
+
+
+class SobolStrategy(Strategy):
+    """
+    Scrambled Sobol points of the unit cube: space-filling, no learning.
+    """
+    name = "sobol"
+
+    def __init__(self, accept=None, seed=None):
+        super().__init__(accept)
+        self.sequence = SobolSequence(DIMENSIONS, seed=seed)
+
+    def ask(self, n):
+        return [self.propose(lambda: decode(self.sequence.next())) for _ in range(n)]
+
+
+class SpaceFillingStrategy(Strategy):
+    """
+    The space-filling initial-campaign sampler: lane pairs in turn, Sobol positions
+    near the intersection. No learning.
+    """
+    name = "space_filling"
+
+    def __init__(self, accept=None, seed=None):
+        super().__init__()  # the stream applies accept itself
+        self.stream = iter_space_filling(accept=accept, seed=seed)
+
+    def ask(self, n):
+        return [self.propose(lambda: next(self.stream, None) or sample_params()) for _ in range(n)]
+
+
+class GAStrategy(Strategy):
+    """
+    The genetic optimizer as a strategy: children (breed_child: crossover + mutation)
+    of the two fittest batches told so far, or, in "scenario" selection mode, of
+    draws from the elite scenarios. The known seed collisions are its starting
+    population, told up front: they are never proposed, so they cost no budget
+    and are not counted as finds.
+    """
+    name = "ga"
+
+    def __init__(self, seed_params, accept=None, pop_size=ga.POP_SIZE, selection=ga.SELECTION_MODE,
+                 batch_size=ga.SCENARIOS_PER_BATCH):
+        super().__init__(accept)
+        self.selection = selection
+        self.seen.update(scenario_key(params) for params in seed_params)
+        # (collision share, params) of told batches; the seeds are known collisions
+        self.archive = [(1.0, self._sample(seed_params, batch_size)) for _ in range(pop_size)]
+        self.elite = ga.select_elite_scenarios([(1.0, params) for params in seed_params])
+
+    def _sample(self, pool, n):
+        return random.sample(pool, k=n) if len(pool) >= n else random.choices(pool, k=n)
+
+    def ask(self, n):
+        batch = []
+        while len(batch) < n:
+            if self.selection == "scenario":
+                elite_params = [params for _, params in self.elite]
+                parents = (self._sample(elite_params, n), self._sample(elite_params, n))
+            else:
+                ranked = sorted(self.archive, key=lambda entry: entry[0], reverse=True)
+                parents = (ranked[0][1], ranked[1][1])
+            # breed_child marks its mutations as seen: give it a copy, so admissible() still accepts them
+            batch += [params for params in ga.breed_child(parents[0], parents[1], set(self.seen), self.accept)
+                      if self.admissible(params) and params not in batch]
+            if not batch:
+                batch.append(self.propose(sample_params))  # breeding is stuck: fall back to a fresh draw
+        batch = batch[:n]
+        for params in batch:
+            self.seen.add(scenario_key(params))
+        return batch
+
+    def tell(self, results):
+        if results:
+            collisions = sum(criticality >= 1.0 for criticality, _ in results)
+            self.archive.append((collisions / len(results), [params for _, params in results]))
+            self.elite = ga.select_elite_scenarios(self.elite + list(results))
+
+
+class CMAESStrategy(Strategy):
+    """
+    Separable CMA-ES (diagonal covariance, Ros & Hansen 2008) over the unit-cube
+    encoding, maximizing criticality. Lanes are searched through their interval
+    coordinate; each tell is one generation with the results as the population.
+    """
+    name = "cmaes"
+
+    def __init__(self, accept=None, x0=None, sigma=CMA_SIGMA):
+        super().__init__(accept)
+        n = DIMENSIONS
+        self.mean = list(x0) if x0 is not None else [0.5] * n
+        self.sigma = sigma
+        self.c = [1.0] * n        # diagonal of the covariance matrix
+        self.pc = [0.0] * n
+        self.ps = [0.0] * n
+        self.generation = 0
+        self.chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+        self._points = {}         # scenario_key -> sampled point, for tell
+
+    def _sample(self):
+        x = [min(max(m + self.sigma * math.sqrt(c) * random.gauss(0, 1), 0.0), 1.0)
+             for m, c in zip(self.mean, self.c)]
+        params = decode(x)
+        self._points[scenario_key(params)] = x
+        return params
+
+    def ask(self, n):
+        return [self.propose(self._sample) for _ in range(n)]
+
+    def tell(self, results):
+        if len(results) < 2:
+            return
+        n = DIMENSIONS
+        ranked = sorted(results, key=lambda r: r[0], reverse=True)
+        mu = len(ranked) // 2
+        weights = [math.log(mu + 0.5) - math.log(i + 1) for i in range(mu)]
+        total = sum(weights)
+        weights = [w / total for w in weights]
+        mueff = 1 / sum(w * w for w in weights)
+
+        cc = 4 / (n + 4)
+        cs = (mueff + 2) / (n + mueff + 3)
+        c1 = 2 / ((n + 1.3) ** 2 + mueff) * (n + 2) / 3
+        cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff) * (n + 2) / 3)
+        damps = 1 + 2 * max(0.0, math.sqrt((mueff - 1) / (n + 1)) - 1) + cs
+
+        # steps of the mu best, in units of sigma
+        steps = []
+        for _, params in ranked[:mu]:
+            x = self._points.pop(scenario_key(params), None) or encode(params)
+            steps.append([(xi - m) / self.sigma for xi, m in zip(x, self.mean)])
+        y_w = [sum(w * y[d] for w, y in zip(weights, steps)) for d in range(n)]
+        self.mean = [m + self.sigma * y for m, y in zip(self.mean, y_w)]
+
+        self.generation += 1
+        self.ps = [(1 - cs) * p + math.sqrt(cs * (2 - cs) * mueff) * y / math.sqrt(c)
+                   for p, y, c in zip(self.ps, y_w, self.c)]
+        ps_norm = math.sqrt(sum(p * p for p in self.ps))
+        hsig = ps_norm / math.sqrt(1 - (1 - cs) ** (2 * self.generation)) / self.chi_n < 1.4 + 2 / (n + 1)
+        self.pc = [(1 - cc) * p + hsig * math.sqrt(cc * (2 - cc) * mueff) * y for p, y in zip(self.pc, y_w)]
+        self.c = [
+            (1 - c1 - cmu) * c
+            + c1 * (pc * pc + (not hsig) * cc * (2 - cc) * c)
+            + cmu * sum(w * y[d] ** 2 for w, y in zip(weights, steps))
+            for d, (c, pc) in enumerate(zip(self.c, self.pc))
+        ]
+        self.sigma *= math.exp(cs / damps * (ps_norm / self.chi_n - 1))
+        self.sigma = min(self.sigma, 1.0)  # the whole cube is 1 wide
+        self._points.clear()
+
+
+def make_strategy(name, seed_params=None, accept=None):
+    if name == "random":
+        return RandomStrategy(accept)
+    if name == "sobol":
+        return SobolStrategy(accept)
+    if name == "space_filling":
+        return SpaceFillingStrategy(accept)
+    if name == "cmaes":
+        return CMAESStrategy(accept)
+    if name == "ga":
+        if not seed_params:
+            raise ValueError("the GA strategy needs seed collisions (run the initial simulation first)")
+        return GAStrategy(seed_params, accept)
+    raise ValueError(f"Unknown strategy {name!r} (expected random, sobol, space_filling, cmaes or ga)")
+
+
+def evaluate_batch(batch_params, batch_info, cache=None, store=None, queue=None):
+    """
+    Write, simulate and score one batch like genetic_optimizer.evaluate_population.
+    Returns (criticality, params) of its scenarios.
+    """
+    workdir = ga.GENERATED_BASE / batch_info
+    result_csv = ga.RESULTS_BASE / f"{batch_info}_results.csv"
+    with trace_phase("generate", batch=batch_info):
+        ga.write_batch(workdir, batch_params)
+    result_csv.unlink(missing_ok=True)
+    result_csv.parent.mkdir(parents=True, exist_ok=True)
+    with trace_phase("evaluate", batch=batch_info):
+        ga.run_batch(workdir, result_csv, cache=cache, store=store, queue=queue)
+    if store is not None:
+        return store.scenario_scores(batch_info)
+    return read_scenario_scores(str(result_csv))
+
+
+def cached_scores(params_list, cache):
+    """
+    Split tuples into (criticality, params) outcomes already in the result cache
+    and the tuples that still need simulating.
+    """
+    known, fresh = [], []
+    for params in params_list:
+        result = cache.get(params) if cache is not None else None
+        if result is None:
+            fresh.append(params)
+        else:
+            criticality = result.get("criticality")
+            known.append((criticality if criticality is not None else criticality_score(result), params))
+    return known, fresh
+
+
+def run_strategy(strategy, budget=BUDGET, batch_size=ga.SCENARIOS_PER_BATCH, cache=None, store=None):
+    """
+    Ask/evaluate/tell until `budget` scenarios were simulated. Returns a summary:
+    collisions found, distinct collisions and the evaluation that found the first one.
+    Proposals the result cache already knows are told to the strategy but neither
+    simulated nor counted (reported as "cached"), so strategies compare on their own finds.
+    """
+    queue = WorkQueue(ga.QUEUE_DIR) if ga.QUEUE_DIR else None
+    simulated = collisions = cached = 0
+    first_collision = None
+    distinct = set()
+    best = 0.0
+    cached_rounds = 0
+    started = time.monotonic()
+    round_index = 0
+    while simulated < budget:
+        batch_info = f"{strategy.name}_batch{round_index}"
+        round_index += 1
+        batch_params = strategy.ask(min(batch_size, budget - simulated))
+        known, fresh = cached_scores(batch_params, cache)
+        cached += len(known)
+        if not fresh:
+            strategy.tell(known)
+            cached_rounds += 1
+            if cached_rounds >= MAX_CACHED_ROUNDS:
+                print(f"⚠️ {strategy.name}: {MAX_CACHED_ROUNDS} rounds in a row fully cached, stopping")
+                break
+            continue
+        cached_rounds = 0
+        start_generation(batch_info)
+        results = evaluate_batch(fresh, batch_info, cache, store, queue)
+        strategy.tell(results + known)
+        end_generation(batch_info)
+
+        for criticality, params in results:
+            simulated += 1
+            best = max(best, criticality)
+            if criticality >= 1.0:
+                collisions += 1
+                distinct.add(scenario_key(params))
+                if first_collision is None:
+                    first_collision = simulated
+        print(f"🔎 {strategy.name}: {simulated}/{budget} simulated, {collisions} collisions "
+              f"({len(distinct)} distinct), best criticality {best:.2f}, {cached} cached")
+    return {
+        "strategy": strategy.name,
+        "simulated": simulated,
+        "cached": cached,
+        "collisions": collisions,
+        "distinct_collisions": len(distinct),
+        "first_collision": first_collision,
+        "best_criticality": best,
+        "seconds": round(time.monotonic() - started, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run or compare scenario search strategies")
+    parser.add_argument("--strategy", default="ga", help="random, sobol, space_filling, cmaes or ga")
+    parser.add_argument("--compare", help="comma-separated strategies, run one after the other with the same budget")
+    parser.add_argument("--budget", type=int, default=BUDGET, help="simulated scenarios per strategy")
+    parser.add_argument("--batch", type=int, default=ga.SCENARIOS_PER_BATCH, help="scenarios per ask")
+    args = parser.parse_args()
+
+    launch_command = get_backend(ga.SIMULATOR_BACKEND).launch_command()
+    cache = ResultCache(ga.RESULT_CACHE_PATH, config_fingerprint(ga.TEMPLATE, launch_command)) if ga.USE_RESULT_CACHE else None
+    store = ResultsStore(ga.RESULTS_DB_PATH) if ga.USE_RESULTS_STORE else None
+    if ga.TRACE:
+        start_tracing(str(ga.TRACE_PATH), str(ga.METRICS_PATH) if ga.PROMETHEUS_METRICS else None, workers=ga.WORKERS)
+    lane_index = load_index() if ga.USE_LANE_INDEX else None
+    accept = lane_index.accept if lane_index is not None else None
+    seed_params = ga.load_seed_params(store)
+
+    summaries = []
+    for name in (args.compare.split(",") if args.compare else [args.strategy]):
+        try:
+            strategy = make_strategy(name.strip(), seed_params, accept)
+        except ValueError as e:
+            print(f"❌ {e}")
+            continue
+        print(f"\n==== Strategy {strategy.name} ====")
+        summaries.append(run_strategy(strategy, args.budget, args.batch, cache, store))
+
+    print(f"\n{'strategy':<14} {'simulated':>9} {'cached':>6} {'collisions':>10} {'distinct':>8} {'first':>6} "
+          f"{'best':>5} {'seconds':>8}")
+    for s in summaries:
+        print(f"{s['strategy']:<14} {s['simulated']:>9} {s['cached']:>6} {s['collisions']:>10} "
+              f"{s['distinct_collisions']:>8} {s['first_collision'] or '-':>6} {s['best_criticality']:>5.2f} "
+              f"{s['seconds']:>8}")
+    return 0 if summaries else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+import os
+
+# Roots of the map and workspace mounts. Hosts that mount them elsewhere
+# (e.g. distributed workers) override them: AUTOWARE_MAP=/data/map ROS2_WS=/data/ws
+MAP_ROOT = os.environ.get("AUTOWARE_MAP", "/autoware_map")
+WS_ROOT = os.environ.get("ROS2_WS", "/ros2_ws")
+
+
+def map_path(*parts):
+    return os.path.join(MAP_ROOT, *parts)
+
+
+def ws_path(*parts):
+    return os.path.join(WS_ROOT, *parts)
@@ -0,0 +1,199 @@
+# Array-backed scenario populations for large candidate pools.
+# A population is a NumPy structured array with one row per scenario: lane indexes
+# into START_LANES / DEST_LANES and float s positions. Crossover, mutation, clamping
+# and the overlap check run over the whole array, with the semantics of
+# crossover_batches / mutate_batch in scenario_utils.
+from scenario_utils import START_LANE_IDS, DEST_LANE_IDS, EGO_LENGTH, NPC_LENGTH
+from scenario_keys import START_LANES, DEST_LANES, DM_BITS, MAX_DM, POSITION_BITS
+
+try:
+    import numpy as np
+except ImportError:  # optional: genetic_optimizer.breed_pool falls back to the tuple path
+    np = None
+
+# Field order matches the GA parameter tuples
+FIELDS = [
+    ("ego_lane", "u1"), ("ego_s", "f8"), ("npc_lane", "u1"), ("npc_s", "f8"),
+    ("ego_dest", "u1"), ("ego_dest_s", "f8"), ("npc_dest", "u1"), ("npc_dest_s", "f8")
+]
+# (lane field, s field, lane table) per position
+POSITIONS = [
+    ("ego_lane", "ego_s", START_LANES), ("npc_lane", "npc_s", START_LANES),
+    ("ego_dest", "ego_dest_s", DEST_LANES), ("npc_dest", "npc_dest_s", DEST_LANES)
+]
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("population_engine needs NumPy: pip install numpy")
+
+
+def _max_s(lanes):
+    table = START_LANE_IDS if lanes is START_LANES else DEST_LANE_IDS
+    return np.array([table[lane][1] for lane in lanes])
+
+
+def empty(n):
+    _require_numpy()
+    return np.zeros(n, dtype=FIELDS)
+
+
+def from_tuples(batch_params):
+    """
+    GA parameter tuples -> population array (ValueError for a lane ID outside the tables).
+    """
+    pop = empty(len(batch_params))
+    for i, (lane_field, s_field, lanes) in enumerate(POSITIONS):
+        index = {lane: n for n, lane in enumerate(lanes)}
+        try:
+            pop[lane_field] = [index[str(params[2 * i])] for params in batch_params]
+        except KeyError as e:
+            raise ValueError(f"Unknown lane ID {e.args[0]}") from None
+        pop[s_field] = [float(params[2 * i + 1]) for params in batch_params]
+    return pop
+
+
+def to_tuples(pop):
+    """
+    Population array -> GA parameter tuples (lane IDs as strings, s rounded to 0.1 m).
+    """
+    columns = []
+    for lane_field, s_field, lanes in POSITIONS:
+        columns.append([lanes[i] for i in pop[lane_field].tolist()])
+        columns.append((np.rint(pop[s_field] * 10) / 10).tolist())
+    ego_lane, ego_s, npc_lane, npc_s, ego_dest, ego_dest_s, npc_dest, npc_dest_s = columns
+    return list(zip(ego_lane, ego_s, npc_lane, npc_s, ego_dest, ego_dest_s, npc_dest, npc_dest_s))
+
+
+def random_population(n, rng=None):
+    """
+    n scenarios with uniform lanes and s positions anywhere on their lane.
+    """
+    _require_numpy()
+    rng = rng or np.random.default_rng()
+    pop = empty(n)
+    for lane_field, s_field, lanes in POSITIONS:
+        pop[lane_field] = rng.integers(0, len(lanes), n)
+        pop[s_field] = np.round(rng.uniform(0.0, _max_s(lanes)[pop[lane_field]]), 1)
+    return pop
+
+
+def row_keys(pop):
+    """
+    scenario_keys.scenario_key of every row, as int64.
+    """
+    keys = np.zeros(len(pop), dtype=np.int64)
+    for lane_field, s_field, _ in POSITIONS:
+        decimetres = np.clip(np.rint(pop[s_field] * 10), 0, MAX_DM).astype(np.int64)
+        keys = (keys << POSITION_BITS) | (pop[lane_field].astype(np.int64) << DM_BITS) | decimetres
+    return keys
+
+
+def overlap_mask(pop, buffer=1.0):
+    """
+    Rows where ego and NPC start on the same lane with overlapping footprints
+    (positions_overlap over the whole array).
+    """
+    ego_s, npc_s = pop["ego_s"], pop["npc_s"]
+    apart = (ego_s + EGO_LENGTH + buffer < npc_s) | (npc_s + NPC_LENGTH + buffer < ego_s)
+    return (pop["ego_lane"] == pop["npc_lane"]) & ~apart
+
+
+def crossover(pop_a, pop_b, crossover_rate=0.5, rng=None):
+    """
+    Uniform per-field crossover, row i of pop_a with row i % len(pop_b) of pop_b.
+    """
+    _require_numpy()
+    rng = rng or np.random.default_rng()
+    partner = pop_b[np.arange(len(pop_a)) % len(pop_b)]
+    child = pop_a.copy()
+    for name, _ in FIELDS:
+        take_b = rng.random(len(pop_a)) >= crossover_rate
+        child[name][take_b] = partner[name][take_b]
+    return child
+
+
+def _propose(pop, rng, max_delta, min_delta, lane_mutation_rate):
+    proposal = pop.copy()
+    n = len(pop)
+    for lane_field, s_field, lanes in POSITIONS:
+        delta = rng.uniform(-max_delta, max_delta, n)
+        small = np.abs(delta) < min_delta
+        delta[small] = np.where(delta[small] >= 0, min_delta, -min_delta)
+        # clamp against the lane the row had before this mutation, as mutate_batch does
+        max_s = _max_s(lanes)[pop[lane_field]]
+        proposal[s_field] = np.round(np.clip(pop[s_field] + delta, 0.0, max_s), 1)
+
+        swap = rng.random(n) < lane_mutation_rate
+        proposal[lane_field][swap] = rng.integers(0, len(lanes), int(swap.sum()))
+    return proposal
+
+
+def mutate(pop, seen=None, mutation_rate=0.30, max_delta=10.0, min_delta=1.0,
+           lane_mutation_rate=0.20, max_attempts=10, rng=None, accept=None):
+    """
+    Batch counterpart of scenario_utils.mutate_batch. Rows already in `seen`
+    (a set of scenario_key / row_keys integers) or repeating an earlier row always
+    mutate, others with probability mutation_rate; so do rows rejected by accept(tuple).
+    Proposals that are seen, overlap, repeat another row of the batch or are
+    rejected by accept are redrawn up to max_attempts times, after which the row
+    keeps its original values. Accepted keys are added to `seen`, which is only
+    probed row by row, so its size does not matter.
+    Like mutate_batch, the result has no duplicate rows where unused original rows
+    can replace them. Returns a new array of the same length.
+    """
+    _require_numpy()
+    rng = rng or np.random.default_rng()
+    seen = seen if seen is not None else set()
+
+    def unseen(keys):
+        return np.array([key not in seen for key in keys.tolist()], dtype=bool)
+
+    out = pop.copy()
+    original_keys = row_keys(pop)
+    _, first = np.unique(original_keys, return_index=True)
+    pending = rng.random(len(pop)) < mutation_rate
+    pending[np.setdiff1d(np.arange(len(pop)), first)] = True
+    pending |= ~unseen(original_keys)
+    if accept is not None:
+        pending |= ~np.array([bool(accept(params)) for params in to_tuples(pop)], dtype=bool)
+    # rows that stay as they are: proposals must not repeat them
+    taken = original_keys[~pending]
+    pending = np.flatnonzero(pending)
+
+    for _ in range(max_attempts + 1):
+        if not len(pending):
+            break
+        proposal = _propose(pop[pending], rng, max_delta, min_delta, lane_mutation_rate)
+        keys = row_keys(proposal)
+        ok = ~overlap_mask(proposal) & ~np.isin(keys, taken) & unseen(keys)
+        # two rows proposing the same tuple in one pass: keep the first
+        _, first = np.unique(keys, return_index=True)
+        unique = np.zeros(len(keys), dtype=bool)
+        unique[first] = True
+        ok &= unique
+        if accept is not None:
+            checked = np.flatnonzero(ok)
+            ok[checked] = [bool(accept(params)) for params in to_tuples(proposal[checked])]
+
+        out[pending[ok]] = proposal[ok]
+        taken = np.concatenate([taken, keys[ok]])
+        seen.update(keys[ok].tolist())
+        pending = pending[~ok]
+
+    if len(pending):
+        # rows that gave up may repeat another row: swap in unused original rows, as mutate_batch refills
+        keys = row_keys(out)
+        _, first = np.unique(keys, return_index=True)
+        duplicates = np.setdiff1d(np.arange(len(out)), first)
+        spare = unique_rows(pop[~np.isin(original_keys, keys)])[:len(duplicates)]
+        out[duplicates[:len(spare)]] = spare
+    return out
+
+
+def unique_rows(pop):
+    """
+    Population without duplicate rows (at 0.1 m resolution), first occurrence kept.
+    """
+    _, first = np.unique(row_keys(pop), return_index=True)
+    return pop[np.sort(first)]
@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+import threading
+from launch_scenario import build_launch_command
+from scenario_utils import round_scenario_hash
+from paths import ws_path
+
+DEFAULT_CACHE_PATH = ws_path("simulation_results", "result_cache.jsonl")
+
+
+def config_fingerprint(template_path, launch_command=None, extra=""):
+    """
+    Hash of everything besides the parameter tuple that decides a simulation outcome:
+    the scenario template and the simulator launch configuration.
+    """
+    h = hashlib.sha256()
+    with open(template_path, "rb") as f:
+        h.update(f.read())
+    # placeholders keep the fingerprint independent of per-run paths
+    h.update(" ".join(build_launch_command("<scenario>", "<output>", launch_command)).encode())
+    h.update(str(extra).encode())
+    return h.hexdigest()[:16]
+
+
+def normalize_params(params):
+    """
+    Make tuples loaded from YAML, CSV or the GA hash identically (ints vs floats, lane types).
+    """
+    return tuple(
+        float(p) if isinstance(p, (int, float)) and not isinstance(p, bool) else str(p)
+        for p in params
+    )
+
+
+class ResultCache:
+    """
+    Append-only JSON-lines cache of simulation outcomes keyed by
+    round_scenario_hash(params) plus the template/simulator fingerprint.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, config_hash=""):
+        self.path = str(path)
+        self.config_hash = config_hash
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from an interrupted run
+                    self._entries[entry["key"]] = entry["result"]
+        except FileNotFoundError:
+            pass
+
+    def key(self, params):
+        return f"{self.config_hash}:{round_scenario_hash(normalize_params(params))}"
+
+    def get(self, params):
+        result = self._entries.get(self.key(params))
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return dict(result) if result is not None else None
+
+    def put(self, params, result):
+        # never cache broken runs, they should be retried
+        if result.get("result_type") == "parse_error":
+            return
+        key = self.key(params)
+        entry = {"key": key, "params": list(normalize_params(params)), "result": result}
+        with self._lock:
+            self._entries[key] = result
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def __len__(self):
+        return len(self._entries)
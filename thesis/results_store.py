@@ -0,0 +1,296 @@
+import csv
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from scenario_utils import round_scenario_hash
+from paths import ws_path
+
+DEFAULT_DB_PATH = ws_path("simulation_results", "results.sqlite")
+
+CSV_COLUMNS = [
+    "scenario_yaml", "collision", "result_type", "collided_with", "failure_message",
+    "ego_start_lane", "ego_start_s", "ego_dest_lane", "ego_dest_s",
+    "npc_start_lane", "npc_start_s", "npc_dest_lane", "npc_dest_s",
+    "min_distance", "min_ttc", "criticality", "mined_yaml"
+]
+
+# The eight scenario parameters, in GA tuple order
+PARAM_COLUMNS = ("ego_start_lane", "ego_start_s", "npc_start_lane", "npc_start_s",
+                 "ego_dest_lane", "ego_dest_s", "npc_dest_lane", "npc_dest_s")
+
+# Columns added after the first schema; created on open if an older database lacks them
+ADDED_COLUMNS = [("min_distance", "REAL"), ("min_ttc", "REAL"), ("criticality", "REAL"), ("source_file", "TEXT"),
+                 ("mined_yaml", "TEXT")]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id          TEXT,
+    batch_info      TEXT,
+    generation      INTEGER,
+    batch           INTEGER,
+    scenario_yaml   TEXT,
+    scenario_hash   TEXT,
+    collision       INTEGER,
+    result_type     TEXT,
+    collided_with   TEXT,
+    failure_message TEXT,
+    ego_start_lane  TEXT,
+    ego_start_s     REAL,
+    ego_dest_lane   TEXT,
+    ego_dest_s      REAL,
+    npc_start_lane  TEXT,
+    npc_start_s     REAL,
+    npc_dest_lane   TEXT,
+    npc_dest_s      REAL,
+    lane_pair       TEXT,
+    recorded_at     TEXT,
+    min_distance    REAL,
+    min_ttc         REAL,
+    criticality     REAL,
+    source_file     TEXT,
+    mined_yaml      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_run        ON results (run_id, batch_info);
+CREATE INDEX IF NOT EXISTS idx_results_gen_batch  ON results (generation, batch);
+CREATE INDEX IF NOT EXISTS idx_results_hash       ON results (scenario_hash);
+CREATE INDEX IF NOT EXISTS idx_results_type       ON results (result_type);
+CREATE INDEX IF NOT EXISTS idx_results_lane_pair  ON results (lane_pair, result_type);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path            TEXT PRIMARY KEY,
+    mtime_ns        INTEGER,
+    size            INTEGER,
+    ingested_at     TEXT
+);
+"""
+
+INSERT_RESULT = (
+    "INSERT INTO results (run_id, batch_info, generation, batch, scenario_yaml, scenario_hash,"
+    " collision, result_type, collided_with, failure_message,"
+    " ego_start_lane, ego_start_s, ego_dest_lane, ego_dest_s,"
+    " npc_start_lane, npc_start_s, npc_dest_lane, npc_dest_s, lane_pair, recorded_at,"
+    " min_distance, min_ttc, criticality, source_file, mined_yaml)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+# created after the column migration (older databases lack source_file until then)
+SOURCE_FILE_INDEX = "CREATE INDEX IF NOT EXISTS idx_results_source ON results (source_file)"
+
+
+def parse_batch_info(batch_info):
+    """
+    "gen3_batch7" -> (3, 7); anything else -> (None, None).
+    """
+    match = re.fullmatch(r"gen(\d+)_batch(\d+)", batch_info or "")
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+
+class ResultsStore:
+    """
+    SQLite (WAL) store for simulation outcomes.
+    Safe for concurrent writers: one connection per thread, and SQLite's
+    file locking covers several processes sharing the same database.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, run_id=None):
+        self.path = str(path)
+        self.run_id = run_id or datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        self._local = threading.local()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+            for name, sql_type in ADDED_COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE results ADD COLUMN {name} {sql_type}")
+            conn.execute(SOURCE_FILE_INDEX)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row(self, scenario_yaml, result, params, batch_info=None, run_id=None, source_file=None, mined_yaml=None):
+        generation, batch = parse_batch_info(batch_info)
+        scenario_hash = round_scenario_hash((
+            params["ego_start_lane"], params["ego_start_s"],
+            params["npc_start_lane"], params["npc_start_s"],
+            params["ego_dest_lane"], params["ego_dest_s"],
+            params["npc_dest_lane"], params["npc_dest_s"]
+        ))
+        return (
+            run_id or self.run_id, batch_info, generation, batch, str(scenario_yaml), scenario_hash,
+            None if result["collision"] is None else int(bool(result["collision"])),
+            result["result_type"], result["collided_with"], result["message"],
+            _str(params["ego_start_lane"]), _float(params["ego_start_s"]),
+            _str(params["ego_dest_lane"]), _float(params["ego_dest_s"]),
+            _str(params["npc_start_lane"]), _float(params["npc_start_s"]),
+            _str(params["npc_dest_lane"]), _float(params["npc_dest_s"]),
+            f"{params['ego_start_lane']}-{params['npc_start_lane']}",
+            datetime.utcnow().isoformat(),
+            result.get("min_distance"), result.get("min_ttc"), result.get("criticality"),
+            _str(source_file), _str(mined_yaml)
+        )
+
+    def record(self, scenario_yaml, result, params, batch_info=None, run_id=None, mined_yaml=None):
+        """
+        mined_yaml: the collision's content-addressed copy (scenario_yaml is a
+        batch workdir file, rewritten by later runs).
+        """
+        with self._conn() as conn:
+            conn.execute(INSERT_RESULT, self._row(scenario_yaml, result, params, batch_info, run_id,
+                                                  mined_yaml=mined_yaml))
+
+    def record_ingested(self, entries, files):
+        """
+        Replace the results of re-read files and mark the files as ingested, in one
+        transaction (a crash never leaves results without their ledger entry, and a
+        rewritten file never leaves its earlier rows behind).
+        entries: (scenario_yaml, result, params, batch_info, source_file); files: (path, mtime_ns, size).
+        """
+        now = datetime.utcnow().isoformat()
+        with self._conn() as conn:
+            conn.executemany("DELETE FROM results WHERE source_file = ?", [(str(path),) for path, _, _ in files])
+            conn.executemany(INSERT_RESULT, [
+                self._row(scenario_yaml, result, params, batch_info, source_file=source_file)
+                for scenario_yaml, result, params, batch_info, source_file in entries
+            ])
+            conn.executemany(
+                "INSERT OR REPLACE INTO ingested_files (path, mtime_ns, size, ingested_at) VALUES (?, ?, ?, ?)",
+                [(str(path), mtime_ns, size, now) for path, mtime_ns, size in files]
+            )
+
+    def ingested_files(self, prefix=""):
+        """
+        {path: (mtime_ns, size)} of junit files already ingested (see junit_indexer).
+        """
+        rows = self._conn().execute(
+            "SELECT path, mtime_ns, size FROM ingested_files WHERE substr(path, 1, ?) = ?",
+            (len(prefix), prefix)
+        )
+        return {path: (mtime_ns, size) for path, mtime_ns, size in rows}
+
+    def delete_batch(self, batch_info, run_id=None):
+        """
+        Remove the rows of a batch of a run (a batch evaluated again from scratch).
+        """
+        with self._conn() as conn:
+            conn.execute("DELETE FROM results WHERE run_id = ? AND batch_info = ?",
+                         (run_id or self.run_id, batch_info))
+
+    def collision_rate(self, batch_info, run_id=None):
+        total, collisions = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(result_type = 'collision'), 0)"
+            " FROM results WHERE run_id = ? AND batch_info = ?",
+            (run_id or self.run_id, batch_info)
+        ).fetchone()
+        return collisions / total if total > 0 else 0.0
+
+    def count_collisions(self, batch_info, run_id=None):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM results WHERE run_id = ? AND batch_info = ? AND result_type = 'collision'",
+            (run_id or self.run_id, batch_info)
+        ).fetchone()[0]
+
+    def recorded_scenarios(self, batch_info, run_id=None):
+        """
+        Scenario files already recorded for a batch of a run.
+        """
+        rows = self._conn().execute(
+            "SELECT DISTINCT scenario_yaml FROM results WHERE run_id = ? AND batch_info = ?",
+            (run_id or self.run_id, batch_info)
+        )
+        return {row[0] for row in rows}
+
+    def collision_params(self, batch_info=None, run_id=None):
+        """
+        Parameter tuples (GA order) of recorded collisions, optionally for one batch/run.
+        """
+        query = ("SELECT ego_start_lane, ego_start_s, npc_start_lane, npc_start_s,"
+                 " ego_dest_lane, ego_dest_s, npc_dest_lane, npc_dest_s"
+                 " FROM results WHERE result_type = 'collision'")
+        args = []
+        if run_id is not None:
+            query += " AND run_id = ?"
+            args.append(run_id)
+        if batch_info is not None:
+            query += " AND batch_info = ?"
+            args.append(batch_info)
+        return [tuple(row) for row in self._conn().execute(query, args)]
+
+    def collisions_since(self, last_id=0):
+        """
+        Collision rows (all runs) with an id above last_id, oldest first:
+        (id, run_id, batch_info, mined_yaml, collided_with, failure_message, min_ttc,
+        recorded_at, then the eight parameters in GA order).
+        Rows with a missing parameter (results ingested without their scenario file) are left out.
+        """
+        return self._conn().execute(
+            "SELECT id, run_id, batch_info, mined_yaml, collided_with, failure_message, min_ttc, recorded_at,"
+            f" {', '.join(PARAM_COLUMNS)}"
+            " FROM results WHERE result_type = 'collision' AND id > ?"
+            + "".join(f" AND {column} IS NOT NULL" for column in PARAM_COLUMNS)
+            + " ORDER BY id",
+            (last_id,)
+        ).fetchall()
+
+    def scenario_scores(self, batch_info=None, run_id=None):
+        """
+        (criticality, parameter tuple) of every scenario of a batch,
+        or of the whole history when batch_info is None.
+        Rows recorded before telemetry existed score 1.0 for a collision, else 0.0.
+        """
+        query = ("SELECT COALESCE(criticality, result_type = 'collision'),"
+                 " ego_start_lane, ego_start_s, npc_start_lane, npc_start_s,"
+                 " ego_dest_lane, ego_dest_s, npc_dest_lane, npc_dest_s"
+                 " FROM results WHERE result_type != 'parse_error'")
+        args = []
+        if batch_info is not None:
+            query += " AND run_id = ? AND batch_info = ?"
+            args = [run_id or self.run_id, batch_info]
+        return [(float(row[0]), tuple(row[1:])) for row in self._conn().execute(query, args)]
+
+    def export_csv(self, csv_path, batch_info=None, run_id=None):
+        """
+        Write rows in the legacy simulation_results.csv layout.
+        """
+        query = f"SELECT {', '.join(CSV_COLUMNS)} FROM results"
+        args = []
+        if batch_info is not None:
+            query += " WHERE run_id = ? AND batch_info = ?"
+            args = [run_id or self.run_id, batch_info]
+        query += " ORDER BY id"
+
+        p = Path(csv_path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with p.open("w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for row in self._conn().execute(query, args):
+                row = list(row)
+                row[1] = None if row[1] is None else bool(row[1])
+                writer.writerow(row)
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _str(value):
+    return None if value is None else str(value)
+
+
+if __name__ == "__main__":
+    import sys
+    # usage: python3 results_store.py <results.sqlite> <out.csv>
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH
+    out_csv = sys.argv[2] if len(sys.argv) > 2 else "simulation_results_export.csv"
+    ResultsStore(db_path).export_csv(out_csv)
+    print(f"[✓] Exported {db_path} to {out_csv}")
@@ -6,9 +6,12 @@ python3 scenario_generator.py
 echo "🚗 Running initial scenarios..."
 python3 -c "
 from batch_run_scenarios import batch_run
+from results_store import ResultsStore
+# recorded in the results store too (batch 'simulation'), where the GA looks up its seeds
 batch_run(
     scenario_dir='/autoware_map/generated_scenarios',
-    results_csv='/ros2_ws/simulation_results/simulation_results.csv'
+    results_csv='/ros2_ws/simulation_results/simulation_results.csv',
+    store=ResultsStore()
 )
 "
 
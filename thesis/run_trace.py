@@ -0,0 +1,288 @@
+import os
+import json
+import math
+import time
+import socket
+import threading
+from contextlib import contextmanager
+from paths import ws_path
+
+# Structured run traces: one JSON line per scenario (per-phase durations, exit
+# code, host/worker, result type), per batch-level phase (copy, generate,
+# evaluate) and per generation (p50/p95, scenarios/hour, idle worker time).
+# Optionally mirrored into a Prometheus text file for a local scraper
+# (node_exporter's textfile collector reads *.prom files).
+TRACE_PATH = ws_path("simulation_results", "run_trace.jsonl")
+METRICS_PATH = ws_path("simulation_results", "metrics.prom")
+
+# First simulator line that counts as "simulation running" (boot ends there)
+SIM_START_PATTERNS = ("[openscenario_interpreter", "[kinematic_sim]")
+HOST = socket.gethostname()
+
+_tracer = None
+
+
+class PhaseClock:
+    """
+    Timestamps of one scenario run. Also a line handler (never stops the run):
+    the first SIM_START_PATTERNS line marks the end of the launch boot.
+    """
+
+    def __init__(self, patterns=SIM_START_PATTERNS):
+        self.patterns = patterns
+        self.marks = {"spawn": time.monotonic()}
+
+    def __call__(self, line):
+        if "sim_start" not in self.marks and any(p in line for p in self.patterns):
+            self.mark("sim_start")
+        return False
+
+    def mark(self, name, at=None):
+        self.marks.setdefault(name, at if at is not None else time.monotonic())
+
+    def phases(self):
+        """
+        {phase: seconds}: boot (spawn -> simulation start), simulation (-> outcome
+        decided, or exit), teardown (stopping the launch after an early stop or
+        timeout), parse (junit) and record (CSV/store/cache).
+        """
+        marks = self.marks
+        exited = marks.get("exit", time.monotonic())
+        decided = marks.get("decided", exited)
+        sim_start = min(marks.get("sim_start", decided), decided)
+        phases = {
+            "boot": sim_start - marks["spawn"],
+            "simulation": decided - sim_start,
+            "teardown": exited - decided
+        }
+        if "parsed" in marks:
+            phases["parse"] = marks["parsed"] - exited
+        if "recorded" in marks:
+            phases["record"] = marks["recorded"] - marks.get("parsed", exited)
+        return {name: round(max(0.0, seconds), 4) for name, seconds in phases.items()}
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile (q in 0..100) of a non-empty list.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+class Tracer:
+    """
+    Appends trace records to a JSONL file and aggregates them per generation.
+    Thread-safe: worker threads and the asyncio loop may record concurrently.
+    """
+
+    def __init__(self, path=TRACE_PATH, metrics_path=None, workers=1):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.metrics_path = metrics_path
+        self.workers = workers
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+        self._scenarios = []
+        self._phases = []
+        self._generation = None
+        self._started = time.monotonic()
+        self._result_counts = {}
+        self._phase_totals = {}
+        self._idle_total = 0.0
+        self._last_summary = None
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def scenario(self, scenario_path, result, phases, batch=None, worker=None, source="simulator"):
+        record = {
+            "kind": "scenario",
+            "ts": round(time.time(), 3),
+            "host": HOST,
+            "worker": worker,
+            "batch": batch,
+            "scenario": os.path.basename(scenario_path),
+            "source": source,
+            "exit_code": result.get("exit_code"),
+            "result_type": result.get("result_type"),
+            "early_stopped": result.get("early_stopped"),
+            "phases": phases,
+            "duration": round(sum(phases.values()), 4)
+        }
+        self._write(record)
+        with self._lock:
+            self._scenarios.append(record)
+            self._result_counts[record["result_type"]] = self._result_counts.get(record["result_type"], 0) + 1
+            for name, seconds in phases.items():
+                total, count = self._phase_totals.get(name, (0.0, 0))
+                self._phase_totals[name] = (total + seconds, count + 1)
+        return record
+
+    @contextmanager
+    def phase(self, name, **fields):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            record = dict(kind="phase", ts=round(time.time(), 3), host=HOST, phase=name,
+                          duration=round(time.monotonic() - started, 4), **fields)
+            self._write(record)
+            with self._lock:
+                self._phases.append(record)
+
+    def start_generation(self, generation):
+        with self._lock:
+            self._generation = generation
+            self._started = time.monotonic()
+            self._scenarios, self._phases = [], []
+
+    def end_generation(self, generation=None):
+        """
+        Write (and return) the summary of everything traced since start_generation.
+        """
+        with self._lock:
+            scenarios, phases = self._scenarios, self._phases
+            self._scenarios, self._phases = [], []
+            wall = time.monotonic() - self._started
+        simulated = [r for r in scenarios if r["source"] != "cache"]
+        # worker time is only available during evaluation; breeding is not idle time
+        evaluating = sum(r["duration"] for r in phases if r["phase"] == "evaluate") or wall
+        busy = sum(r["duration"] for r in simulated)
+        summary = {
+            "kind": "generation",
+            "ts": round(time.time(), 3),
+            "host": HOST,
+            "generation": generation if generation is not None else self._generation,
+            "scenarios": len(scenarios),
+            "simulated": len(simulated),
+            "wall_seconds": round(wall, 3),
+            "scenarios_per_hour": round(len(scenarios) / wall * 3600, 1) if wall > 0 else None,
+            "idle_worker_seconds": round(max(0.0, self.workers * evaluating - busy), 3),
+            "results": {},
+            "phases": {}
+        }
+        for r in scenarios:
+            summary["results"][r["result_type"]] = summary["results"].get(r["result_type"], 0) + 1
+        durations = {"total": [r["duration"] for r in simulated]}
+        for r in simulated:
+            for name, seconds in r["phases"].items():
+                durations.setdefault(name, []).append(seconds)
+        for r in phases:
+            durations.setdefault(r["phase"], []).append(r["duration"])
+        for name, values in durations.items():
+            if values:
+                summary["phases"][name] = {
+                    "p50": round(percentile(values, 50), 4),
+                    "p95": round(percentile(values, 95), 4),
+                    "sum": round(sum(values), 4),
+                    "count": len(values)
+                }
+        self._write(summary)
+        with self._lock:
+            self._idle_total += summary["idle_worker_seconds"]
+            self._last_summary = summary
+        total = summary["phases"].get("total")
+        print(f"⏱️ Generation {summary['generation']}: {summary['scenarios']} scenarios in {wall:.0f}s "
+              f"({summary['scenarios_per_hour'] or 0:.0f}/h), "
+              + (f"p50 {total['p50']:.1f}s p95 {total['p95']:.1f}s, " if total else "")
+              + f"idle worker time {summary['idle_worker_seconds']:.0f}s")
+        if self.metrics_path:
+            self.write_metrics()
+        return summary
+
+    def write_metrics(self):
+        """
+        Prometheus text exposition of the counters so far and the last generation's quantiles.
+        """
+        with self._lock:
+            counts = dict(self._result_counts)
+            totals = dict(self._phase_totals)
+            idle = self._idle_total
+            summary = self._last_summary
+        lines = [
+            "# HELP thesis_scenarios_total Scenarios traced, by result type.",
+            "# TYPE thesis_scenarios_total counter"
+        ]
+        lines += [f'thesis_scenarios_total{{result_type="{k}"}} {v}' for k, v in sorted(counts.items())]
+        lines += [
+            "# HELP thesis_phase_seconds Per-scenario phase durations (quantiles of the last generation).",
+            "# TYPE thesis_phase_seconds summary"
+        ]
+        for name, (total, count) in sorted(totals.items()):
+            quantiles = (summary or {}).get("phases", {}).get(name)
+            if quantiles:
+                lines.append(f'thesis_phase_seconds{{phase="{name}",quantile="0.5"}} {quantiles["p50"]}')
+                lines.append(f'thesis_phase_seconds{{phase="{name}",quantile="0.95"}} {quantiles["p95"]}')
+            lines.append(f'thesis_phase_seconds_sum{{phase="{name}"}} {round(total, 4)}')
+            lines.append(f'thesis_phase_seconds_count{{phase="{name}"}} {count}')
+        lines += [
+            "# HELP thesis_worker_idle_seconds_total Simulator slot time spent without a scenario.",
+            "# TYPE thesis_worker_idle_seconds_total counter",
+            f"thesis_worker_idle_seconds_total {round(idle, 3)}"
+        ]
+        if summary is not None:
+            lines += [
+                "# HELP thesis_scenarios_per_hour Throughput of the last generation.",
+                "# TYPE thesis_scenarios_per_hour gauge",
+                f"thesis_scenarios_per_hour {summary['scenarios_per_hour'] or 0}",
+                "# HELP thesis_generation Last finished generation.",
+                "# TYPE thesis_generation gauge",
+                f"thesis_generation {summary['generation'] if isinstance(summary['generation'], int) else 0}"
+            ]
+        # scrapers must never see a half-written file
+        tmp_path = f"{self.metrics_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.metrics_path)
+
+    def close(self):
+        self._file.close()
+
+
+def start_tracing(path=TRACE_PATH, metrics_path=None, workers=1):
+    """
+    Make a Tracer the process-wide one that trace_scenario/trace_phase record to.
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(path, metrics_path, workers)
+    return _tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+def trace_scenario(scenario_path, result, phases, batch=None, worker=None, source="simulator"):
+    # no-op unless start_tracing was called
+    if _tracer is not None:
+        _tracer.scenario(scenario_path, result, phases, batch, worker, source)
+
+
+def trace_phase(name, **fields):
+    """
+    Context manager timing a batch-level phase (copy, generate, evaluate, ...).
+    """
+    if _tracer is None:
+        return _null_phase()
+    return _tracer.phase(name, **fields)
+
+
+@contextmanager
+def _null_phase():
+    yield
+
+
+def start_generation(generation):
+    if _tracer is not None:
+        _tracer.start_generation(generation)
+
+
+def end_generation(generation=None):
+    if _tracer is not None:
+        return _tracer.end_generation(generation)
+    return None
@@ -1,56 +1,170 @@
 import os
+import signal
 import subprocess
 import xml.etree.ElementTree as ET
 import csv
 import re
+import time
+import shutil
+from launch_scenario import (
+    batch_info_from_csv,
+    default_launch_command,
+    parse_result_xml_by_testcase,
+    parse_error_result,
+    record_result
+)
+from paths import map_path
+from run_trace import trace_scenario
+from junit_indexer import INDEX_DB, JunitIndexer  # results + ingestion ledger of LOG_DIR
+from results_store import ResultsStore
+from sim_orchestrator import KILL_GRACE
 
-WORKFLOW_PATH = "/autoware_map/generated_scenarios/workflow.yaml"
-LOG_DIR = "/autoware_map/workflow_logs"
+WORKFLOW_PATH = map_path("generated_scenarios", "workflow.yaml")
+LOG_DIR = map_path("workflow_logs")
 CSV_OUTPUT = "simulation_results.csv"
 
-def run_workflow():
+def write_workflow(scenario_paths, workflow_path=WORKFLOW_PATH):
+    """
+    Write a scenario_test_runner workflow listing every scenario of a batch/shard.
+    """
+    os.makedirs(os.path.dirname(workflow_path) or ".", exist_ok=True)
+    with open(workflow_path, "w") as f:
+        f.write("Scenario:\n")
+        for path in scenario_paths:
+            f.write(f"  - path: {os.path.abspath(path)}\n")
+    return workflow_path
+
+def stop_process_group(proc, grace=KILL_GRACE):
+    """
+    Blocking counterpart of sim_orchestrator.kill_process_group: SIGINT, SIGTERM,
+    then SIGKILL to the launch's process group.
+    """
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            proc.wait(grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+def run_workflow(workflow_path=WORKFLOW_PATH, log_dir=LOG_DIR, launch_command=None, log_path=None, env=None,
+                 timeout=None):
+    """
+    Run a workflow in one launch. With a timeout (wall-clock seconds for the whole
+    workflow), a hung launch is killed; its unfinished scenarios get no junit.
+    There is no early stop: the launch moves on to the next scenario by itself.
+    """
     print("🚀 Running workflow batch...")
-    command = [
-        "ros2", "launch", "scenario_test_runner", "scenario_test_runner.launch.py",
-        f"workflow:={WORKFLOW_PATH}",
-        f"log_directory:={LOG_DIR}"
+    command = list(launch_command or default_launch_command()) + [
+        f"workflow:={workflow_path}",
+        f"log_directory:={log_dir}",
+        f"output_directory:={log_dir}",
+        f"record:=false",
+        f"sensor_model:=sample_sensor_kit",
+        f"vehicle_model:=sample_vehicle",
+        f"launch_rviz:=false"
     ]
+    logfile = open(log_path, "w") if log_path else None
     try:
-        subprocess.run(command, check=True)
+        # own process group, so a timeout can stop every node of the launch
+        proc = subprocess.Popen(command, stdout=logfile, stderr=subprocess.STDOUT if logfile else None, env=env,
+                                start_new_session=True)
+        try:
+            returncode = proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            print(f"⏱️ Workflow exceeded {timeout}s, killing launch")
+            stop_process_group(proc)
+            return
+        except BaseException:
+            stop_process_group(proc)
+            raise
+    finally:
+        if logfile is not None:
+            logfile.close()
+    if returncode == 0:
         print("✅ Batch execution finished.")
-    except subprocess.CalledProcessError as e:
+    else:
         print("❌ Workflow execution failed.")
-        print(e)
-
-def parse_results_and_write_csv():
-    rows = []
-    for root_dir, _, files in os.walk(LOG_DIR):
-        for file in files:
-            if file == "result.junit.xml":
-                full_path = os.path.join(root_dir, file)
-                result = parse_result_xml(full_path)
-                scenario_yaml = extract_scenario_path_from_log_dir(root_dir)
-                rows.append([
-                    scenario_yaml,
-                    result.get("collision"),
-                    result.get("collided_with"),
-                    result.get("message"),
-                    result.get("result_type")
-                ])
-
-    if rows:
-        with open(CSV_OUTPUT, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["scenario_yaml", "collision", "collided_with", "failure_message", "result_type"])
-            writer.writerows(rows)
-        print(f"[✓] Parsed {len(rows)} results to {CSV_OUTPUT}")
+        print(subprocess.CalledProcessError(returncode, command))
+
+def collect_workflow_results(log_dir, scenario_paths):
+    """
+    Map every junit result under log_dir back to the exact scenario that produced it.
+    Scenarios are matched by file stem, either as the junit testcase name or as the
+    name of the per-scenario output folder. Scenarios without a result get a parse_error.
+    """
+    by_stem = {os.path.splitext(os.path.basename(p))[0]: p for p in scenario_paths}
+    results = {}
+    for root_dir, _, files in os.walk(log_dir):
+        if "result.junit.xml" not in files:
+            continue
+        folder_stem = os.path.basename(root_dir)
+        for name, result in parse_result_xml_by_testcase(os.path.join(root_dir, "result.junit.xml")).items():
+            stem = os.path.splitext(os.path.basename(name))[0]
+            if stem not in by_stem:
+                stem = folder_stem
+            if stem in by_stem:
+                results[by_stem[stem]] = result
+
+    for path in scenario_paths:
+        if path not in results:
+            results[path] = parse_error_result("No result found in workflow logs")
+    return results
+
+def run_scenarios_as_workflow(scenario_paths, work_dir, results_csv, launch_command=None, env=None, cache=None,
+                              store=None, timeout=None):
+    """
+    Run a batch/shard of scenarios in a single launch and record each result
+    against its own scenario file (and therefore its exact parameter tuple).
+    timeout is per scenario: the launch gets timeout * len(scenario_paths) seconds.
+    """
+    log_dir = os.path.join(work_dir, "workflow_logs")
+    if os.path.exists(log_dir):
+        shutil.rmtree(log_dir)
+    os.makedirs(log_dir)
+
+    workflow_path = write_workflow(scenario_paths, os.path.join(work_dir, "workflow.yaml"))
+    started = time.monotonic()
+    run_workflow(workflow_path, log_dir, launch_command=launch_command,
+                 log_path=os.path.join(work_dir, "simulation_log.txt"), env=env,
+                 timeout=timeout * len(scenario_paths) if timeout else None)
+    launched = time.monotonic()
+
+    results = collect_workflow_results(log_dir, scenario_paths)
+    parsed = time.monotonic()
+    # one launch runs the whole shard, so scenarios get an even share of it
+    share = {
+        "workflow": round((launched - started) / max(1, len(scenario_paths)), 4),
+        "parse": round((parsed - launched) / max(1, len(scenario_paths)), 4)
+    }
+    for path in scenario_paths:
+        recording = time.monotonic()
+        record_result(path, results[path], results_csv, cache=cache, store=store)
+        trace_scenario(path, results[path], dict(share, record=round(time.monotonic() - recording, 4)),
+                       batch=batch_info_from_csv(results_csv), worker=os.path.basename(work_dir),
+                       source="workflow")
+    return [results[path] for path in scenario_paths]
+
+def parse_results_and_write_csv(store=None):
+    """
+    Ingest the junit files under LOG_DIR that are new since the last call
+    (junit_indexer keeps the ledger) and export everything ingested to CSV_OUTPUT.
+    """
+    store = store or ResultsStore(INDEX_DB)
+    added = JunitIndexer(LOG_DIR, store).index(settle=0.0)
+    if added:
+        store.export_csv(CSV_OUTPUT)
+        print(f"[✓] Ingested {added} new results, exported to {CSV_OUTPUT}")
     else:
-        print("⚠️ No results found to parse.")
+        print("⚠️ No new results to parse.")
 
 def extract_scenario_path_from_log_dir(log_subdir):
     # Infer scenario name from log folder name (if named accordingly)
     base_name = os.path.basename(log_subdir)
-    return f"/autoware_map/generated_scenarios/{base_name}.yaml"
+    return map_path("generated_scenarios", f"{base_name}.yaml")
 
 def parse_result_xml(xml_path):
     try:
@@ -1,35 +1,14 @@
-from ruamel.yaml import YAML
-from datetime import datetime
 import random
 import os
+import itertools
+from compiled_template import compile_template, scenario_header
+from scenario_manifest import ManifestWriter
+from paths import map_path
+from space_filling_sampler import iter_space_filling
+from scenario_utils import START_LANE_IDS, DEST_LANE_IDS, EGO_LENGTH, NPC_LENGTH, positions_overlap
 
-yaml = YAML()
-yaml.preserve_quotes = True
-yaml.indent(mapping=2, sequence=4, offset=2)
-
-# === Lane Definitions (s value bounds per laneId) ===
-START_LANE_IDS = {
-    "34408": (0, 24.0),
-    "34600": (0, 52.5),
-    "34576": (0, 27.0),
-    "34981": (0, 8.4),   # Short lane!
-    "34976": (0, 36.0)
-}
-
-DEST_LANE_IDS = {
-    "34630": (0, 27.0),
-    "34579": (0, 52.5),
-    "34564": (0, 24.5),
-    "34621": (0, 49.5)
-}
-
-EGO_LENGTH = 4.77
-NPC_LENGTH = 4.0
-
-def positions_overlap(s1, l1, s2, l2, buffer=1.0):
-    rear1, front1 = s1, s1 + l1
-    rear2, front2 = s2, s2 + l2
-    return not (front1 + buffer < rear2 or front2 + buffer < rear1)
+MAX_FILTER_TRIES = 50  # draws per scenario before a filter (lanelet index) is given up on
+SPACE_FILLING = True   # initial sweep: stratified lane pairs with Sobol positions (see space_filling_sampler)
 
 def sample_non_overlapping_positions():
     """
@@ -65,52 +44,40 @@ def sample_non_overlapping_positions():
     return ego_lane, ego_s, npc_lane, npc_s
 
 
-def generate_scenario(template_path, output_dir, scenario_index):
-    with open(template_path, 'r') as f:
-        data = yaml.load(f)
-
-    now_iso = datetime.utcnow().isoformat(timespec="milliseconds") + 'Z'
-    header = data["OpenSCENARIO"]["FileHeader"]
-    header["date"] = now_iso
-    header["description"] = f"Mined scenario for AV safety validation - scenario {scenario_index}"
-    header["author"] = 'Markus Puudersell'
-
+def sample_params():
     ego_start_lane, ego_start_s, npc_start_lane, npc_start_s = sample_non_overlapping_positions()
     ego_dest_lane = random.choice(list(DEST_LANE_IDS.keys()))
     ego_dest_s = round(random.uniform(*DEST_LANE_IDS[ego_dest_lane]), 2)
     npc_dest_lane = random.choice(list(DEST_LANE_IDS.keys()))
     npc_dest_s = round(random.uniform(*DEST_LANE_IDS[npc_dest_lane]), 2)
+    return (ego_start_lane, ego_start_s, npc_start_lane, npc_start_s,
+            ego_dest_lane, ego_dest_s, npc_dest_lane, npc_dest_s)
 
-    try:
-        for private_action in data["OpenSCENARIO"]["Storyboard"]["Init"]["Actions"]["Private"]:
-            entity = private_action.get("entityRef", "")
-            actions = private_action.get("PrivateAction", [])
-
-            if entity == "ego":
-                teleport_pos = actions[0]["TeleportAction"]["Position"]["LanePosition"]
-                teleport_pos["laneId"] = ego_start_lane
-                teleport_pos["s"] = ego_start_s
-
-                routing_pos = actions[1]["RoutingAction"]["AcquirePositionAction"]["Position"]["LanePosition"]
-                routing_pos["laneId"] = ego_dest_lane
-                routing_pos["s"] = ego_dest_s
-
-            elif entity == "Npc1":
-                teleport_pos = actions[0]["TeleportAction"]["Position"]["LanePosition"]
-                teleport_pos["laneId"] = npc_start_lane
-                teleport_pos["s"] = npc_start_s
-
-                routing_pos = actions[1]["RoutingAction"]["AcquirePositionAction"]["Position"]["LanePosition"]
-                routing_pos["laneId"] = npc_dest_lane
-                routing_pos["s"] = npc_dest_s
-
-    except Exception as e:
-        print(f"[ERROR] modifying scenario: {e}")
+def generate_scenario(template_path, output_dir, scenario_index, manifest=None, accept=None):
+    """
+    Write one random scenario. With accept (e.g. LaneletIndex.accept), tuples
+    it rejects are redrawn, up to MAX_FILTER_TRIES times.
+    """
+    params = sample_params()
+    for _ in range(MAX_FILTER_TRIES):
+        if accept is None or accept(params):
+            break
+        params = sample_params()
+    (ego_start_lane, ego_start_s, npc_start_lane, npc_start_s,
+     ego_dest_lane, ego_dest_s, npc_dest_lane, npc_dest_s) = params
 
+    # template is parsed once per process; only the header and lane slots are filled in
+    template = compile_template(template_path, with_header=True)
     os.makedirs(output_dir, exist_ok=True)
     output_path = os.path.join(output_dir, f"scenario_{scenario_index}.yaml")
-    with open(output_path, 'w') as f:
-        yaml.dump(data, f)
+    template.write(output_path, params, scenario_header(scenario_index))
+
+    file_name = os.path.basename(output_path)
+    if manifest is not None:
+        manifest.add(file_name, params)
+    else:
+        with ManifestWriter(output_dir, append=True) as single:
+            single.add(file_name, params)
 
     print(f"[✓] scenario_{scenario_index}.yaml generated:")
     print(f"    Ego     → start laneId: {ego_start_lane}, s: {ego_start_s}")
@@ -118,11 +85,28 @@ def generate_scenario(template_path, output_dir, scenario_index):
     print(f"    NPC1    → start laneId: {npc_start_lane}, s: {npc_start_s}")
     print(f"              dest  laneId: {npc_dest_lane}, s: {npc_dest_s}")
 
-def generate_batch(template_path, output_dir, count=5):
-    for i in range(count):
-        generate_scenario(template_path, output_dir, i)
+def generate_batch(template_path, output_dir, count=5, accept=None):
+    with ManifestWriter(output_dir) as manifest:
+        for i in range(count):
+            generate_scenario(template_path, output_dir, i, manifest=manifest, accept=accept)
+
+def generate_space_filling_batch(template_path, output_dir, count=5, accept=None, method="sobol", seed=None):
+    """
+    Write `count` space-filling scenarios with bulk emission (streamed, one summary line).
+    """
+    stream = itertools.islice(iter_space_filling(method=method, accept=accept, seed=seed), count)
+    written = compile_template(template_path, with_header=True).write_batch(output_dir, stream)
+    print(f"[✓] {written} space-filling scenarios ({method}) generated in {output_dir}")
+    return written
 
 if __name__ == "__main__":
-    template_path = "/autoware_map/template.yaml"
-    output_dir = "/autoware_map/generated_scenarios"
-    generate_batch(template_path, output_dir, count=100)
+    from lanelet_index import load_index
+    template_path = map_path("template.yaml")
+    output_dir = map_path("generated_scenarios")
+    # skip lane combinations whose routes never meet, when the map is available
+    index = load_index()
+    accept = index.accept if index is not None else None
+    if SPACE_FILLING:
+        generate_space_filling_batch(template_path, output_dir, count=100, accept=accept)
+    else:
+        generate_batch(template_path, output_dir, count=100, accept=accept)
@@ -0,0 +1,150 @@
+import math
+from scenario_utils import START_LANE_IDS, DEST_LANE_IDS, EGO_LENGTH, NPC_LENGTH, round_scenario_hash
+
+# Packed scenario key: four (lane index, s in decimetres) positions in GA tuple order,
+# 15 bits each: 3 bits of lane index, 12 bits of decimetres (s up to 409.5 m).
+# 60 bits in total, so keys also fit a signed int64 (population_engine.row_keys).
+LANE_BITS = 3
+DM_BITS = 12
+POSITION_BITS = LANE_BITS + DM_BITS
+MAX_DM = (1 << DM_BITS) - 1
+
+START_LANES = list(START_LANE_IDS)
+DEST_LANES = list(DEST_LANE_IDS)
+_START_INDEX = {lane: i for i, lane in enumerate(START_LANES)}
+_DEST_INDEX = {lane: i for i, lane in enumerate(DEST_LANES)}
+
+
+def decimetres(s):
+    # same equivalence as round_scenario_hash: values that round to the same 0.1 m
+    return int(round(round(float(s), 1) * 10))
+
+
+def scenario_key(params):
+    """
+    Integer key of a parameter tuple, equal whenever round_scenario_hash is
+    (it also treats -0.0 and 0.0 alike). Tuples off the grid (unknown lane IDs,
+    s out of range) fall back to the SHA-256 string, so keys of both kinds can share one set.
+    """
+    ego_lane, ego_s, npc_lane, npc_s, ego_dest, ego_dest_s, npc_dest, npc_dest_s = params
+    lanes = (
+        _START_INDEX.get(str(ego_lane)), _START_INDEX.get(str(npc_lane)),
+        _DEST_INDEX.get(str(ego_dest)), _DEST_INDEX.get(str(npc_dest))
+    )
+    key = 0
+    for lane, s in zip(lanes, (ego_s, npc_s, ego_dest_s, npc_dest_s)):
+        dm = int(round(round(float(s), 1) * 10))
+        if lane is None or not 0 <= dm <= MAX_DM:
+            return round_scenario_hash(params)
+        key = (key << POSITION_BITS) | (lane << DM_BITS) | dm
+    return key
+
+
+def key_to_params(key):
+    """
+    Inverse of scenario_key for integer keys.
+    """
+    params = []
+    for i, lanes in enumerate((START_LANES, START_LANES, DEST_LANES, DEST_LANES)):
+        field = (key >> (POSITION_BITS * (3 - i))) & ((1 << POSITION_BITS) - 1)
+        params += [lanes[field >> DM_BITS], (field & MAX_DM) / 10]
+    return tuple(params)
+
+
+class CoverageMap:
+    """
+    Bitmap over the discretized start subspace (ego lane, ego s, NPC lane, NPC s)
+    at 0.1 m: one bit per start configuration, one bitmap per lane pair
+    (about 35 KB for the largest pair). Gives O(1) "tried before" checks and
+    explored fractions per lane pair.
+    """
+
+    def __init__(self):
+        self._cells = {}
+        self._bits = {}
+        for ego_lane in START_LANES:
+            for npc_lane in START_LANES:
+                self._cells[(ego_lane, npc_lane)] = (
+                    decimetres(START_LANE_IDS[ego_lane][1]) + 1,
+                    decimetres(START_LANE_IDS[npc_lane][1]) + 1
+                )
+        for pair, (rows, cols) in self._cells.items():
+            self._bits[pair] = bytearray((rows * cols + 7) // 8)
+
+    def _index(self, params):
+        pair = (str(params[0]), str(params[2]))
+        cells = self._cells.get(pair)
+        if cells is None:
+            return None, None
+        ego_dm, npc_dm = decimetres(params[1]), decimetres(params[3])
+        if not (0 <= ego_dm < cells[0] and 0 <= npc_dm < cells[1]):
+            return None, None
+        return pair, ego_dm * cells[1] + npc_dm
+
+    def add(self, params):
+        """
+        Mark the start configuration of a tuple. Returns True if it was new.
+        """
+        pair, bit = self._index(params)
+        if pair is None:
+            return False
+        bits = self._bits[pair]
+        mask = 1 << (bit & 7)
+        if bits[bit >> 3] & mask:
+            return False
+        bits[bit >> 3] |= mask
+        return True
+
+    def __contains__(self, params):
+        pair, bit = self._index(params)
+        return pair is not None and bool(self._bits[pair][bit >> 3] & (1 << (bit & 7)))
+
+    def explored(self, pair):
+        return int.from_bytes(self._bits[pair], "little").bit_count()
+
+    def valid_cells(self, pair):
+        """
+        Start configurations of a lane pair that do not overlap (positions_overlap, buffer 1 m).
+        """
+        rows, cols = self._cells[pair]
+        if pair[0] != pair[1]:
+            return rows * cols
+        overlapping = 0
+        for ego_dm in range(rows):
+            # NPC positions within [ego - NPC_LENGTH - 1, ego + EGO_LENGTH + 1] overlap
+            low = max(0, math.ceil(ego_dm - (NPC_LENGTH + 1.0) * 10))
+            high = min(cols - 1, math.floor(ego_dm + (EGO_LENGTH + 1.0) * 10))
+            overlapping += max(0, high - low + 1)
+        return rows * cols - overlapping
+
+    def coverage(self):
+        """
+        {(ego lane, NPC lane): explored fraction} over the valid start configurations.
+        """
+        return {pair: min(1.0, self.explored(pair) / max(1, self.valid_cells(pair))) for pair in self._cells}
+
+    def summary(self, top=5):
+        explored = {pair: self.explored(pair) for pair in self._cells}
+        total = sum(explored.values())
+        touched = sum(1 for n in explored.values() if n)
+        lines = [f"🗺️ Coverage: {total} start configurations in {touched}/{len(self._cells)} lane pairs"]
+        fractions = self.coverage()
+        for pair in sorted(fractions, key=fractions.get, reverse=True)[:top]:
+            if explored[pair]:
+                lines.append(f"   {pair[0]}-{pair[1]}: {explored[pair]} ({fractions[pair]:.2%})")
+        return "\n".join(lines)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            for pair in self._cells:
+                f.write(self._bits[pair])
+
+    def load(self, path):
+        """
+        Restore bits written by save() (same lane tables); returns self.
+        """
+        with open(path, "rb") as f:
+            for pair in self._cells:
+                bits = f.read(len(self._bits[pair]))
+                self._bits[pair][:len(bits)] = bits
+        return self
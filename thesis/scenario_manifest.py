@@ -0,0 +1,79 @@
+import os
+import json
+from scenario_utils import round_scenario_hash
+
+# Sidecar written next to generated scenarios: one JSON line per file with its parameter tuple
+MANIFEST_NAME = "manifest.jsonl"
+
+PARAM_KEYS = [
+    "ego_start_lane", "ego_start_s", "npc_start_lane", "npc_start_s",
+    "ego_dest_lane", "ego_dest_s", "npc_dest_lane", "npc_dest_s"
+]
+
+_loaded = {}
+
+
+class ManifestWriter:
+    """
+    Streams manifest entries while a batch is being written.
+    Opening a writer truncates any previous manifest in the directory.
+    """
+
+    def __init__(self, output_dir, append=False):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self._file = open(self.path, "a" if append else "w")
+
+    def add(self, file_name, params):
+        self._file.write(json.dumps({
+            "file": file_name,
+            "params": list(params),
+            "hash": round_scenario_hash(params)
+        }) + "\n")
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_manifest(scenario_dir):
+    """
+    {file name: (params tuple, hash)} for a directory, re-read only when the manifest changes.
+    """
+    path = os.path.join(scenario_dir, MANIFEST_NAME)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _loaded.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    entries = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # later lines win when a file was regenerated
+            entries[entry["file"]] = (tuple(entry["params"]), entry["hash"])
+    _loaded[path] = (stamp, entries)
+    return entries
+
+
+def lookup_scenario_parameters(scenario_path):
+    """
+    Parameter dict for a generated scenario (same keys as extract_scenario_parameters),
+    or None when the scenario has no manifest entry.
+    """
+    entry = load_manifest(os.path.dirname(os.path.abspath(scenario_path))).get(os.path.basename(scenario_path))
+    if entry is None:
+        return None
+    return dict(zip(PARAM_KEYS, entry[0]))
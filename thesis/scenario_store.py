@@ -0,0 +1,178 @@
+import os
+import sys
+import uuid
+import shutil
+import hashlib
+from compiled_template import compile_template
+from scenario_manifest import ManifestWriter
+from paths import map_path, ws_path
+
+# Content-addressed scenario files: every distinct scenario (template + parameter
+# tuple, rendered) is written once, to objects/<hh>/<sha256>.yaml, and never
+# modified. Batch workdirs and the mined corpus are views: hard links to the
+# objects, so an object's st_nlink - 1 is its reference count and objects with
+# no views left are garbage. Links only work within one filesystem, so each
+# mount gets its own store; a view that cannot be linked is copied instead.
+GENERATED_STORE = map_path("scenario_store")   # next to generated_scenarios
+MINED_STORE = ws_path("scenario_store")        # next to mined_scenarios
+SCENARIO_EXT = ".yaml"
+
+
+class ScenarioStore:
+    """
+    Objects under root/objects, views anywhere on the same filesystem.
+    Views are replaced (unlink + link), never written through, so objects stay immutable.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self.objects = os.path.join(self.root, "objects")
+        os.makedirs(self.objects, exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], f"{digest}{SCENARIO_EXT}")
+
+    def _put(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o444)  # catches accidental writes through a view
+            os.replace(tmp_path, path)  # concurrent writers of the same object both succeed
+        return digest
+
+    def put_text(self, text):
+        """
+        Store rendered scenario text; returns its digest (no write if it is already stored).
+        """
+        return self._put(text.encode())
+
+    def put_file(self, path):
+        with open(path, "rb") as f:
+            return self._put(f.read())
+
+    def link(self, digest, dest):
+        """
+        Make dest a view of an object, replacing whatever dest was.
+        Falls back to a copy across filesystems (or where hard links are not allowed).
+        """
+        # already a view of it (rename between two links of one inode would be a no-op)
+        if os.path.exists(dest) and os.path.samefile(dest, self.object_path(digest)):
+            return dest
+        tmp_path = f"{dest}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(self.object_path(digest), tmp_path)
+        except OSError:
+            shutil.copyfile(self.object_path(digest), tmp_path)
+        os.replace(tmp_path, dest)
+        return dest
+
+    def stage(self, template_path, output_dir, batch_params):
+        """
+        Drop-in for generate_batch_from_params: scenario_{i}.yaml views of the rendered
+        tuples plus the directory manifest. Scenarios stored before are not rewritten.
+        Returns the digests in batch order.
+        """
+        template = compile_template(template_path)
+        os.makedirs(output_dir, exist_ok=True)
+        digests = []
+        with ManifestWriter(output_dir) as manifest:
+            for i, params in enumerate(batch_params):
+                file_name = f"scenario_{i}{SCENARIO_EXT}"
+                digest = self.put_text(template.render(params))
+                self.link(digest, os.path.join(output_dir, file_name))
+                manifest.add(file_name, params)
+                digests.append(digest)
+        return digests
+
+    def link_view(self, src_dir, dst_dir):
+        """
+        Replace dst_dir with a view of src_dir: scenario files are linked, everything
+        else (the manifest) is copied, since it may be rewritten in place.
+        """
+        if os.path.exists(dst_dir):
+            shutil.rmtree(dst_dir)
+        os.makedirs(dst_dir)
+        for entry in os.scandir(src_dir):
+            if not entry.is_file():
+                continue
+            dest = os.path.join(dst_dir, entry.name)
+            if entry.name.endswith(SCENARIO_EXT):
+                try:
+                    os.link(entry.path, dest)
+                    continue
+                except OSError:
+                    pass
+            shutil.copyfile(entry.path, dest)
+
+    def mine(self, scenario_path, mined_dir, prefix="collision"):
+        """
+        Add a scenario to a mined-corpus folder as <prefix>_<digest>.yaml.
+        Named by content, so two mined scenarios never overwrite each other
+        and the same scenario mined twice is kept once.
+        """
+        os.makedirs(mined_dir, exist_ok=True)
+        digest = self.put_file(scenario_path)
+        return self.link(digest, os.path.join(str(mined_dir), f"{prefix}_{digest[:16]}{SCENARIO_EXT}"))
+
+    def refcount(self, digest):
+        return os.stat(self.object_path(digest)).st_nlink - 1
+
+    def _objects(self):
+        for shard in os.scandir(self.objects):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(SCENARIO_EXT):
+                        yield entry
+
+    def gc(self, dry_run=False):
+        """
+        Delete objects no view links to any more. Returns (objects removed, bytes freed).
+        Views that had to be copied hold no reference; their objects are collected too.
+        """
+        removed = freed = 0
+        for entry in self._objects():
+            st = entry.stat()
+            if st.st_nlink == 1:
+                if not dry_run:
+                    os.remove(entry.path)
+                removed += 1
+                freed += st.st_size
+        return removed, freed
+
+    def stats(self):
+        objects = size = unreferenced = views = 0
+        for entry in self._objects():
+            st = entry.stat()
+            objects += 1
+            size += st.st_size
+            views += st.st_nlink - 1
+            unreferenced += st.st_nlink == 1
+        return {"objects": objects, "bytes": size, "views": views, "unreferenced": unreferenced}
+
+
+_stores = {}
+
+
+def get_store(root):
+    """
+    One ScenarioStore per root per process.
+    """
+    root = str(root)
+    if root not in _stores:
+        _stores[root] = ScenarioStore(root)
+    return _stores[root]
+
+
+if __name__ == "__main__":
+    # usage: python3 scenario_store.py stats|gc [store root]
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    store = ScenarioStore(sys.argv[2] if len(sys.argv) > 2 else GENERATED_STORE)
+    if command == "gc":
+        removed, freed = store.gc()
+        print(f"🧹 Removed {removed} unreferenced scenarios ({freed / 1e6:.1f} MB) from {store.root}")
+    else:
+        print(store.stats())
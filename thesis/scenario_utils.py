@@ -1,7 +1,6 @@
 import os
 import random
 import shutil
-from ruamel.yaml import YAML
 import hashlib
 import csv
 from pathlib import Path
@@ -25,52 +24,19 @@ DEST_LANE_IDS = {
 EGO_LENGTH = 4.77
 NPC_LENGTH = 4.0
 
-yaml = YAML()
-yaml.preserve_quotes = True
-yaml.indent(mapping=2, sequence=4, offset=2)
-
 def positions_overlap(s1, l1, s2, l2, buffer=1.0):
     rear1, front1 = s1, s1 + l1
     rear2, front2 = s2, s2 + l2
     return not (front1 + buffer < rear2 or front2 + buffer < rear1)
 
 def generate_batch_from_params(template_path, output_dir, batch_params):
-    os.makedirs(output_dir, exist_ok=True)
-    for i, params in enumerate(batch_params):
-        with open(template_path, 'r') as f:
-            data = yaml.load(f)
-
-        ego_lane, ego_s, npc_lane, npc_s, ego_dest_lane, ego_dest_s, npc_dest_lane, npc_dest_s = params
-
-        try:
-            for private_action in data["OpenSCENARIO"]["Storyboard"]["Init"]["Actions"]["Private"]:
-                entity = private_action.get("entityRef", "")
-                actions = private_action.get("PrivateAction", [])
-
-                if entity == "ego":
-                    teleport_pos = actions[0]["TeleportAction"]["Position"]["LanePosition"]
-                    teleport_pos["laneId"] = ego_lane
-                    teleport_pos["s"] = ego_s
-
-                    routing_pos = actions[1]["RoutingAction"]["AcquirePositionAction"]["Position"]["LanePosition"]
-                    routing_pos["laneId"] = ego_dest_lane
-                    routing_pos["s"] = ego_dest_s
-
-                elif entity == "Npc1":
-                    teleport_pos = actions[0]["TeleportAction"]["Position"]["LanePosition"]
-                    teleport_pos["laneId"] = npc_lane
-                    teleport_pos["s"] = npc_s
-
-                    routing_pos = actions[1]["RoutingAction"]["AcquirePositionAction"]["Position"]["LanePosition"]
-                    routing_pos["laneId"] = npc_dest_lane
-                    routing_pos["s"] = npc_dest_s
-
-        except Exception as e:
-            print(f"[ERROR] generating scenario: {e}")
-
-        out_path = os.path.join(output_dir, f"scenario_{i}.yaml")
-        with open(out_path, 'w') as f:
-            yaml.dump(data, f)
+    """
+    Write scenario_{i}.yaml for every parameter tuple.
+    The template is parsed once (see compiled_template) and only the
+    ego/Npc1 LanePosition slots are filled in per scenario.
+    """
+    from compiled_template import compile_template
+    compile_template(template_path).write_batch(output_dir, batch_params)
 
 def crossover_batches(parent_batch_a, parent_batch_b, crossover_rate=0.5):
     child_batch = []
@@ -88,18 +54,24 @@ def mutate_batch(params, seen: set,
                  mutation_rate: float = 0.30,       # mutate 30% of scenarios
                  max_delta: float = 10.0,           # ±10 m shifts
                  min_delta: float = 1.0,            # at least 2 m change
-                 lane_mutation_rate: float = 0.20   # 20% chance to swap lanes
+                 lane_mutation_rate: float = 0.20,  # 20% chance to swap lanes
+                 key_fn=None,                       # identity of a tuple in `seen`
+                 accept=None                        # optional filter, e.g. LaneletIndex.accept
                  ) -> list: 
     """
     Mutate each scenario parameter with a given probability, ensuring any float mutation
     differs by at least min_delta, optionally mutate lane IDs, clamp to valid lane ranges,
     and prevent Ego/NPC overlap on the same lane. Also enforce within-batch uniqueness.
+    `seen` holds key_fn(tuple) values: round_scenario_hash by default,
+    scenario_keys.scenario_key for compact integer keys.
+    Tuples rejected by accept(tuple) are mutated like seen ones.
     """
+    key_fn = key_fn or round_scenario_hash
     new_params = []
     for param_tuple in params:
-        h0 = round_scenario_hash(param_tuple)
-        # Force mutation if already seen, or randomly based on mutation_rate
-        if h0 in seen or random.random() < mutation_rate:
+        h0 = key_fn(param_tuple)
+        # Force mutation if already seen or rejected, or randomly based on mutation_rate
+        if h0 in seen or (accept is not None and not accept(param_tuple)) or random.random() < mutation_rate:
             attempts = 0
             while True:
                 mutated = []
@@ -140,7 +112,7 @@ def mutate_batch(params, seen: set,
                             mutated.append(val)
 
                 mutated_tuple = tuple(mutated)
-                h = round_scenario_hash(mutated_tuple)
+                h = key_fn(mutated_tuple)
                 attempts += 1
 
                 # Step 2: Check for global uniqueness
@@ -162,6 +134,14 @@ def mutate_batch(params, seen: set,
                     else:
                         continue
 
+                # Step 4: Reject combinations the filter rules out (e.g. routes that never meet)
+                if accept is not None and not accept(mutated_tuple):
+                    if attempts > 10:
+                        new_params.append(param_tuple)
+                        break
+                    else:
+                        continue
+
                 # If we reach here, it's a valid new mutation
                 seen.add(h)
                 new_params.append(mutated_tuple)
@@ -175,7 +155,7 @@ def mutate_batch(params, seen: set,
     unique = []
     local_hashes = set()
     for p in new_params:
-        h = round_scenario_hash(p)
+        h = key_fn(p)
         if h not in local_hashes:
             unique.append(p)
             local_hashes.add(h)
@@ -183,7 +163,7 @@ def mutate_batch(params, seen: set,
     idx = 0
     while len(unique) < len(params):
         candidate = params[idx % len(params)]
-        h = round_scenario_hash(candidate)
+        h = key_fn(candidate)
         if h not in local_hashes:
             unique.append(candidate)
             local_hashes.add(h)
@@ -210,4 +190,29 @@ def read_collision_rate(csv_path):
                     collisions += 1
     except FileNotFoundError:
         return 0.0
-    return collisions / total if total > 0 else 0.0
\ No newline at end of file
+    return collisions / total if total > 0 else 0.0
+
+def read_scenario_scores(csv_path):
+    """
+    (criticality, parameter tuple) for every scenario in a results CSV.
+    CSVs without the criticality column score 1.0 for a collision, else 0.0.
+    """
+    scores = []
+    try:
+        with open(csv_path, newline="") as file:
+            for row in csv.DictReader(file):
+                result_type = row.get("result_type", "").lower()
+                if result_type == "parse_error":
+                    continue
+                criticality = row.get("criticality") or ""
+                score = float(criticality) if criticality else float(result_type == "collision")
+                params = (
+                    row["ego_start_lane"], float(row["ego_start_s"]),
+                    row["npc_start_lane"], float(row["npc_start_s"]),
+                    row["ego_dest_lane"], float(row["ego_dest_s"]),
+                    row["npc_dest_lane"], float(row["npc_dest_s"])
+                )
+                scores.append((score, params))
+    except FileNotFoundError:
+        pass
+    return scores
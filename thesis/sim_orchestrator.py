@@ -0,0 +1,300 @@
+import os
+import re
+import time
+import signal
+import asyncio
+from launch_scenario import (
+    batch_info_from_csv,
+    build_launch_command,
+    make_result,
+    parse_result_xml,
+    parse_error_result,
+    record_result,
+    telemetry_command
+)
+from criticality import METRIC_KEYS, TelemetryTracker
+from run_trace import PhaseClock, trace_scenario
+from paths import map_path
+
+DEFAULT_TIMEOUT = 900      # wall-clock seconds per scenario, boot included
+KILL_GRACE = 10            # seconds between SIGINT / SIGTERM / SIGKILL
+BASE_DOMAIN_ID = 10
+
+STREAM_LIMIT = 1 << 20     # bytes a line may take before it is read in pieces (ROS parameter dumps are long)
+JUNIT_WAIT = 5             # seconds an early stop waits for the interpreter's junit
+
+# The interpreter's own failure report. ros2 launch prefixes every line with the
+# process name, and the node logs as simulation.openscenario_interpreter:
+#   [openscenario_interpreter_node-1] [ERROR] [1700000000.1] [simulation.openscenario_interpreter]: ...
+# Lines of any other node (Autoware planning logs "standstill" all the time) never match.
+INTERPRETER_FAILURE_RE = re.compile(
+    r"^\[openscenario_interpreter_node(?:-\d+)?\] \[ERROR\] \[[\d.]+\] \[simulation\.openscenario_interpreter\]: (.*)$"
+)
+# Failure messages that settle the outcome: the template's only exitFailure
+# condition is the CollisionCondition (its end-of-time condition is an exitSuccess)
+DECISIVE_PATTERNS = [
+    "colliding with another given entity",
+]
+
+
+class OutcomeWatchdog:
+    """
+    Watches live simulator output and asks for the run to be stopped as soon
+    as the interpreter reports a decisive failure, instead of waiting for the
+    launch to exit. The outcome itself is still read from the junit; only a
+    collision whose junit never appeared is built from the matched line.
+    """
+
+    def __init__(self, patterns=DECISIVE_PATTERNS):
+        self.patterns = patterns
+        self.message = None
+
+    def __call__(self, line):
+        if self.message is not None:
+            return False
+        match = INTERPRETER_FAILURE_RE.match(line.rstrip())
+        if match is not None and any(p in match.group(1) for p in self.patterns):
+            self.message = match.group(1).strip()
+            return True
+        return False
+
+
+async def wait_for_file(path, timeout=JUNIT_WAIT, interval=0.1):
+    """
+    Wait until path exists (at most timeout seconds). Returns whether it does.
+    """
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
+
+
+def make_slot(output_dir, log_path=None, domain_id=None):
+    """
+    A simulator slot: where one scenario at a time writes its junit and log.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    return {
+        "output_dir": output_dir,
+        "log_path": log_path or os.path.join(output_dir, "simulation_log.txt"),
+        "domain_id": domain_id
+    }
+
+
+def make_slots(workers, worker_base):
+    """
+    Per-worker isolation: own output directory, log file and ROS domain ID.
+    """
+    return [
+        make_slot(os.path.join(worker_base, f"worker_{slot}"), domain_id=BASE_DOMAIN_ID + slot)
+        for slot in range(workers)
+    ]
+
+
+async def kill_process_group(proc, grace=KILL_GRACE):
+    """
+    Stop a launch and every ROS node it spawned (they share its process group).
+    """
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGKILL):
+        if proc.returncode is not None:
+            return
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(proc.wait(), grace)
+        except asyncio.TimeoutError:
+            continue
+
+
+async def read_lines(stream):
+    """
+    Lines of a subprocess stream, like `async for` over it, except that a line
+    longer than the reader's limit comes out in limit-sized pieces instead of
+    raising (which would abort the run and, in run_many, every other one).
+    """
+    while True:
+        try:
+            raw = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                yield e.partial
+            return
+        except asyncio.LimitOverrunError as e:
+            raw = await stream.read(max(1, e.consumed))
+        yield raw
+
+
+async def _stream_output(proc, logfile, state, line_handlers=()):
+    """
+    Copy simulator output to the log while it runs, picking up the
+    `derived :` line and feeding every line to line_handlers on the fly.
+    A handler returning True stops the run, once the junit (state["junit_path"]) is
+    written or JUNIT_WAIT has passed. Returns once the process has exited.
+    """
+    async for raw in read_lines(proc.stdout):
+        line = raw.decode(errors="replace")
+        logfile.write(line)
+        if state["xosc_path"] is None and "derived :" in line:
+            state["xosc_path"] = line.strip().split("derived :")[1].strip()
+        if any([handler(line) for handler in line_handlers]):
+            state["stopped"] = True
+            state["decided_at"] = time.monotonic()
+            logfile.flush()
+            if state.get("junit_path"):
+                await wait_for_file(state["junit_path"])
+            await kill_process_group(proc)
+            return
+    await proc.wait()
+
+
+async def _stream_telemetry(proc, logfile, telemetry):
+    """
+    Copy a telemetry sidecar's lines to the log and the telemetry tracker until it exits.
+    """
+    async for raw in read_lines(proc.stdout):
+        line = raw.decode(errors="replace")
+        logfile.write(line)
+        telemetry(line)
+    await proc.wait()
+
+
+async def run_scenario(scenario_path, slot, csv_path, launch_command=None, timeout=DEFAULT_TIMEOUT,
+                       cache=None, store=None, on_line=None, early_stop=False, record=True):
+    """
+    Launch one scenario as an async subprocess on `slot`, record and return its result
+    (record=False leaves recording to the caller, e.g. a remote coordinator).
+    With early_stop, the launch is stopped as soon as the outcome is decided (see OutcomeWatchdog).
+    Telemetry lines seen on the way are folded into the result (see criticality.TelemetryTracker),
+    per-phase durations go to the run trace (see run_trace) and result["phases"].
+    """
+    result_xml_path = os.path.join(slot["output_dir"], "scenario_test_runner", "result.junit.xml")
+    if os.path.exists(result_xml_path):
+        os.remove(result_xml_path)
+
+    env = None
+    if slot.get("domain_id") is not None:
+        env = dict(os.environ, ROS_DOMAIN_ID=str(slot["domain_id"]))
+
+    command = build_launch_command(scenario_path, slot["output_dir"], launch_command)
+    state = {"xosc_path": None, "stopped": False, "timed_out": False, "junit_path": result_xml_path}
+    watchdog = OutcomeWatchdog() if early_stop else None
+    telemetry = TelemetryTracker()
+    clock = PhaseClock()
+    line_handlers = [h for h in (on_line, clock, telemetry, watchdog) if h is not None]
+
+    monitor_command = telemetry_command(launch_command)
+    monitor = None
+    if monitor_command:
+        monitor = await asyncio.create_subprocess_exec(
+            *monitor_command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=env,
+            start_new_session=True,
+            limit=STREAM_LIMIT
+        )
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=env,
+        start_new_session=True,  # own process group, so the whole launch tree can be killed
+        limit=STREAM_LIMIT
+    )
+    try:
+        with open(slot["log_path"], "w") as logfile:
+            monitor_task = monitor and asyncio.create_task(_stream_telemetry(monitor, logfile, telemetry))
+            try:
+                await asyncio.wait_for(_stream_output(proc, logfile, state, line_handlers), timeout)
+            except asyncio.TimeoutError:
+                state["timed_out"] = True
+                state["decided_at"] = time.monotonic()
+                print(f"⏱️ {os.path.basename(scenario_path)} exceeded {timeout}s, killing launch")
+                await kill_process_group(proc)
+            finally:
+                if monitor is not None:
+                    # SIGINT first: the monitor prints its last minima on the way out
+                    await kill_process_group(monitor)
+                    await monitor_task
+    except asyncio.CancelledError:
+        await kill_process_group(proc)
+        raise
+    if "decided_at" in state:
+        clock.mark("decided", state["decided_at"])
+    clock.mark("exit")
+
+    if state["timed_out"]:
+        result = parse_error_result(f"Wall-clock timeout after {timeout}s")
+    else:
+        result = parse_result_xml(result_xml_path)
+        if watchdog is not None and watchdog.message is not None:
+            print(f"🛑 {os.path.basename(scenario_path)} stopped early: {watchdog.message}")
+            if result["result_type"] == "parse_error":
+                # no (complete) junit: the interpreter's collision line carries the junit's failure message
+                result = make_result(True, watchdog.message)
+                if result["result_type"] != "collision":
+                    result = parse_error_result(f"Stopped early without a junit after: {watchdog.message}")
+    result.update(telemetry.metrics(result))
+    result["exit_code"] = proc.returncode
+    result["early_stopped"] = state["stopped"]
+    clock.mark("parsed")
+
+    if record:
+        await asyncio.to_thread(record_result, scenario_path, strip_run_info(result), csv_path,
+                                cache=cache, store=store)
+        clock.mark("recorded")
+    result["phases"] = clock.phases()
+    trace_scenario(scenario_path, result, result["phases"], batch=csv_path and batch_info_from_csv(csv_path),
+                   worker=os.path.basename(slot["output_dir"]))
+    return result
+
+
+def strip_run_info(result):
+    """
+    Result fields that are persisted (drops exit_code and other run-only extras).
+    """
+    keys = ("collision", "message", "collided_with", "result_type") + METRIC_KEYS
+    return {k: result[k] for k in keys if k in result}
+
+
+async def run_many(scenarios, concurrency, csv_path, slots=None, worker_base=map_path("workers"),
+                   launch_command=None, timeout=DEFAULT_TIMEOUT, cache=None, store=None, early_stop=False):
+    """
+    Run scenarios with at most `concurrency` simulators in flight.
+    Each running scenario holds one slot; results are returned in input order.
+    """
+    if slots is None:
+        slots = make_slots(concurrency, worker_base)
+    free_slots = asyncio.Queue()
+    for slot in slots[:max(1, concurrency)]:
+        free_slots.put_nowait(slot)
+
+    async def run_on_free_slot(i, scenario_path):
+        slot = await free_slots.get()
+        try:
+            print(f"[{i+1}/{len(scenarios)}] ▶ Running {os.path.basename(scenario_path)} on {slot['output_dir']}")
+            return await run_scenario(scenario_path, slot, csv_path, launch_command, timeout, cache, store,
+                                      early_stop=early_stop)
+        finally:
+            free_slots.put_nowait(slot)
+
+    tasks = [asyncio.create_task(run_on_free_slot(i, path)) for i, path in enumerate(scenarios)]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        # one failure or a Ctrl-C cancels the rest, which kills their launches
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def run_many_sync(scenarios, concurrency, csv_path, **kwargs):
+    """
+    Blocking wrapper around run_many for non-async callers (batch_run, scripts).
+    """
+    return asyncio.run(run_many(scenarios, concurrency, csv_path, **kwargs))
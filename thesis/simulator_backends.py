@@ -0,0 +1,65 @@
+import os
+import sys
+import abc
+
+KINEMATIC_SIM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kinematic_sim.py")
+
+
+class SimulatorBackend(abc.ABC):
+    """
+    How a scenario is simulated: the launch command that build_launch_command and
+    run_workflow extend with scenario_test_runner's key:=value arguments
+    (scenario, workflow, output_directory, ...). The backend must write
+    result.junit.xml the way scenario_test_runner does.
+    """
+    name = None
+
+    @abc.abstractmethod
+    def launch_command(self):
+        """
+        The launch command as an argument list, without scenario arguments.
+        """
+
+
+class RosLaunchBackend(SimulatorBackend):
+    """
+    Autoware + scenario_simulator_v2 through ros2 launch.
+    """
+    name = "ros"
+
+    def __init__(self, command=None):
+        self.command = command
+
+    def launch_command(self):
+        import launch_scenario
+        return list(self.command or launch_scenario.ROS_LAUNCH_COMMAND)
+
+
+class KinematicBackend(SimulatorBackend):
+    """
+    kinematic_sim.py: constant-speed vehicles on an abstract intersection, no ROS.
+    Milliseconds per scenario, for CI, benchmarks and orchestration load tests.
+    """
+    name = "kinematic"
+
+    def __init__(self, ego_speed=None, npc_speed=None, realtime=None):
+        self.options = {"ego_speed": ego_speed, "npc_speed": npc_speed, "realtime": realtime}
+
+    def launch_command(self):
+        return [sys.executable, KINEMATIC_SIM] + [
+            f"{key}:={value}" for key, value in self.options.items() if value is not None
+        ]
+
+
+BACKENDS = {backend.name: backend for backend in (RosLaunchBackend, KinematicBackend)}
+
+
+def get_backend(name=None, **options):
+    """
+    Backend by name; defaults to the SIM_BACKEND environment variable, then "ros".
+    """
+    name = name or os.environ.get("SIM_BACKEND", "ros")
+    try:
+        return BACKENDS[name](**options)
+    except KeyError:
+        raise ValueError(f"Unknown simulator backend {name!r} (choose from {', '.join(BACKENDS)})") from None
@@ -0,0 +1,70 @@
+import random
+
+# Sobol low-discrepancy sequence in pure Python (Gray-code construction with
+# the Joe-Kuo direction numbers), for space-filling samples of the scenario
+# parameters. Any prefix of 2^k points is evenly stratified in every dimension.
+BITS = 32
+SCALE = 1.0 / (1 << BITS)
+
+# (degree s, coefficients a, initial direction numbers m) of dimensions 2..10
+DIRECTIONS = (
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+)
+MAX_DIMENSIONS = len(DIRECTIONS) + 1
+
+
+def _direction_numbers(dimension):
+    if dimension == 0:
+        return [1 << (BITS - 1 - i) for i in range(BITS)]
+    s, a, m = DIRECTIONS[dimension - 1]
+    v = [m[i] << (BITS - 1 - i) for i in range(s)]
+    for i in range(s, BITS):
+        value = v[i - s] ^ (v[i - s] >> s)
+        for k in range(1, s):
+            if (a >> (s - 1 - k)) & 1:
+                value ^= v[i - k]
+        v.append(value)
+    return v
+
+
+class SobolSequence:
+    """
+    Points of the unit cube [0, 1)^dimensions, one list per next() call.
+    With scramble, every dimension gets a random digital shift (seeded), so
+    repeated campaigns draw different but equally well-spread points; the
+    unscrambled sequence starts at the origin.
+    """
+
+    def __init__(self, dimensions, scramble=True, seed=None):
+        if not 1 <= dimensions <= MAX_DIMENSIONS:
+            raise ValueError(f"SobolSequence supports 1..{MAX_DIMENSIONS} dimensions, got {dimensions}")
+        self.dimensions = dimensions
+        self._v = [_direction_numbers(d) for d in range(dimensions)]
+        rng = random.Random(seed)
+        self._x = [rng.getrandbits(BITS) if scramble else 0 for _ in range(dimensions)]
+        self.index = 0
+
+    def next(self):
+        point = [x * SCALE for x in self._x]
+        # Gray code order: the next point differs by the direction number of the lowest zero bit
+        c = ((~self.index) & (self.index + 1)).bit_length() - 1
+        if c >= BITS:
+            raise OverflowError("Sobol sequence exhausted (2^32 points)")
+        self._x = [x ^ v[c] for x, v in zip(self._x, self._v)]
+        self.index += 1
+        return point
+
+    def __iter__(self):
+        while True:
+            yield self.next()
+
+    def take(self, n):
+        return [self.next() for _ in range(n)]
@@ -0,0 +1,164 @@
+import sys
+import random
+import itertools
+from scenario_utils import START_LANE_IDS, DEST_LANE_IDS, EGO_LENGTH, NPC_LENGTH, positions_overlap
+from sobol import SobolSequence
+
+# Space-filling initial campaigns: instead of independent uniform draws, the
+# sampler cycles through the ego/NPC start lane pairs (each destination lane
+# combination in turn per pair) and spreads the four s positions of every pair
+# with its own scrambled Sobol sequence or Latin hypercube blocks. Any prefix is
+# balanced over lane pairs, and the sampler is a lazy generator: millions of
+# candidates can be streamed into CompiledTemplate.write_batch in constant memory.
+START_WINDOW = 8.0     # m: start positions lie in the last START_WINDOW m of the lane (as in scenario_generator)
+SAME_LANE = False      # allow ego and NPC to start on the same lane (scenario_generator never does)
+OVERLAP_BUFFER = 1.0   # m, as positions_overlap
+LHS_BLOCK = 16         # "lhs": points per Latin hypercube block of a lane pair
+MAX_REJECTS = 1000     # consecutive filter rejections before the sampler gives up
+
+
+def _window(lane, window):
+    low, high = START_LANE_IDS[lane]
+    return (max(high - window, low), high) if window is not None else (low, high)
+
+
+def _same_lane_position(u, ego_s, low, high):
+    """
+    NPC position on the ego's lane from u in [0, 1), mapped onto the part of
+    [low, high] that does not overlap the ego, so no draw is ever rejected.
+    None if the lane is too short for both vehicles.
+    """
+    margin = 0.01  # keeps rounded positions off the overlap boundary
+    behind = (low, ego_s - NPC_LENGTH - OVERLAP_BUFFER - margin)
+    ahead = (ego_s + EGO_LENGTH + OVERLAP_BUFFER + margin, high)
+    lengths = [max(0.0, b - a) for a, b in (behind, ahead)]
+    total = sum(lengths)
+    if total <= 0:
+        return None
+    x = u * total
+    return behind[0] + x if x < lengths[0] else ahead[0] + (x - lengths[0])
+
+
+class _LatinHypercube:
+    """
+    Latin hypercube points in blocks of `block`: every block is stratified in every dimension.
+    """
+
+    def __init__(self, dimensions, block=LHS_BLOCK, rng=random):
+        self.dimensions = dimensions
+        self.block = block
+        self.rng = rng
+        self._points = iter(())
+
+    def _new_block(self):
+        columns = []
+        for _ in range(self.dimensions):
+            strata = list(range(self.block))
+            self.rng.shuffle(strata)
+            columns.append([(k + self.rng.random()) / self.block for k in strata])
+        return iter(zip(*columns))
+
+    def next(self):
+        point = next(self._points, None)
+        if point is None:
+            self._points = self._new_block()
+            point = next(self._points)
+        return list(point)
+
+
+def iter_space_filling(method="sobol", window=START_WINDOW, same_lane=SAME_LANE, accept=None, seed=None):
+    """
+    Endless stream of parameter tuples (GA order). Start lane pairs take turns;
+    each pair steps through its destination lane combinations in a shuffled
+    order and through its own point sequence for (ego s, NPC s, ego dest s, NPC dest s).
+    Tuples rejected by accept (e.g. LaneletIndex.accept) are skipped.
+    """
+    if method not in ("sobol", "lhs"):
+        raise ValueError(f"Unknown sampling method {method!r} (expected sobol or lhs)")
+    rng = random.Random(seed)
+    start_lanes = list(START_LANE_IDS)
+    dest_lanes = list(DEST_LANE_IDS)
+    pairs = [(ego, npc) for ego in start_lanes for npc in start_lanes if same_lane or ego != npc]
+    # a lane too short for both vehicles cannot hold a same-lane pair
+    pairs = [(ego, npc) for ego, npc in pairs
+             if ego != npc or START_LANE_IDS[ego][1] - START_LANE_IDS[ego][0] > EGO_LENGTH + NPC_LENGTH + 2 * OVERLAP_BUFFER]
+    rng.shuffle(pairs)
+
+    strata = []
+    for pair in pairs:
+        dest_combinations = list(itertools.product(dest_lanes, dest_lanes))
+        rng.shuffle(dest_combinations)
+        if method == "sobol":
+            points = SobolSequence(4, seed=rng.getrandbits(32))
+        else:
+            points = _LatinHypercube(4, rng=rng)
+        strata.append((pair, itertools.cycle(dest_combinations), points))
+
+    rejects = 0
+    for (ego_lane, npc_lane), dest_combinations, points in itertools.cycle(strata):
+        ego_dest, npc_dest = next(dest_combinations)
+        u_ego, u_npc, u_ego_dest, u_npc_dest = points.next()
+
+        ego_low, ego_high = _window(ego_lane, window)
+        ego_s = round(ego_low + u_ego * (ego_high - ego_low), 2)
+        if ego_lane == npc_lane:
+            # the NPC may start anywhere on the lane that leaves room for the ego
+            npc_s = _same_lane_position(u_npc, ego_s, *START_LANE_IDS[npc_lane])
+            if npc_s is None:
+                continue
+            npc_s = round(npc_s, 2)
+            if positions_overlap(ego_s, EGO_LENGTH, npc_s, NPC_LENGTH, OVERLAP_BUFFER):
+                continue
+        else:
+            npc_low, npc_high = _window(npc_lane, window)
+            npc_s = round(npc_low + u_npc * (npc_high - npc_low), 2)
+        ego_dest_low, ego_dest_high = DEST_LANE_IDS[ego_dest]
+        npc_dest_low, npc_dest_high = DEST_LANE_IDS[npc_dest]
+        params = (ego_lane, ego_s, npc_lane, npc_s,
+                  ego_dest, round(ego_dest_low + u_ego_dest * (ego_dest_high - ego_dest_low), 2),
+                  npc_dest, round(npc_dest_low + u_npc_dest * (npc_dest_high - npc_dest_low), 2))
+
+        if accept is not None and not accept(params):
+            rejects += 1
+            if rejects >= MAX_REJECTS:
+                print(f"⚠️ Space-filling sampler: {MAX_REJECTS} candidates in a row rejected, stopping")
+                return
+            continue
+        rejects = 0
+        yield params
+
+
+def sample_space_filling(count, **options):
+    """
+    The first `count` tuples of iter_space_filling, as a list.
+    """
+    return list(itertools.islice(iter_space_filling(**options), count))
+
+
+def coverage_gaps(params_list, cells=4):
+    """
+    (empty cells, total cells) of the start subspace: every start lane pair's
+    window split into cells x cells squares of (ego s, NPC s).
+    A quick check of how evenly a sweep covers the lane x position space.
+    """
+    filled = set()
+    for params in params_list:
+        ego_lane, ego_s, npc_lane, npc_s = params[:4]
+        ego_low, ego_high = _window(str(ego_lane), START_WINDOW)
+        npc_low, npc_high = _window(str(npc_lane), START_WINDOW)
+        ego_cell = min(cells - 1, int((float(ego_s) - ego_low) / ((ego_high - ego_low) or 1.0) * cells))
+        npc_cell = min(cells - 1, int((float(npc_s) - npc_low) / ((npc_high - npc_low) or 1.0) * cells))
+        filled.add((str(ego_lane), str(npc_lane), ego_cell, npc_cell))
+    pairs = sum(1 for ego in START_LANE_IDS for npc in START_LANE_IDS if ego != npc)
+    total = pairs * cells * cells
+    return total - len(filled), total
+
+
+if __name__ == "__main__":
+    # usage: python3 space_filling_sampler.py [count]: compare coverage with independent draws
+    from scenario_generator import sample_params
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    for name, sample in (("space-filling", sample_space_filling(count)),
+                         ("uniform", [sample_params() for _ in range(count)])):
+        empty, total = coverage_gaps(sample)
+        print(f"{name:>13}: {count} scenarios leave {empty}/{total} start cells empty")
@@ -0,0 +1,159 @@
+import asyncio
+from collections import deque
+from batch_run_scenarios import list_scenarios, WORKER_OUTPUT_BASE
+from launch_scenario import serve_from_cache
+from lanelet_index import load_index
+from novelty_index import NoveltyIndex
+from run_trace import end_generation, start_tracing
+from result_cache import ResultCache, config_fingerprint
+from results_store import ResultsStore
+from simulator_backends import get_backend
+from scenario_keys import scenario_key
+from scenario_utils import read_collision_rate
+from sim_orchestrator import make_slots, run_scenario
+import genetic_optimizer as ga
+
+class SteadyStateGA:
+    """
+    Steady-state evolution. Batches stay the unit of fitness, but simulator slots
+    take scenarios one at a time from a shared queue: whenever a slot frees up and
+    the queue is empty, the next batch is bred from the best batches finished so
+    far, so no slot waits for a batch (or a generation) to finish.
+    """
+
+    def __init__(self, seed_params, budget, workers=ga.WORKERS, cache=None, store=None, launch_command=None,
+                 accept=None, novelty=None):
+        self.seed_params = seed_params
+        self.budget = budget     # batches to evaluate
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.store = store
+        self.launch_command = launch_command
+        self.novelty = novelty   # NoveltyIndex kept up to date with every started batch
+        self.accept = accept
+        self.seen_hashes = set()
+        self.archive = []        # (fitness, batch_info, params) of finished batches
+        self.started = 0
+        self.queue = deque()     # (batch, scenario_path) not yet handed to a slot
+        self._breeding = asyncio.Lock()
+
+    def next_candidate(self):
+        """
+        Parameters for the next batch: seed samples until POP_SIZE batches exist,
+        then children of the two fittest finished batches.
+        """
+        if self.started < ga.POP_SIZE or len(self.archive) < 2:
+            batch_params = ga.sample_seed_batch(self.seed_params)
+        else:
+            ranked = sorted(self.archive, key=lambda entry: entry[0], reverse=True)
+            batch_params = ga.breed_child(ranked[0][2], ranked[1][2], self.seen_hashes, self.accept)
+        for params in batch_params:
+            self.seen_hashes.add(scenario_key(params))
+        if self.novelty is not None:
+            self.novelty.update(batch_params)
+        return batch_params
+
+    async def start_batch(self):
+        """
+        Breed the next batch, record its cached scenarios and queue the others.
+        """
+        index = self.started
+        self.started += 1
+        batch_params = self.next_candidate()
+        # evolve's numbering (generation 1 holds the first POP_SIZE batches), so the
+        # CSVs, mined folders and store labels of both modes mean the same thing
+        batch_info = f"gen{index // ga.POP_SIZE + 1}_batch{index % ga.POP_SIZE}"
+        workdir = ga.GENERATED_BASE / batch_info
+        ga.write_batch(workdir, batch_params)
+        result_csv = ga.RESULTS_BASE / f"{batch_info}_results.csv"
+        result_csv.unlink(missing_ok=True)  # rows of an earlier run would be counted otherwise
+
+        batch = {"batch_info": batch_info, "params": batch_params, "csv": str(result_csv)}
+        scenarios = list_scenarios(str(workdir))
+        if self.cache is not None:
+            # cache lookups and recording do file/SQLite I/O: keep it off the event loop
+            cached = [await asyncio.to_thread(serve_from_cache, p, batch["csv"], self.cache, self.store)
+                      for p in scenarios]
+            scenarios = [p for p, result in zip(scenarios, cached) if result is None]
+        batch["remaining"] = len(scenarios)
+        if scenarios:
+            self.queue.extend((batch, p) for p in scenarios)
+        else:
+            await self.finish(batch)
+
+    async def finish(self, batch):
+        batch_info, result_csv = batch["batch_info"], batch["csv"]
+        if self.store is not None:
+            fitness = await asyncio.to_thread(self.store.collision_rate, batch_info)
+            await asyncio.to_thread(self.store.export_csv, result_csv, batch_info=batch_info)
+        else:
+            fitness = await asyncio.to_thread(read_collision_rate, result_csv)
+        self.archive.append((fitness, batch_info, batch["params"]))
+        print(f"🧬 {batch_info} finished: fitness {fitness:.2f} "
+              f"(best so far {max(entry[0] for entry in self.archive):.2f}, {len(self.archive)}/{self.budget})")
+
+    async def next_scenario(self):
+        """
+        The next queued scenario, breeding a batch when the queue is empty.
+        None once the budget is spent and nothing is left.
+        """
+        while not self.queue:
+            if self.started >= self.budget and not self._breeding.locked():
+                return None
+            async with self._breeding:
+                if not self.queue and self.started < self.budget:
+                    await self.start_batch()
+        return self.queue.popleft()
+
+    async def slot_loop(self, slot):
+        while True:
+            item = await self.next_scenario()
+            if item is None:
+                return
+            batch, scenario_path = item
+            await run_scenario(scenario_path, slot, batch["csv"], self.launch_command,
+                               cache=self.cache, store=self.store, early_stop=ga.EARLY_STOP)
+            batch["remaining"] -= 1
+            if batch["remaining"] == 0:
+                await self.finish(batch)
+
+    async def run(self):
+        slots = make_slots(self.workers, WORKER_OUTPUT_BASE)
+        await asyncio.gather(*(self.slot_loop(slot) for slot in slots))
+        return sorted(self.archive, key=lambda entry: entry[0], reverse=True)
+
+
+def evolve_steady_state(budget=ga.POP_SIZE * ga.GENERATIONS):
+    """
+    Steady-state counterpart of genetic_optimizer.evolve with the same evaluation budget.
+    """
+    launch_command = get_backend(ga.SIMULATOR_BACKEND).launch_command()
+    cache = ResultCache(ga.RESULT_CACHE_PATH, config_fingerprint(ga.TEMPLATE, launch_command)) if ga.USE_RESULT_CACHE else None
+    store = ResultsStore(ga.RESULTS_DB_PATH) if ga.USE_RESULTS_STORE else None
+
+    seed_params = ga.load_seed_params(store)
+    if not seed_params:
+        print("❌ No collision scenarios found. Please run initial simulation first.")
+        return None
+
+    lane_index = load_index() if ga.USE_LANE_INDEX else None
+    accept = lane_index.accept if lane_index is not None else None
+    novelty = None
+    if ga.NOVELTY_MODE:
+        # children are bred one batch at a time here, without a screening pool: "penalize" acts like "reject"
+        novelty = NoveltyIndex().update(params for _, params in ga.load_history_scores(store))
+        accept = ga.all_of(accept, novelty.accept)
+    if ga.TRACE:
+        start_tracing(str(ga.TRACE_PATH), str(ga.METRICS_PATH) if ga.PROMETHEUS_METRICS else None,
+                      workers=ga.WORKERS)
+    ranked = asyncio.run(SteadyStateGA(seed_params, budget, cache=cache, store=store,
+                                       launch_command=launch_command, accept=accept, novelty=novelty).run())
+    end_generation("steady_state")  # no generations here: one summary for the whole run
+    if novelty is not None:
+        print(novelty.summary())
+    print(f"\n✅ Steady-state optimization complete. Best batch: {ranked[0][1]} ({ranked[0][0]:.2f})")
+    return ranked
+
+
+if __name__ == "__main__":
+    evolve_steady_state()
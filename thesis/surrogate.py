@@ -0,0 +1,174 @@
+import heapq
+import random
+from scenario_utils import START_LANE_IDS, DEST_LANE_IDS
+from scenario_keys import scenario_key
+
+try:
+    import numpy as np
+except ImportError:  # optional: buckets are then scanned in pure Python
+    np = None
+
+# A lane mismatch counts as much as being a full lane length apart
+LANE_MISMATCH = 1.0
+
+
+def _features(params):
+    """
+    Lane IDs as strings and s positions normalized by their lane's length.
+    """
+    ego_lane, ego_s, npc_lane, npc_s, ego_dest, ego_dest_s, npc_dest, npc_dest_s = params
+    lanes = (str(ego_lane), str(npc_lane), str(ego_dest), str(npc_dest))
+    lengths = (
+        START_LANE_IDS.get(lanes[0], (0, 1.0))[1], START_LANE_IDS.get(lanes[1], (0, 1.0))[1],
+        DEST_LANE_IDS.get(lanes[2], (0, 1.0))[1], DEST_LANE_IDS.get(lanes[3], (0, 1.0))[1]
+    )
+    positions = tuple(float(s) / length for s, length in zip((ego_s, npc_s, ego_dest_s, npc_dest_s), lengths))
+    return lanes, positions
+
+
+class KNNSurrogate:
+    """
+    k-nearest-neighbour regressor over past outcomes, updated incrementally.
+    Predicts (collision probability, expected criticality) for a parameter tuple.
+    Points are bucketed per lane combination: a bucket with m mismatching lanes
+    is at least m * LANE_MISMATCH away, so once k neighbours closer than that are
+    known it is skipped. Within a bucket distances are computed with NumPy when
+    it is installed.
+    """
+
+    def __init__(self, k=7):
+        self.k = k
+        self._buckets = {}   # lanes -> {scenario_key: (positions, collision, criticality)}
+        self._arrays = {}    # lanes -> (positions, collision, criticality) arrays, rebuilt after adds
+
+    def add(self, params, criticality):
+        # a re-simulated (or re-loaded) scenario replaces its earlier outcome
+        lanes, positions = _features(params)
+        self._buckets.setdefault(lanes, {})[scenario_key(params)] = \
+            (positions, float(criticality >= 1.0), float(criticality))
+        self._arrays.pop(lanes, None)
+
+    def fit(self, scored):
+        """
+        Add an iterable of (criticality, params), e.g. load_scenario_scores output.
+        """
+        for criticality, params in scored:
+            self.add(params, criticality)
+        return self
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def _nearest_in(self, lanes, positions, offset):
+        """
+        Up to k (distance, collision, criticality) of one bucket, offset added to every distance.
+        """
+        bucket = self._buckets[lanes]
+        if np is None:
+            found = [(offset + sum((a - b) ** 2 for a, b in zip(positions, point[0])), point[1], point[2])
+                     for point in bucket.values()]
+            return heapq.nsmallest(self.k, found, key=lambda x: x[0])
+        arrays = self._arrays.get(lanes)
+        if arrays is None:
+            points = list(bucket.values())
+            arrays = self._arrays[lanes] = (np.array([p[0] for p in points]), np.array([p[1] for p in points]),
+                                            np.array([p[2] for p in points]))
+        coords, collision, criticality = arrays
+        d = offset + ((coords - np.asarray(positions)) ** 2).sum(axis=1)
+        if len(d) > self.k:
+            idx = np.argpartition(d, self.k)[:self.k]
+        else:
+            idx = np.arange(len(d))
+        return [(float(d[i]), float(collision[i]), float(criticality[i])) for i in idx]
+
+    def predict(self, params):
+        if not self._buckets:
+            return 0.0, 0.0
+        lanes, positions = _features(params)
+        by_mismatch = sorted((sum(a != b for a, b in zip(lanes, other)), other) for other in self._buckets)
+        nearest = []
+        for mismatches, other in by_mismatch:
+            offset = LANE_MISMATCH * mismatches
+            if len(nearest) >= self.k and nearest[-1][0] <= offset:
+                break  # this and every later bucket is at least offset away
+            nearest = sorted(nearest + self._nearest_in(other, positions, offset), key=lambda x: x[0])[:self.k]
+        weights = [1.0 / (d + 1e-3) for d, _, _ in nearest]
+        total = sum(weights)
+        collision = sum(w * c for w, (_, c, _) in zip(weights, nearest)) / total
+        criticality = sum(w * c for w, (_, _, c) in zip(weights, nearest)) / total
+        return collision, criticality
+
+
+class ScreeningReport:
+    """
+    Keeps the prediction for every screened-in scenario and compares it with the
+    simulated outcome, separately for top-ranked and exploration picks.
+    """
+
+    def __init__(self):
+        self.predictions = {}   # scenario_key -> (predicted collision probability, "top" | "explore")
+
+    def add(self, params, predicted_collision, pick):
+        self.predictions[scenario_key(params)] = (predicted_collision, pick)
+
+    def compare(self, scored):
+        """
+        scored: (criticality, params) of simulated scenarios. Prints and returns
+        {pick: (count, predicted hit rate, actual hit rate)}.
+        """
+        groups = {}
+        for criticality, params in scored:
+            entry = self.predictions.pop(scenario_key(params), None)
+            if entry is None:
+                continue
+            predicted, pick = entry
+            count, predicted_sum, actual_sum = groups.get(pick, (0, 0.0, 0.0))
+            groups[pick] = (count + 1, predicted_sum + predicted, actual_sum + float(criticality >= 1.0))
+
+        report = {}
+        for pick, (count, predicted_sum, actual_sum) in sorted(groups.items()):
+            report[pick] = (count, predicted_sum / count, actual_sum / count)
+            print(f"🔮 Surrogate {pick:>7}: {count} scenarios, predicted hit rate "
+                  f"{predicted_sum / count:.2f}, actual {actual_sum / count:.2f}")
+        return report
+
+
+def screen_candidates(breed, surrogate, count, seen, pool_factor=10, explore=0.2, report=None,
+                      novelty=None, novelty_weight=0.5):
+    """
+    Breed a pool of about pool_factor * count unseen candidate tuples with breed(seen),
+    keep the `count` best by predicted criticality, with an `explore` share
+    drawn at random from the rest so the model keeps seeing new regions.
+    With a NoveltyIndex, novelty_weight * its novelty score is added to the ranking
+    (surrogate may then be None: candidates are ranked by novelty alone).
+    `seen` (scenario_key values) itself is not modified.
+    """
+    pool = {}
+    pool_seen = set(seen)
+    for _ in range(pool_factor):
+        for params in breed(pool_seen):
+            key = scenario_key(params)
+            if key not in seen:
+                pool.setdefault(key, params)
+        if len(pool) >= pool_factor * count:
+            break
+    candidates = list(pool.values())
+
+    scored = []
+    for params in candidates:
+        prediction = surrogate.predict(params) if surrogate is not None else (0.0, 0.0)
+        rank = prediction[1]
+        if novelty is not None:
+            rank += novelty_weight * novelty.novelty(params)
+        scored.append((rank, prediction, params))
+    scored.sort(key=lambda x: x[0], reverse=True)
+
+    n_explore = min(int(round(count * explore)), max(0, len(scored) - count))
+    picked = [(prediction, params, "top") for _, prediction, params in scored[:count - n_explore]]
+    rest = scored[count - n_explore:]
+    picked += [(prediction, params, "explore") for _, prediction, params in random.sample(rest, n_explore)]
+
+    if report is not None:
+        for prediction, params, pick in picked:
+            report.add(params, prediction[0], pick)
+    return [params for _, params, _ in picked]
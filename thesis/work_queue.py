@@ -0,0 +1,391 @@
+import os
+import json
+import time
+import uuid
+import shlex
+import socket
+import asyncio
+import hashlib
+import argparse
+from functools import lru_cache
+from compiled_template import compile_template
+from launch_scenario import (
+    batch_info_from_csv,
+    params_to_tuple,
+    parse_error_result,
+    record_result,
+    scenario_parameters
+)
+from paths import MAP_ROOT, map_path
+from run_trace import end_generation, start_tracing
+from sim_orchestrator import DEFAULT_TIMEOUT, make_slots, run_scenario, strip_run_info
+
+# Shared-directory job queue: any filesystem all hosts mount (NFS, or a local
+# directory for single-machine tests). A job moves pending/ -> leased/ -> done/;
+# each move is an atomic rename, so exactly one worker wins a job.
+# A lease file carries the worker's lease token and a heartbeat timestamp. The
+# coordinator never compares that timestamp with its own clock (hosts may be
+# skewed, NFS mtimes come from the server): a lease expires once its heartbeat
+# has not changed for LEASE_TIMEOUT seconds of the coordinator's monotonic clock.
+QUEUE_DIRS = ("pending", "leased", "done")
+HEARTBEAT = 15         # seconds between lease renewals by a worker
+LEASE_TIMEOUT = 120    # a lease not renewed for this long is re-queued
+MAX_ATTEMPTS = 3       # leases lost before a job is given up as parse_error
+POLL = 1.0
+SUMMARY_EVERY = 50     # traced worker: jobs per trace summary (one is also written whenever the queue runs dry)
+
+
+@lru_cache(maxsize=16)
+def _digest(path, mtime):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def template_digest(template_path):
+    return _digest(template_path, os.path.getmtime(template_path))
+
+
+def template_ref(template_path):
+    """
+    How workers find the template: relative to their own map root.
+    """
+    template_path = os.path.abspath(template_path)
+    if template_path.startswith(os.path.abspath(MAP_ROOT) + os.sep):
+        return os.path.relpath(template_path, MAP_ROOT)
+    return os.path.basename(template_path)
+
+
+class WorkQueue:
+    """
+    Scenario jobs in a shared directory. Coordinators publish and collect,
+    workers lease, heartbeat and complete. Leases whose heartbeat stops
+    (worker crashed, host lost) are put back in pending/ by requeue_stale.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self._heartbeats = {}   # leased job id -> (last heartbeat seen, monotonic time it was first seen)
+        for name in QUEUE_DIRS:
+            os.makedirs(os.path.join(self.root, name), exist_ok=True)
+
+    def _path(self, state, job_id):
+        return os.path.join(self.root, state, f"{job_id}.json")
+
+    def _write(self, state, job_id, data):
+        path = self._path(state, job_id)
+        tmp_path = os.path.join(self.root, state, f".{job_id}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        with open(path) as f:
+            return json.load(f)
+
+    def _stamp(self, job):
+        """
+        Rewrite the lease file in place with a fresh heartbeat, if it still holds
+        job's lease. In place, so a lease re-queued meanwhile is not recreated.
+        """
+        try:
+            with open(self._path("leased", job["job_id"]), "r+") as f:
+                if json.load(f).get("lease") != job["lease"]:
+                    return False
+                f.seek(0)
+                json.dump(dict(job, heartbeat=time.time()), f)
+                f.truncate()
+            return True
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+    def _jobs(self, state, prefix=""):
+        return sorted(n[:-len(".json")] for n in os.listdir(os.path.join(self.root, state))
+                      if n.endswith(".json") and n.startswith(prefix))
+
+    # --- coordinator side ---
+
+    def publish(self, job):
+        self._write("pending", job["job_id"], dict(job, attempts=job.get("attempts", 0)))
+
+    def collect(self, prefix=""):
+        """
+        Finished jobs (whose id starts with prefix), removed from done/ as they are read.
+        """
+        finished = []
+        for job_id in self._jobs("done", prefix):
+            path = self._path("done", job_id)
+            try:
+                finished.append(self._read(path))
+                os.remove(path)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+        return finished
+
+    def withdraw(self, prefix):
+        """
+        Remove every job whose id starts with prefix, in any state: unfinished
+        jobs of a coordinator that gave up, and late duplicates in done/.
+        """
+        for state in QUEUE_DIRS:
+            for job_id in self._jobs(state, prefix):
+                try:
+                    os.remove(self._path(state, job_id))
+                except FileNotFoundError:
+                    pass
+
+    def requeue_stale(self, lease_timeout=LEASE_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        """
+        Put jobs whose lease was not renewed in time back in pending/,
+        or finish them as parse_error after max_attempts lost leases.
+        A lease counts as renewed when its heartbeat changed since the previous
+        call, so leases are only expired by a caller that keeps calling this
+        (the coordinator's poll loop). Returns the ids of the jobs touched.
+        """
+        now = time.monotonic()
+        touched = []
+        leased = self._jobs("leased")
+        for job_id in set(self._heartbeats) - set(leased):
+            del self._heartbeats[job_id]
+        for job_id in leased:
+            path = self._path("leased", job_id)
+            try:
+                job = self._read(path)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue  # gone, or being rewritten by a heartbeat
+            beat = (job.get("lease"), job.get("heartbeat"))
+            seen = self._heartbeats.get(job_id)
+            if seen is None or seen[0] != beat:
+                self._heartbeats[job_id] = (beat, now)
+                continue
+            if now - seen[1] < lease_timeout:
+                continue
+            del self._heartbeats[job_id]
+            job["attempts"] = job.get("attempts", 0) + 1
+            if job["attempts"] >= max_attempts:
+                message = f"Lease lost {job['attempts']} times, giving up"
+                self._write("done", job_id, {"job": job, "result": parse_error_result(message), "worker": None})
+                print(f"❌ {job_id}: {message}")
+            else:
+                self._write("pending", job_id, {k: v for k, v in job.items() if k not in ("lease", "heartbeat")})
+                print(f"🔁 {job_id}: lease expired, re-queued (attempt {job['attempts'] + 1})")
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            touched.append(job_id)
+        return touched
+
+    def counts(self):
+        return {state: len(self._jobs(state)) for state in QUEUE_DIRS}
+
+    # --- worker side ---
+
+    def lease(self):
+        """
+        Claim the oldest pending job, or None when there is nothing to do.
+        """
+        for job_id in self._jobs("pending"):
+            leased = self._path("leased", job_id)
+            try:
+                os.rename(self._path("pending", job_id), leased)
+                job = dict(self._read(leased), lease=uuid.uuid4().hex)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue  # another worker (or a requeue) got there first
+            with open(leased, "w") as f:
+                json.dump(dict(job, heartbeat=time.time()), f)
+            return job
+        return None
+
+    def heartbeat(self, job):
+        """
+        Renew a lease. False when it was lost (re-queued by a coordinator).
+        """
+        return self._stamp(job)
+
+    def complete(self, job, result, worker=None):
+        """
+        Push a result back, unless the lease was lost meanwhile (the job was
+        re-queued, and the coordinator may already have its result or be gone).
+        """
+        if "lease" in job and not self._stamp(job):
+            return False
+        self._write("done", job["job_id"], {"job": job, "result": result, "worker": worker})
+        try:
+            os.remove(self._path("leased", job["job_id"]))
+        except FileNotFoundError:
+            pass
+        return True
+
+
+def run_via_queue(scenarios, results_csv, queue, template_path, cache=None, store=None,
+                  lease_timeout=LEASE_TIMEOUT, poll=POLL, deadline=None):
+    """
+    Coordinator: publish one job per scenario (parameter tuple + template reference),
+    wait for workers to finish them and record results locally like a local run would.
+    Jobs still unfinished after `deadline` seconds (default: one DEFAULT_TIMEOUT per
+    scenario, a single slot running them back to back) are withdrawn and recorded
+    as parse_error. On exit every file of this coordinator's jobs is removed.
+    """
+    if not scenarios:
+        return []
+    coordinator = f"{batch_info_from_csv(results_csv)}-{uuid.uuid4().hex[:8]}"
+    ref, digest = template_ref(template_path), template_digest(template_path)
+
+    outstanding = {}
+    for i, path in enumerate(scenarios):
+        params = scenario_parameters(path)
+        job_id = f"{coordinator}-{i:05d}"
+        queue.publish({
+            "job_id": job_id,
+            "scenario": os.path.basename(path),
+            "params": list(params_to_tuple(params)),
+            "template": ref,
+            "template_digest": digest
+        })
+        outstanding[job_id] = (path, params)
+    print(f"📤 Published {len(outstanding)} jobs to {queue.root}")
+
+    results = []
+    expires = time.monotonic() + (deadline if deadline is not None else DEFAULT_TIMEOUT * len(outstanding))
+    try:
+        while outstanding:
+            for entry in queue.collect(prefix=coordinator):
+                job_id = entry["job"]["job_id"]
+                if job_id not in outstanding:
+                    continue  # duplicate from a lease that was re-queued but still finished
+                path, params = outstanding.pop(job_id)
+                result = entry["result"]
+                print(f"📥 {os.path.basename(path)}: {result['result_type']} (worker {entry['worker']}, "
+                      f"{len(outstanding)} left)")
+                record_result(path, result, results_csv, params=params, cache=cache, store=store)
+                results.append(result)
+            if not outstanding:
+                break
+            if time.monotonic() > expires:
+                print(f"⏱️ Queue deadline passed with {len(outstanding)} jobs unfinished, withdrawing them")
+                queue.withdraw(coordinator)
+                for path, params in outstanding.values():
+                    result = parse_error_result("No worker finished the job before the queue deadline")
+                    record_result(path, result, results_csv, params=params, cache=cache, store=store)
+                    results.append(result)
+                outstanding.clear()
+                break
+            queue.requeue_stale(lease_timeout)
+            time.sleep(poll)
+    finally:
+        queue.withdraw(coordinator)
+    return results
+
+
+async def run_job(queue, job, slot, worker, launch_command=None, timeout=DEFAULT_TIMEOUT, early_stop=True):
+    """
+    Worker: materialize the job's scenario from the local template, run it on
+    `slot` while renewing the lease, and push the result back.
+    Abandons the run if the lease is lost (the job runs elsewhere then).
+    """
+    template_path = map_path(job["template"])
+    if not os.path.exists(template_path) or template_digest(template_path) != job["template_digest"]:
+        queue.complete(job, parse_error_result(f"Template {job['template']} missing or different on {worker}"),
+                       worker)
+        return None
+
+    scenario_path = os.path.join(slot["output_dir"], "jobs", f"{job['job_id']}.yaml")
+    os.makedirs(os.path.dirname(scenario_path), exist_ok=True)
+    compile_template(template_path).write(scenario_path, tuple(job["params"]))
+
+    task = asyncio.create_task(run_scenario(scenario_path, slot, None, launch_command, timeout,
+                                            early_stop=early_stop, record=False))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=HEARTBEAT)
+        if done:
+            break
+        if not queue.heartbeat(job):
+            print(f"⚠️ Lost lease on {job['job_id']}, abandoning run")
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return None
+
+    result = strip_run_info(task.result())
+    queue.complete(job, result, worker)
+    os.remove(scenario_path)
+    return result
+
+
+async def serve(queue, slots, launch_command=None, timeout=DEFAULT_TIMEOUT, early_stop=True, idle_exit=None):
+    """
+    Worker loop: every slot leases and runs jobs until the queue has been empty
+    for idle_exit seconds (forever when None). When tracing, a summary of the
+    jobs since the last one is written every SUMMARY_EVERY jobs, whenever the
+    queue runs dry and on exit (a worker has no generations to end).
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"👷 Worker {worker} serving {queue.root} with {len(slots)} slot(s)")
+    traced = {"jobs": 0, "summaries": 0}
+
+    def summarize():
+        if traced["jobs"]:
+            traced["jobs"] = 0
+            traced["summaries"] += 1
+            end_generation(f"worker-{traced['summaries']}")
+
+    async def slot_loop(slot):
+        idle_since = time.monotonic()
+        while True:
+            job = queue.lease()
+            if job is None:
+                summarize()
+                if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                    return
+                await asyncio.sleep(POLL)
+                continue
+            print(f"▶ {job['job_id']} on {slot['output_dir']}")
+            await run_job(queue, job, slot, worker, launch_command, timeout, early_stop)
+            traced["jobs"] += 1
+            if traced["jobs"] >= SUMMARY_EVERY:
+                summarize()
+            idle_since = time.monotonic()
+
+    try:
+        await asyncio.gather(*(slot_loop(slot) for slot in slots))
+    finally:
+        summarize()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-directory scenario work queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    worker = sub.add_parser("worker", help="run jobs from the queue on this host")
+    worker.add_argument("--queue", required=True)
+    worker.add_argument("--slots", type=int, default=1, help="parallel simulators on this host")
+    worker.add_argument("--launch-command", help="override the ros2 launch command (e.g. a stub)")
+    worker.add_argument("--idle-exit", type=float, help="exit after the queue was empty this many seconds")
+    worker.add_argument("--trace", help="append per-scenario phase timings to this JSONL file")
+    worker.add_argument("--metrics", help="with --trace: also write Prometheus metrics to this .prom file")
+
+    run = sub.add_parser("run", help="coordinate one scenario directory through the queue")
+    run.add_argument("--queue", required=True)
+    run.add_argument("--scenarios", required=True)
+    run.add_argument("--results", required=True)
+    run.add_argument("--template", default=map_path("template.yaml"))
+
+    status = sub.add_parser("status", help="job counts (expired leases are re-queued by the coordinators)")
+    status.add_argument("--queue", required=True)
+
+    args = parser.parse_args()
+    queue = WorkQueue(args.queue)
+    if args.command == "worker":
+        launch_command = shlex.split(args.launch_command) if args.launch_command else None
+        if args.trace:
+            start_tracing(args.trace, args.metrics, workers=args.slots)
+        asyncio.run(serve(queue, make_slots(args.slots, map_path("workers")), launch_command,
+                          idle_exit=args.idle_exit))
+    elif args.command == "run":
+        from batch_run_scenarios import batch_run
+        batch_run(args.scenarios, args.results, queue=queue, template=args.template)
+    else:
+        print(json.dumps(queue.counts()))
+
+
+if __name__ == "__main__":
+    main()